@@ -0,0 +1,223 @@
+# analytics_snapshot.py
+"""Columnar snapshot of the database for offline jobs.
+
+usage_logs is written as one .npy file per column, partitioned by month, so
+jobs can memory-map only the columns and months they need. equipment_id is
+dictionary-encoded (int32 codes plus a dictionary kept in the manifest).
+NULL metrics stay NaN. The remaining tables are small and are rewritten whole
+on every refresh.
+
+The manifest is the commit point. It is saved after every chunk with the
+dictionary, last_log_id and each partition's row count, and a partition file
+holds only its first partition_rows[month] rows as far as readers and later
+appends are concerned. A refresh interrupted between a chunk's file writes and
+its manifest therefore leaves no duplicate rows or unsaved codes behind: the
+next one cuts the files back and exports those rows again. Refreshes of the
+same directory (a cron job, retention.compact) take turns on a file lock.
+
+    python analytics_snapshot.py            # incremental refresh from last log_id
+    python analytics_snapshot.py --full     # rebuild from scratch
+"""
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from fastapi_app.migrations import run_migrations
+from fastapi_app.replica import get_analytics_db
+
+SNAPSHOT_DIR = "analytics_snapshot"
+MANIFEST = "manifest.json"
+CHUNK_ROWS = 500_000
+
+USAGE_COLUMNS = {
+    "log_id": "int64",
+    "equipment_id": "int32",  # dictionary codes
+    "ts_epoch": "int64",
+    "usage_hours": "float64",
+    "patients_served": "float64",
+    "workload_level": "float64",
+    "avg_cpu_temp": "float64",
+    "error_count": "float64",
+}
+SMALL_TABLES = ["equipment", "maintenance_logs", "failure_predictions", "personnel", "equipment_assignments"]
+
+
+def _read_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"last_log_id": 0, "dictionaries": {"equipment_id": []}, "partitions": [], "partition_rows": {},
+                "tables": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(out_dir, manifest):
+    tmp_path = os.path.join(out_dir, MANIFEST + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST))
+
+
+def _save_array(path, array):
+    # np.save appends ".npy" unless the name already ends with it
+    tmp_path = path[:-len(".npy")] + ".tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def _append_partition(out_dir, month, chunk, committed_rows):
+    """Append chunk to a month's files after its first committed_rows rows; returns the new row count"""
+    part_dir = os.path.join(out_dir, "usage_logs", month)
+    os.makedirs(part_dir, exist_ok=True)
+    for column, dtype in USAGE_COLUMNS.items():
+        path = os.path.join(part_dir, f"{column}.npy")
+        new_values = chunk[column].to_numpy(dtype=dtype)
+        if os.path.exists(path):
+            # Rows past the manifest's count are from a refresh that never committed
+            new_values = np.concatenate([np.load(path)[:committed_rows], new_values])
+        _save_array(path, new_values)
+    return committed_rows + len(chunk)
+
+
+def _export_usage_logs(conn, out_dir, manifest):
+    dictionary = manifest["dictionaries"]["equipment_id"]
+    codes = {eq_id: i for i, eq_id in enumerate(dictionary)}
+    partitions = set(manifest["partitions"])
+    partition_rows = manifest.setdefault("partition_rows", {})
+    exported = 0
+
+    query = f"""
+        SELECT {', '.join(USAGE_COLUMNS)} FROM usage_logs
+        WHERE log_id > ? ORDER BY log_id
+    """
+    for chunk in pd.read_sql_query(query, conn, params=(manifest["last_log_id"],), chunksize=CHUNK_ROWS):
+        chunk = chunk.dropna(subset=["ts_epoch"])
+        if chunk.empty:
+            continue
+        for eq_id in chunk["equipment_id"].unique():
+            if eq_id not in codes:
+                codes[eq_id] = len(dictionary)
+                dictionary.append(eq_id)
+        chunk["equipment_id"] = chunk["equipment_id"].map(codes)
+
+        months = chunk["ts_epoch"].to_numpy(dtype="int64").astype("datetime64[s]").astype("datetime64[M]")
+        chunk["month"] = months.astype(str)
+        for month, part in chunk.groupby("month", sort=True):
+            # A snapshot written before partition_rows existed: its files are all committed
+            committed = partition_rows.get(month)
+            if committed is None:
+                committed = len(load_usage_logs(["log_id"], month, month, out_dir)) if month in partitions else 0
+            partition_rows[month] = _append_partition(out_dir, month, part, committed)
+            partitions.add(month)
+
+        manifest["last_log_id"] = int(chunk["log_id"].max())
+        manifest["partitions"] = sorted(partitions)
+        _write_manifest(out_dir, manifest)
+        exported += len(chunk)
+
+    return exported
+
+
+def _export_table(conn, out_dir, table):
+    df = pd.read_sql_query(f"SELECT * FROM {table}", conn)
+    table_dir = os.path.join(out_dir, table)
+    os.makedirs(table_dir, exist_ok=True)
+    dtypes = {}
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_numeric_dtype(series):
+            values = series.to_numpy(dtype="float64" if series.isna().any() else series.dtype)
+        else:
+            values = series.fillna("").astype(str).to_numpy(dtype=str)
+        _save_array(os.path.join(table_dir, f"{column}.npy"), values)
+        dtypes[column] = str(values.dtype)
+    return {"rows": len(df), "columns": dtypes}
+
+
+def refresh_snapshot(db_path=None, out_dir=SNAPSHOT_DIR, full=False):
+    """Bring the snapshot up to date and return the number of new usage rows.
+
+    Reads the analytics replica unless db_path names a database.
+    """
+    # Next to out_dir rather than in it, so --full can remove the directory while holding it
+    with open(os.path.abspath(out_dir) + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if full and os.path.exists(out_dir):
+            shutil.rmtree(out_dir)
+        os.makedirs(out_dir, exist_ok=True)
+
+        conn = sqlite3.connect(db_path) if db_path else get_analytics_db()
+        run_migrations(conn)
+        manifest = _read_manifest(out_dir)
+
+        exported = _export_usage_logs(conn, out_dir, manifest)
+        for table in SMALL_TABLES:
+            manifest["tables"][table] = _export_table(conn, out_dir, table)
+        conn.close()
+
+        _write_manifest(out_dir, manifest)
+    return exported
+
+
+def load_usage_logs(columns=None, start=None, end=None, out_dir=SNAPSHOT_DIR):
+    """Load usage_logs columns for months between start and end ("YYYY-MM", inclusive).
+
+    Arrays are memory-mapped; only the requested columns and months are touched.
+    equipment_id comes back as a Categorical over the snapshot dictionary.
+    """
+    manifest = _read_manifest(out_dir)
+    columns = list(columns or USAGE_COLUMNS)
+    months = [m for m in manifest["partitions"]
+              if (start is None or m >= start) and (end is None or m <= end)]
+    partition_rows = manifest.get("partition_rows", {})
+
+    arrays = {column: [] for column in columns}
+    for month in months:
+        part_dir = os.path.join(out_dir, "usage_logs", month)
+        for column in columns:
+            # A refresh in progress may already have appended rows the manifest does not list yet
+            array = np.load(os.path.join(part_dir, f"{column}.npy"), mmap_mode="r")
+            arrays[column].append(array[:partition_rows.get(month)])
+
+    data = {}
+    for column in columns:
+        parts = arrays[column]
+        if not parts:
+            data[column] = np.empty(0, dtype=USAGE_COLUMNS[column])
+        else:
+            data[column] = parts[0] if len(parts) == 1 else np.concatenate(parts)
+    if "equipment_id" in data:
+        data["equipment_id"] = pd.Categorical.from_codes(
+            np.asarray(data["equipment_id"]), categories=manifest["dictionaries"]["equipment_id"]
+        )
+    return pd.DataFrame(data, copy=False)
+
+
+def load_table(table, columns=None, out_dir=SNAPSHOT_DIR):
+    """Load one of the small tables from the snapshot"""
+    manifest = _read_manifest(out_dir)
+    if table not in manifest["tables"]:
+        raise KeyError(f"Table {table} is not in the snapshot; run refresh_snapshot() first")
+    columns = list(columns or manifest["tables"][table]["columns"])
+    table_dir = os.path.join(out_dir, table)
+    return pd.DataFrame(
+        {column: np.load(os.path.join(table_dir, f"{column}.npy"), mmap_mode="r") for column in columns},
+        copy=False,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the database to a columnar analytics snapshot")
+    parser.add_argument("--db", help="Database to export (default: the analytics replica)")
+    parser.add_argument("--out", default=SNAPSHOT_DIR)
+    parser.add_argument("--full", action="store_true", help="Discard the existing snapshot and rebuild it")
+    args = parser.parse_args()
+
+    rows = refresh_snapshot(args.db, args.out, full=args.full)
+    print(f"Exported {rows} new usage_logs rows to {args.out}")
@@ -0,0 +1,95 @@
+# benchmarks/bench_timestamps.py
+"""Compare TEXT timestamp parsing against the integer epoch columns.
+
+Runs the data-loading steps of the prediction and equipment-metrics
+endpoints both ways on a migrated copy of the database.
+
+    python -m benchmarks.bench_timestamps --db hospital_equipment_system.db --repeat 20
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from fastapi_app.migrations import run_migrations
+from fastapi_app.timestamps import epoch_to_datetime, equipment_age_sql
+
+FEATURES = "usage_hours, patients_served, workload_level, avg_cpu_temp, error_count"
+
+
+def predict_window_text(conn):
+    df = pd.read_sql_query(
+        f"SELECT equipment_id, timestamp, {FEATURES} FROM usage_logs ORDER BY equipment_id, timestamp DESC", conn
+    )
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df.sort_values(["equipment_id", "timestamp"], ascending=[True, False])
+
+
+def predict_window_epoch(conn):
+    return pd.read_sql_query(
+        f"SELECT equipment_id, ts_epoch, {FEATURES} FROM usage_logs ORDER BY equipment_id, ts_epoch DESC", conn
+    )
+
+
+def metrics_text(conn, equipment_id):
+    eq_df = pd.read_sql("SELECT installation_date FROM equipment WHERE equipment_id = ?", conn, params=(equipment_id,))
+    eq_df["installation_date"] = pd.to_datetime(eq_df["installation_date"])
+    eq_df["equipment_age"] = (pd.Timestamp.today() - eq_df["installation_date"]).dt.days // 365
+    usage_df = pd.read_sql("SELECT timestamp, usage_hours FROM usage_logs WHERE equipment_id = ?", conn, params=(equipment_id,))
+    usage_df["timestamp"] = pd.to_datetime(usage_df["timestamp"])
+    usage_df["date"] = usage_df["timestamp"].dt.date
+    return usage_df.groupby("date")["usage_hours"].mean()
+
+
+def metrics_epoch(conn, equipment_id):
+    pd.read_sql(f"SELECT {equipment_age_sql()} AS equipment_age FROM equipment WHERE equipment_id = ?",
+                conn, params=(equipment_id,))
+    usage_df = pd.read_sql("SELECT ts_epoch, usage_hours FROM usage_logs WHERE equipment_id = ?", conn, params=(equipment_id,))
+    usage_df["date"] = epoch_to_datetime(usage_df["ts_epoch"]).dt.normalize()
+    return usage_df.groupby("date")["usage_hours"].mean()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="hospital_equipment_system.db")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # Work on a copy so the benchmark never migrates the caller's database
+    tmp_dir = tempfile.mkdtemp()
+    db_copy = os.path.join(tmp_dir, "bench.db")
+    shutil.copyfile(args.db, db_copy)
+    conn = sqlite3.connect(db_copy)
+    run_migrations(conn)
+    equipment_id = conn.execute("SELECT equipment_id FROM usage_logs LIMIT 1").fetchone()[0]
+
+    cases = [
+        ("predict window", lambda: predict_window_text(conn), lambda: predict_window_epoch(conn)),
+        ("equipment metrics", lambda: metrics_text(conn, equipment_id), lambda: metrics_epoch(conn, equipment_id)),
+    ]
+    print(f"{'case':<20}{'text ms':>12}{'epoch ms':>12}{'saved':>10}")
+    for name, text_fn, epoch_fn in cases:
+        text_ms = timed(text_fn, args.repeat)
+        epoch_ms = timed(epoch_fn, args.repeat)
+        print(f"{name:<20}{text_ms:>12.2f}{epoch_ms:>12.2f}{(1 - epoch_ms / text_ms):>10.0%}")
+
+    conn.close()
+    shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
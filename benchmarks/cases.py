@@ -0,0 +1,227 @@
+# benchmarks/cases.py
+"""Benchmark cases for the API and pipeline hot paths.
+
+Each case is a setup function taking the run context and returning the
+callable to time. Setup raises SkipCase when an optional dependency (e.g.
+TensorFlow for the LSTM) is missing, so the rest of the suite still runs.
+Route handlers are timed through inspect.unwrap, i.e. the blocking body
+without the executor hop.
+"""
+from inspect import unwrap
+from types import SimpleNamespace
+
+CASES = {}
+
+
+class SkipCase(Exception):
+    pass
+
+
+def case(name, iterations=None):
+    def register(setup):
+        CASES[name] = SimpleNamespace(name=name, setup=setup, iterations=iterations)
+        return setup
+    return register
+
+
+def _usage_frame(conn):
+    from fastapi_app.partitions import latest_readings
+    from fastapi_app.sequences import FEATURES, WINDOW
+
+    return latest_readings(conn, WINDOW, ["equipment_id", "ts_epoch", *FEATURES])
+
+
+def _require_tensorflow():
+    try:
+        import tensorflow  # noqa: F401
+    except ImportError as exc:
+        raise SkipCase(f"tensorflow not available: {exc}")
+
+
+def _scaler():
+    from fastapi_app import model_store
+    return model_store.get("scaler")
+
+
+# --- predict_maintenance ---
+@case("predict.read_usage")
+def predict_read_usage(ctx):
+    return lambda: _usage_frame(ctx.conn)
+
+
+@case("predict.latest_windows")
+def predict_latest_windows(ctx):
+    from fastapi_app.sequences import latest_windows
+
+    df, scaler = _usage_frame(ctx.conn), _scaler()
+    return lambda: latest_windows(df, scaler)
+
+
+@case("predict.lgbm_score")
+def predict_lgbm_score(ctx):
+    from fastapi_app import model_store
+    from fastapi_app.sequences import latest_windows
+
+    X_seq, _ = latest_windows(_usage_frame(ctx.conn), _scaler())
+    model = model_store.get("lgbm")
+    X_flat = X_seq.reshape(X_seq.shape[0], -1)
+    return lambda: model.predict_proba(X_flat)[:, 1]
+
+
+@case("predict.lstm_score")
+def predict_lstm_score(ctx):
+    _require_tensorflow()
+    from fastapi_app import model_store
+    from fastapi_app.sequences import latest_windows
+
+    X_seq, _ = latest_windows(_usage_frame(ctx.conn), _scaler())
+    model = model_store.get("lstm")
+    return lambda: model.predict(X_seq, verbose=0)
+
+
+@case("predict.endpoint", iterations=5)
+def predict_endpoint(ctx):
+    _require_tensorflow()
+    from fastapi_app.jobs import Progress
+    from fastapi_app.predict import run_fleet_prediction
+    # The endpoint only enqueues a job; this times the job itself
+    return lambda: run_fleet_prediction(Progress())
+
+
+# --- priority scoring ---
+@case("priority.score")
+def priority_score(ctx):
+    from fastapi_app.priority import load_priority_features, predict_priority_levels
+
+    return lambda: predict_priority_levels(load_priority_features(ctx.conn, ctx.equipment_id))
+
+
+@case("priority.fleet", iterations=5)
+def priority_fleet(ctx):
+    from fastapi_app.priority import load_priority_features, predict_fleet_priority_levels
+
+    return lambda: predict_fleet_priority_levels(load_priority_features(ctx.conn))
+
+
+@case("predict.ranking")
+def predict_ranking(ctx):
+    from fastapi_app.predict import fleet_ranking
+    return lambda: fleet_ranking(ctx.conn, 20)
+
+
+# --- fetch_equipment_metrics ---
+@case("metrics.no_chart")
+def metrics_no_chart(ctx):
+    from generate_equipment_report import fetch_equipment_metrics
+    return lambda: fetch_equipment_metrics(ctx.equipment_id, render_chart=False)
+
+
+@case("metrics.with_chart", iterations=5)
+def metrics_with_chart(ctx):
+    from generate_equipment_report import fetch_equipment_metrics
+    return lambda: fetch_equipment_metrics(ctx.equipment_id)
+
+
+@case("eda.render", iterations=3)
+def eda_render(ctx):
+    from generate_eda_image import generate_eda_image
+    return generate_eda_image
+
+
+# --- auth and list endpoints ---
+@case("auth.login", iterations=10)
+def auth_login(ctx):
+    from fastapi_app.auth import login
+
+    form = SimpleNamespace(username=ctx.username, password=ctx.password)
+    return lambda: unwrap(login)(form)
+
+
+def _request():
+    # No validators, so conditional_get never answers 304 and the full body is built
+    from fastapi import Request, Response
+    return Request({"type": "http", "method": "GET", "headers": []}), Response()
+
+
+@case("list.equipments")
+def list_equipments(ctx):
+    from fastapi_app.equipments import list_equipments
+    return lambda: unwrap(list_equipments)(*_request(), type=None, location=None, user=ctx.admin)
+
+
+@case("list.users")
+def list_users(ctx):
+    from fastapi_app.users import list_users
+    return lambda: unwrap(list_users)(*_request())
+
+
+@case("list.maintenance_logs")
+def list_maintenance_logs(ctx):
+    from fastapi_app.maintenance import view_logs
+    return lambda: unwrap(view_logs)(*_request(), user=ctx.admin)
+
+
+# --- calendar ---
+def _calendar_db(technicians, events_per_month, months, n_equipment=2000, seed=7):
+    """Temporary database holding only a maintenance calendar: `technicians` people, each with
+    events_per_month jobs in each of `months` months from 2025-01, some of them double-booked"""
+    import os
+    import sqlite3
+    import tempfile
+
+    import numpy as np
+
+    from fastapi_app.migrations import run_migrations
+    from generate_synthetic_fleet import create_schema
+
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(os.path.join(tempfile.mkdtemp(prefix="calendar_bench_"), "calendar.db"))
+    create_schema(conn)
+    conn.executemany("INSERT INTO equipment (equipment_id, type, location) VALUES (?, ?, ?)",
+                     [(f"EQP{i:05d}", f"Type {i % 12}", f"Ward {i % 40}") for i in range(n_equipment)])
+    month_starts = np.arange(np.datetime64("2025-01"), np.datetime64("2025-01") + months).astype("datetime64[D]")
+    rows = []
+    for m, month_start in enumerate(month_starts):
+        for t in range(technicians):
+            for j, day in enumerate(rng.integers(0, 28, events_per_month)):
+                rows.append((f"MTN{m:02d}{t:05d}{j:03d}", f"EQP{rng.integers(n_equipment):05d}",
+                             str(month_start + day), "Preventive", float(rng.choice([0.0, 2.0, 8.0, 30.0])),
+                             f"TECH{t:05d}", "Scheduled" if m == months - 1 else "Completed"))
+    conn.executemany("INSERT INTO maintenance_logs (maintenance_id, equipment_id, date, maintenance_type, "
+                     "downtime_hours, technician_id, status) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    run_migrations(conn)
+    conn.execute("ANALYZE")
+    last = np.datetime64(month_starts[-1], "M")
+    return conn, month_starts[-1].astype(object), ((last + 1).astype("datetime64[D]") - 1).astype(object)
+
+
+@case("calendar.month_1k_technicians", iterations=20)
+def calendar_month_1k_technicians(ctx):
+    # The month view's target: under 50 ms for 1k technicians (~21k events in the month)
+    from fastapi_app.calendar import calendar_view
+
+    conn, start, end = _calendar_db(technicians=1000, events_per_month=21, months=6)
+    return lambda: calendar_view(conn, start, end, ctx.admin["role"])
+
+
+# --- training dataset builders ---
+@case("dataset.processed", iterations=3)
+def dataset_processed(ctx):
+    from preprocess import build_processed_dataset
+    return build_processed_dataset
+
+
+@case("dataset.rolling_windows", iterations=3)
+def dataset_rolling_windows(ctx):
+    from fastapi_app.sequences import rolling_windows
+    from preprocess import build_processed_dataset
+
+    df = build_processed_dataset()
+    return lambda: rolling_windows(df, "needs_maintenance_10_days")
+
+
+@case("dataset.priority_features", iterations=3)
+def dataset_priority_features(ctx):
+    from generate_priority_features import build_priority_features
+    return build_priority_features
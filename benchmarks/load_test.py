@@ -0,0 +1,170 @@
+# benchmarks/load_test.py
+"""Mixed-load test: latency of a fast endpoint while slow ones saturate the server.
+
+`--slow-clients` clients loop over the chart, priority and EDA endpoints. A
+probe meanwhile calls /users/me at a fixed rate. The probe's latency is
+reported idle and under load, along with how many slow requests completed.
+
+    python -m benchmarks.load_test --slow-clients 60 --duration 20
+
+To compare against another revision, point --app-dir at a checkout of it
+(e.g. `git worktree add /tmp/before HEAD~1`). The server is started from
+that directory against a scratch copy of the database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.run import REPO_ROOT, percentile
+
+PROBE_PATH = "/users/me"
+SLOW_PATHS = [
+    "/equipments/{equipment_id}",
+    "/maintenance-log/priority/{equipment_id}",
+    "/eda/overall-eda-image",
+]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _summary(samples):
+    if not samples:
+        return {"requests": 0}
+    samples = sorted(samples)
+    return {
+        "requests": len(samples),
+        "p50_ms": round(percentile(samples, 50), 1),
+        "p95_ms": round(percentile(samples, 95), 1),
+        "p99_ms": round(percentile(samples, 99), 1),
+        "max_ms": round(samples[-1], 1),
+    }
+
+
+async def _probe(client, headers, until, interval):
+    samples = []
+    while time.perf_counter() < until:
+        started = time.perf_counter()
+        response = await client.get(PROBE_PATH, headers=headers)
+        response.raise_for_status()
+        samples.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+    return samples
+
+
+async def _slow_client(client, headers, until, paths, offset):
+    done = errors = 0
+    i = offset
+    while time.perf_counter() < until:
+        try:
+            response = await client.get(paths[i % len(paths)], headers=headers)
+            if response.status_code < 500:
+                done += 1
+            else:
+                errors += 1
+        except httpx.HTTPError:
+            errors += 1
+        i += 1
+    return done, errors
+
+
+async def run_load(base_url, username, password, equipment_ids, slow_clients, duration, interval):
+    limits = httpx.Limits(max_connections=slow_clients + 10, max_keepalive_connections=slow_clients + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        login = await client.post("/login", data={"username": username, "password": password})
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        idle = await _probe(client, headers, time.perf_counter() + min(5.0, duration / 2), interval)
+
+        paths = [p.format(equipment_id=eid) for eid in equipment_ids for p in SLOW_PATHS]
+        until = time.perf_counter() + duration
+        slow = [asyncio.create_task(_slow_client(client, headers, until, paths, i)) for i in range(slow_clients)]
+        # Give the slow clients a moment to fill the server before probing
+        await asyncio.sleep(min(1.0, duration / 10))
+        loaded = await _probe(client, headers, until, interval)
+        slow_results = await asyncio.gather(*slow)
+
+    return {
+        "probe_idle": _summary(idle),
+        "probe_under_load": _summary(loaded),
+        "slow_completed": sum(done for done, _ in slow_results),
+        "slow_errors": sum(errors for _, errors in slow_results),
+    }
+
+
+def _start_server(app_dir, db_path, port):
+    env = dict(os.environ, HOSPITAL_DB_PATH=db_path, MPLBACKEND="Agg",
+               PYTHONPATH=os.pathsep.join(filter(None, [app_dir, os.environ.get("PYTHONPATH")])))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fastapi_app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=app_dir, env=env,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("Server did not start within 120 s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Test an already running server instead of starting one")
+    parser.add_argument("--app-dir", default=REPO_ROOT, help="Checkout to serve (default: this one)")
+    parser.add_argument("--db", default=os.path.join(REPO_ROOT, "hospital_equipment_system.db"))
+    parser.add_argument("--slow-clients", type=int, default=60)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--equipment", default="EQP001,EQP002,EQP003")
+    parser.add_argument("--username", default="user1")
+    parser.add_argument("--password", default="pass1")
+    parser.add_argument("--out", help="Also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    server = scratch = None
+    base_url = args.url
+    if base_url is None:
+        scratch = tempfile.mkdtemp(prefix="load_")
+        db_copy = os.path.join(scratch, "load.db")
+        shutil.copyfile(args.db, db_copy)
+        port = _free_port()
+        server = _start_server(os.path.abspath(args.app_dir), db_copy, port)
+        base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        results = asyncio.run(run_load(base_url, args.username, args.password, args.equipment.split(","),
+                                       args.slow_clients, args.duration, args.probe_interval))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if scratch is not None:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# benchmarks/run.py
+"""Run the benchmark suite against one or more databases and compare results.
+
+    python -m benchmarks run --db hospital_equipment_system.db --sizes 1000x90,10000x30 --out bench.json
+    python -m benchmarks compare baseline.json bench.json --threshold 0.15
+
+`--sizes` entries are EQUIPMENTxDAYS fleets built with generate_synthetic_fleet
+and cached under benchmarks/.data. Every database is benchmarked in its own
+subprocess, in a scratch directory holding a copy of the database, so charts,
+snapshots and predictions written by the cases never touch the repo.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(REPO_ROOT, "benchmarks", ".data")
+SHARED_FILES = ["saved_models", "labeled_preventive_data.csv", "labeled_corrective_data.csv",
+                "labeled_replacement_data.csv"]
+DEFAULT_ITERATIONS = 20
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, round(pct / 100 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+def measure(fn, iterations):
+    fn()  # warm-up: imports, model loads, page cache
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+
+    # Peak memory is taken on a separate call so tracing does not skew the timings
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": round(sum(samples) / len(samples), 3),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "throughput_per_s": round(iterations / elapsed, 3),
+        "peak_mem_mb": round(peak / 2 ** 20, 3),
+    }
+
+
+def run_worker(args):
+    """Benchmark the database named by HOSPITAL_DB_PATH from the current (scratch) directory"""
+    from benchmarks.cases import CASES, SkipCase
+    from fastapi_app.database import DB_PATH
+    from fastapi_app.migrations import run_migrations
+
+    conn = sqlite3.connect(DB_PATH)
+    run_migrations(conn)
+    equipment_id = conn.execute("SELECT equipment_id FROM usage_logs LIMIT 1").fetchone()[0]
+    admin = conn.execute("SELECT username FROM personnel WHERE role = 'Admin' LIMIT 1").fetchone()[0]
+    ctx = SimpleNamespace(
+        conn=conn,
+        equipment_id=equipment_id,
+        username=admin,
+        password=args.password,
+        admin={"username": admin, "role": "admin"},
+    )
+
+    results = []
+    for name, bench in CASES.items():
+        if args.filter and not any(fnmatch.fnmatch(name, pattern) for pattern in args.filter):
+            continue
+        record = {"db": args.label, "case": name}
+        try:
+            fn = bench.setup(ctx)
+            record.update(measure(fn, min(args.iterations, bench.iterations or args.iterations)))
+            print(f"  {name:<28} p50 {record['p50_ms']:>10.2f} ms  p95 {record['p95_ms']:>10.2f} ms  "
+                  f"peak {record['peak_mem_mb']:>8.1f} MB", flush=True)
+        except SkipCase as exc:
+            record["skipped"] = str(exc)
+            print(f"  {name:<28} skipped: {exc}", flush=True)
+        except Exception as exc:
+            record["error"] = f"{type(exc).__name__}: {exc}"
+            print(f"  {name:<28} error: {record['error']}", flush=True)
+        results.append(record)
+
+    conn.close()
+    with open(args.out, "w") as f:
+        json.dump(results, f)
+
+
+def _fleet_db(spec):
+    from generate_synthetic_fleet import generate_fleet
+
+    n_equipment, days = (int(part) for part in spec.lower().split("x"))
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"fleet_{n_equipment}x{days}.db")
+    if not os.path.exists(path):
+        print(f"Generating {path} ...", flush=True)
+        generate_fleet(path, n_equipment, days)
+    return path
+
+
+def _benchmark_db(label, db_path, args):
+    scratch = tempfile.mkdtemp(prefix="bench_")
+    try:
+        shutil.copyfile(db_path, os.path.join(scratch, "bench.db"))
+        os.makedirs(os.path.join(scratch, "charts"))
+        for name in SHARED_FILES:
+            source = os.path.join(REPO_ROOT, name)
+            if os.path.exists(source):
+                os.symlink(source, os.path.join(scratch, name))
+
+        out = os.path.join(scratch, "results.json")
+        cmd = [sys.executable, "-m", "benchmarks.run", "worker", "--label", label, "--out", out,
+               "--iterations", str(args.iterations), "--password", args.password]
+        for pattern in args.filter or []:
+            cmd += ["--filter", pattern]
+        env = dict(os.environ, HOSPITAL_DB_PATH=os.path.join(scratch, "bench.db"), MPLBACKEND="Agg",
+                   PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+
+        print(f"[{label}]", flush=True)
+        subprocess.run(cmd, cwd=scratch, env=env, check=True)
+        with open(out) as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def run_suite(args):
+    targets = [(os.path.basename(path), path) for path in args.db]
+    targets += [(f"fleet_{spec}", _fleet_db(spec)) for spec in args.sizes]
+    if not targets:
+        targets = [("hospital_equipment_system.db", os.path.join(REPO_ROOT, "hospital_equipment_system.db"))]
+
+    results = []
+    for label, path in targets:
+        results.extend(_benchmark_db(label, path, args))
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = {(r["db"], r["case"]): r for r in json.load(f)["results"]}
+    with open(args.candidate) as f:
+        candidate = json.load(f)["results"]
+
+    regressions = 0
+    print(f"{'db':<32}{'case':<28}{'p50 base':>10}{'p50 new':>10}{'change':>9}{'mem change':>12}")
+    for new in candidate:
+        old = baseline.get((new["db"], new["case"]))
+        if not old or "p50_ms" not in old or "p50_ms" not in new:
+            continue
+        change = new["p50_ms"] / old["p50_ms"] - 1 if old["p50_ms"] else 0.0
+        mem_change = new["peak_mem_mb"] / old["peak_mem_mb"] - 1 if old["peak_mem_mb"] else 0.0
+        flag = ""
+        if change > args.threshold or mem_change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{new['db']:<32}{new['case']:<28}{old['p50_ms']:>10.2f}{new['p50_ms']:>10.2f}"
+              f"{change:>9.0%}{mem_change:>12.0%}{flag}")
+
+    print(f"\n{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Benchmark one or more databases")
+    run.add_argument("--db", action="append", default=[], help="Existing database to benchmark (repeatable)")
+    run.add_argument("--sizes", type=lambda s: [p for p in s.split(",") if p], default=[],
+                     help="Comma-separated synthetic fleets as EQUIPMENTxDAYS, e.g. 1000x90,10000x30")
+    run.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    run.add_argument("--filter", action="append", help="Only run cases matching this glob (repeatable)")
+    run.add_argument("--password", default="pass1", help="Password of the first admin user")
+    run.add_argument("--out", default="bench_results.json")
+
+    worker = sub.add_parser("worker", help=argparse.SUPPRESS)
+    worker.add_argument("--label", required=True)
+    worker.add_argument("--out", required=True)
+    worker.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    worker.add_argument("--filter", action="append")
+    worker.add_argument("--password", default="pass1")
+
+    cmp = sub.add_parser("compare", help="Flag regressions between two result files")
+    cmp.add_argument("baseline")
+    cmp.add_argument("candidate")
+    cmp.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown (0.10 = 10%%)")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        run_suite(args)
+    elif args.command == "worker":
+        run_worker(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# benchmarks/startup.py
+"""Import cost of the API, and a budget check for it.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --check --budget-ms 1500 --budget-rss-mb 150 --out startup.json
+
+Every measurement imports into a fresh interpreter, so nothing is already in
+sys.modules. The report shows:
+
+cold start   wall time of `import fastapi_app.main` and the RSS after it,
+             median of --runs interpreters
+modules      the largest cumulative import times from `python -X importtime`
+packages     the same tree's self time summed per top-level package
+routers      every module that defines a route: its cumulative time inside
+             that tree, and its cost imported on its own over a bare
+             `import fastapi` (median of --runs)
+
+The heavy libraries in DEFERRED are imported by the routers on first use,
+not at startup. --check exits 1 when the cold start or RSS is over budget
+or when one of them is loaded by `import fastapi_app.main`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks.run import REPO_ROOT
+
+APP_MODULE = "fastapi_app.main"
+BUDGET_MS = float(os.environ.get("HOSPITAL_STARTUP_BUDGET_MS", "1500"))
+BUDGET_RSS_MB = float(os.environ.get("HOSPITAL_STARTUP_BUDGET_RSS_MB", "150"))
+DEFERRED = ["tensorflow", "keras", "lightgbm", "sklearn", "scipy", "pandas", "numpy",
+            "matplotlib", "seaborn", "PIL", "joblib"]
+
+# Runs in the fresh interpreter; the import is timed before anything else is loaded
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+module = __import__(sys.argv[1], fromlist=["_"])
+import_ms = (time.perf_counter() - started) * 1000
+from fastapi_app.instrumentation import process_memory
+from fastapi import APIRouter
+print(json.dumps({
+    "import_ms": import_ms,
+    "rss_mb": process_memory()["rss"] / 2 ** 20,
+    "loaded": sorted({name.split(".")[0] for name in sys.modules} & set(sys.argv[2:])),
+    "routers": sorted(name for name, mod in list(sys.modules.items())
+                      if name.startswith("fastapi_app.") and isinstance(getattr(mod, "router", None), APIRouter)),
+}))
+"""
+
+
+def _probe(module, importtime=False):
+    """Probe result for importing `module` in a new interpreter, plus its -X importtime tree"""
+    cmd = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", _PROBE, module, *DEFERRED]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result, _parse_importtime(proc.stderr) if importtime else []
+
+
+def _parse_importtime(stderr):
+    """(module, self µs, cumulative µs) per line of `python -X importtime` output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def _median_probe(module, runs):
+    samples = [_probe(module)[0] for _ in range(runs)]
+    return {
+        "import_ms": round(statistics.median(s["import_ms"] for s in samples), 1),
+        "process_ms": round(statistics.median(s["process_ms"] for s in samples), 1),
+        "rss_mb": round(statistics.median(s["rss_mb"] for s in samples), 1),
+        "loaded": samples[-1]["loaded"],
+    }
+
+
+def profile(runs=5, top=25):
+    cold = _median_probe(APP_MODULE, runs)
+    traced, tree = _probe(APP_MODULE, importtime=True)
+
+    packages = defaultdict(int)
+    for name, self_us, _ in tree:
+        packages[name.split(".")[0]] += self_us
+    modules = sorted(tree, key=lambda row: row[2], reverse=True)[:top]
+
+    # Each router alone, less what every router pays for the framework
+    in_main = {name: cumulative for name, _, cumulative in tree}
+    framework = _median_probe("fastapi", runs)
+    routers = []
+    for module in traced["routers"]:
+        alone = _median_probe(module, runs)
+        routers.append({
+            "router": module,
+            "in_main_ms": round(in_main.get(module, 0) / 1000, 1),
+            "alone_ms": alone["import_ms"],
+            "over_framework_ms": round(alone["import_ms"] - framework["import_ms"], 1),
+            "over_framework_rss_mb": round(alone["rss_mb"] - framework["rss_mb"], 1),
+            "loaded": alone["loaded"],
+        })
+
+    return {
+        "cold_start": {"runs": runs, **cold},
+        "framework": framework,
+        "modules": [{"module": name, "cumulative_ms": round(cum / 1000, 1), "self_ms": round(own / 1000, 1)}
+                    for name, own, cum in modules],
+        "packages": [{"package": name, "self_ms": round(us / 1000, 1)}
+                     for name, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]],
+        "routers": sorted(routers, key=lambda r: r["over_framework_ms"], reverse=True),
+    }
+
+
+def check(report, budget_ms, budget_rss_mb):
+    """Budget violations of a profile report; empty when it passes"""
+    cold = report["cold_start"]
+    violations = []
+    if cold["import_ms"] > budget_ms:
+        violations.append(f"cold start {cold['import_ms']:.0f} ms is over the {budget_ms:.0f} ms budget")
+    if cold["rss_mb"] > budget_rss_mb:
+        violations.append(f"baseline RSS {cold['rss_mb']:.0f} MB is over the {budget_rss_mb:.0f} MB budget")
+    if cold["loaded"]:
+        violations.append(f"{APP_MODULE} imports deferred libraries at startup: {', '.join(cold['loaded'])}")
+    return violations
+
+
+def print_report(report):
+    cold = report["cold_start"]
+    print(f"Cold start ({cold['runs']} runs): import {cold['import_ms']:.1f} ms, "
+          f"process {cold['process_ms']:.1f} ms, RSS {cold['rss_mb']:.1f} MB")
+    print(f"Deferred libraries loaded at startup: {', '.join(cold['loaded']) or 'none'}")
+
+    print(f"\n{'cumulative ms':>14}{'self ms':>10}  module")
+    for row in report["modules"]:
+        print(f"{row['cumulative_ms']:>14.1f}{row['self_ms']:>10.1f}  {row['module']}")
+
+    print(f"\n{'self ms':>14}  package")
+    for row in report["packages"]:
+        print(f"{row['self_ms']:>14.1f}  {row['package']}")
+
+    framework = report["framework"]
+    print(f"\nRouters alone, over `import fastapi` ({framework['import_ms']:.1f} ms, {framework['rss_mb']:.1f} MB)")
+    print(f"{'in main ms':>14}{'alone ms':>10}{'+ms':>9}{'+RSS MB':>9}  router (deferred libraries it loads)")
+    for row in report["routers"]:
+        print(f"{row['in_main_ms']:>14.1f}{row['alone_ms']:>10.1f}{row['over_framework_ms']:>9.1f}"
+              f"{row['over_framework_rss_mb']:>9.1f}  {row['router']}"
+              f"{' (' + ', '.join(row['loaded']) + ')' if row['loaded'] else ''}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters for the cold-start median")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--check", action="store_true", help="Exit 1 if the startup budget is exceeded")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--budget-rss-mb", type=float, default=BUDGET_RSS_MB)
+    parser.add_argument("--out", help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = profile(args.runs, args.top)
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+
+    if args.check:
+        violations = check(report, args.budget_ms, args.budget_rss_mb)
+        for violation in violations:
+            print(f"BUDGET: {violation}")
+        print(f"\n{len(violations)} budget violation(s)")
+        sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# fastapi_app/assignment.py
+"""Workload-aware technician assignment for open maintenance jobs.
+
+plan() walks the unassigned open jobs by date, most critical device first,
+and gives each one to the technician with the fewest open jobs who is free
+that day (one job per technician per day, as the calendar's conflict check
+assumes). Technicians who know the device's location are preferred: their
+department, equipment they are assigned to, or earlier jobs there. A remote
+technician wins only with LOCATION_PENALTY fewer open jobs. Jobs on High
+criticality equipment go to technicians with SENIOR_YEARS of experience when
+one is free.
+
+Technicians sit in min-heaps keyed by (open jobs, -experience): one per
+location they know plus one for everyone, each also kept for seniors only.
+Loads only grow, so a stale entry is refreshed when it reaches the top, and
+each job costs a few heap operations instead of a scan over all technicians.
+"""
+import heapq
+import os
+from collections import defaultdict
+
+from fastapi import APIRouter, Depends, Query
+
+from fastapi_app.database import get_db
+from fastapi_app.dependencies import require_role
+from fastapi_app.executors import db_pool, offload
+
+router = APIRouter()
+
+ASSIGNABLE_ROLES = ("Technician",)
+OPEN_STATUSES = ("Scheduled", "In Progress")
+SENIOR_YEARS = float(os.environ.get("HOSPITAL_ASSIGN_SENIOR_YEARS", "5"))
+LOCATION_PENALTY = int(os.environ.get("HOSPITAL_ASSIGN_LOCATION_PENALTY", "2"))
+CRITICALITY_ORDER = {"High": 0, "Medium": 1, "Low": 2}
+
+
+class _Pool:
+    """Technicians ordered by (open jobs, -experience, id)"""
+
+    def __init__(self, technicians, load):
+        self.heap = [(load[tid], -years, tid) for tid, years in technicians]
+        heapq.heapify(self.heap)
+
+    def best(self, load, busy):
+        """(open jobs, technician id) of the least loaded technician not in `busy`, or None"""
+        skipped, found = [], None
+        while self.heap:
+            jobs, neg_years, tid = self.heap[0]
+            if jobs != load[tid]:
+                heapq.heapreplace(self.heap, (load[tid], neg_years, tid))
+            elif tid in busy:
+                skipped.append(heapq.heappop(self.heap))
+            else:
+                found = (jobs, tid)
+                break
+        for entry in skipped:
+            heapq.heappush(self.heap, entry)
+        return found
+
+
+def _technicians(conn):
+    roles = ", ".join("?" * len(ASSIGNABLE_ROLES))
+    technicians = {tid: {"name": name, "experience_years": years}
+                   for tid, name, years in conn.execute(
+                       f"SELECT personnel_id, name, COALESCE(experience_years, 0) FROM personnel WHERE role IN ({roles})",
+                       ASSIGNABLE_ROLES)}
+    known = conn.execute(f"""
+        SELECT personnel_id, department FROM personnel WHERE role IN ({roles})
+        UNION
+        SELECT a.personnel_id, e.location FROM equipment_assignments a JOIN equipment e ON e.equipment_id = a.equipment_id
+        UNION
+        SELECT m.technician_id, e.location FROM maintenance_logs m JOIN equipment e ON e.equipment_id = m.equipment_id
+        WHERE m.technician_id IS NOT NULL AND m.technician_id != ''
+    """, ASSIGNABLE_ROLES).fetchall()
+    locations = defaultdict(set)
+    for tid, location in known:
+        if tid in technicians and location:
+            locations[tid].add(location)
+    return technicians, locations
+
+
+def _open_jobs(conn):
+    return conn.execute(f"""
+        SELECT m.maintenance_id, m.equipment_id, m.date, m.status, m.technician_id,
+               e.location, e.criticality, p.failure_probability
+        FROM maintenance_logs m
+        LEFT JOIN equipment e ON e.equipment_id = m.equipment_id
+        LEFT JOIN failure_predictions p ON p.equipment_id = m.equipment_id
+        WHERE m.status IN ({", ".join("?" * len(OPEN_STATUSES))})
+    """, OPEN_STATUSES).fetchall()
+
+
+def plan(conn, rebalance=False, maintenance_ids=None):
+    """Assignments for the open jobs without a technician.
+
+    With rebalance=True every Scheduled job is planned again; jobs already
+    In Progress keep their technician. maintenance_ids limits the plan to
+    those jobs, with every other open job counted as load.
+    """
+    only = None if maintenance_ids is None else set(maintenance_ids)
+    technicians, locations = _technicians(conn)
+    load = {tid: 0 for tid in technicians}
+    busy = defaultdict(set)
+    pending = []
+    for job in _open_jobs(conn):
+        maintenance_id, equipment_id, date, status, tid, location, criticality, probability = job
+        if (not tid or (rebalance and status == "Scheduled")) and (only is None or maintenance_id in only):
+            pending.append(job)
+        elif tid in load:
+            load[tid] += 1
+            busy[date].add(tid)
+
+    everyone = [(tid, t["experience_years"]) for tid, t in technicians.items()]
+    seniors = [(tid, years) for tid, years in everyone if years >= SENIOR_YEARS]
+    by_location = defaultdict(list)
+    for tid, years in everyone:
+        for location in locations[tid]:
+            by_location[location].append((tid, years))
+    pools = {(None, False): _Pool(everyone, load), (None, True): _Pool(seniors, load)}
+    for location, members in by_location.items():
+        pools[(location, False)] = _Pool(members, load)
+        pools[(location, True)] = _Pool([m for m in members if m[1] >= SENIOR_YEARS], load)
+
+    pending.sort(key=lambda job: (job[2] or "", CRITICALITY_ORDER.get(job[6], 1), -(job[7] or 0), job[0]))
+    assignments, unassigned = [], []
+    for maintenance_id, equipment_id, date, status, previous, location, criticality, probability in pending:
+        note = None
+        senior = criticality == "High"
+        local = pools[(location, senior)].best(load, busy[date]) if (location, senior) in pools else None
+        anywhere = pools[(None, senior)].best(load, busy[date])
+        if senior and not (local or anywhere):
+            note = "no senior technician free"
+            local = pools[(location, False)].best(load, busy[date]) if (location, False) in pools else None
+            anywhere = pools[(None, False)].best(load, busy[date])
+        if local and (not anywhere or local[0] <= anywhere[0] + LOCATION_PENALTY):
+            choice, is_local = local, True
+        elif anywhere:
+            choice, is_local = anywhere, location in locations[anywhere[1]]
+        else:
+            unassigned.append({"maintenance_id": maintenance_id, "equipment_id": equipment_id, "date": date,
+                               "reason": "every technician already has a job that day"})
+            continue
+        tid = choice[1]
+        load[tid] += 1
+        busy[date].add(tid)
+        assignments.append({
+            "maintenance_id": maintenance_id,
+            "equipment_id": equipment_id,
+            "date": date,
+            "location": location,
+            "criticality": criticality,
+            "previous_technician_id": previous or None,
+            "technician_id": tid,
+            "technician_name": technicians[tid]["name"],
+            "knows_location": is_local,
+            "note": note,
+        })
+
+    return {
+        "assignments": assignments,
+        "unassigned": unassigned,
+        "open_jobs": {tid: load[tid] for tid in sorted(load)},
+    }
+
+
+def apply(conn, rebalance=False, maintenance_ids=None):
+    """Plan and write the assignments in one write transaction, so no other writer interleaves"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        result = plan(conn, rebalance, maintenance_ids)
+        cursor.executemany("UPDATE maintenance_logs SET technician_id = ? WHERE maintenance_id = ?",
+                           [(a["technician_id"], a["maintenance_id"]) for a in result["assignments"]
+                            if a["technician_id"] != a["previous_technician_id"]])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return result
+
+
+@router.post("/", summary="Assign open maintenance jobs to technicians",
+             dependencies=[Depends(require_role("admin", "biomedical", "biomedicalengineer"))])
+@offload(db_pool)
+def assign_open_jobs(
+    dry_run: bool = Query(True, description="Only return the plan; nothing is written"),
+    rebalance: bool = Query(False, description="Also move Scheduled jobs that already have a technician"),
+):
+    conn = get_db()
+    result = plan(conn, rebalance) if dry_run else apply(conn, rebalance)
+    conn.close()
+    return {"dry_run": dry_run, "rebalance": rebalance, **result}
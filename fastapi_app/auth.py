@@ -4,7 +4,9 @@ from fastapi.security import OAuth2PasswordRequestForm
 from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta
-import sqlite3
+
+from fastapi_app.database import get_db
+from fastapi_app.executors import cpu_pool, offload
 
 SECRET_KEY = "your-secret-key"
 ALGORITHM = "HS256"
@@ -23,8 +25,9 @@ def create_access_token(data: dict):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 @router.post("/login")
+@offload(cpu_pool)
 def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    conn = sqlite3.connect("hospital_equipment_system.db")
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute("SELECT username, password, role FROM personnel WHERE username = ?", (form_data.username,))
     user = cursor.fetchone()
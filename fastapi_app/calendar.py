@@ -1,8 +1,154 @@
 #calendar.py
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from datetime import date, timedelta
+
+from fastapi_app.database import get_db
+from fastapi_app.executors import db_pool, offload
+from fastapi_app.dependencies import get_current_user
 
 router = APIRouter()
 
+# Scheduled jobs carry no downtime yet, so they are assumed to take a working day
+DEFAULT_JOB_HOURS = 8.0
+MAX_WINDOW_DAYS = 366
+GROUP_COLUMNS = {"location": "location", "technician": "technician_id", "type": "equipment_type"}
+
+def sweep_events(rows, equipment, day_hours):
+    """Event dicts and technician conflicts from calendar rows in date order, in one pass.
+
+    Each technician keeps the job that ends last so far; any later job of
+    theirs starting before that end is double-booked. equipment maps
+    equipment_id to (type, location), and day_hours each ISO date to its start
+    in hours since 0001-01-01; rows missing from either are skipped.
+    """
+    events, conflicts = [], []
+    active = {}  # technician_id -> (end, maintenance_id) of the job ending last
+
+    for maintenance_id, equipment_id, iso, maintenance_type, status, tech, hours in rows:
+        device = equipment.get(equipment_id)
+        start = day_hours.get(iso)
+        if device is None or start is None:
+            continue
+        events.append({
+            "maintenance_id": maintenance_id,
+            "equipment_id": equipment_id,
+            "date": iso,
+            "maintenance_type": maintenance_type,
+            "status": status,
+            "technician_id": tech,
+            "downtime_hours": hours,
+            "equipment_type": device[0],
+            "location": device[1],
+        })
+        if not tech:
+            continue
+        end = start + (hours if hours and hours > 0 else DEFAULT_JOB_HOURS)
+        previous = active.get(tech)
+        if previous is None:
+            active[tech] = (end, maintenance_id)
+            continue
+        if start < previous[0]:
+            conflicts.append({
+                "technician_id": tech,
+                "maintenance_id": maintenance_id,
+                "overlaps_with": previous[1],
+                "date": iso,
+            })
+        if end > previous[0]:
+            active[tech] = (end, maintenance_id)
+
+    # Grouped per technician, in date order within each
+    conflicts.sort(key=lambda conflict: conflict["technician_id"])
+    return events, conflicts
+
+# --- Calendar view over scheduled and completed maintenance ---
 @router.get("/calendar")
-def get_calendar():
-    return {"message": "Calendar endpoint coming soon!"}
+@offload(db_pool)
+def get_calendar(
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    location: Optional[str] = Query(None),
+    technician_id: Optional[str] = Query(None),
+    equipment_type: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    group_by: Optional[str] = Query(None),
+    user=Depends(get_current_user)
+):
+    # Default to the current month
+    if start is None:
+        start = date.today().replace(day=1)
+    if end is None:
+        end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days > MAX_WINDOW_DAYS:
+        raise HTTPException(status_code=400, detail=f"Calendar window is limited to {MAX_WINDOW_DAYS} days")
+    if group_by and group_by not in GROUP_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {list(GROUP_COLUMNS)}")
+
+    conn = get_db()
+    response = calendar_view(conn, start, end, user["role"], location, technician_id, equipment_type, status, group_by)
+    conn.close()
+    return response
+
+def calendar_view(conn, start, end, role, location=None, technician_id=None, equipment_type=None, status=None,
+                  group_by=None):
+    """Events between start and end (dates, inclusive) in date order, their technician conflicts and groups"""
+    # idx_maintenance_logs_calendar covers this in (date, maintenance_id) order, or
+    # idx_maintenance_logs_technician_date serves it when a technician is given.
+    # Rows whose date was stored in a non-ISO form cannot be placed on the calendar; GLOB drops them.
+    where = "m.date >= ? AND m.date <= ? AND m.date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+    params = [start.isoformat(), end.isoformat()]
+    if technician_id:
+        where += " AND m.technician_id = ?"
+        params.append(technician_id)
+    # Technicians only see scheduled work, same as the log listing
+    if role == "technician":
+        where += " AND m.status = 'Scheduled'"
+    elif status:
+        where += " AND m.status = ?"
+        params.append(status)
+
+    # Device type and location come from one read of equipment rather than a join per event
+    # (the whole table, or a technician's devices in range); events of devices it leaves out are dropped
+    equipment_query = "SELECT equipment_id, type, location FROM equipment WHERE 1=1"
+    equipment_params = []
+    if technician_id:
+        equipment_query += f" AND equipment_id IN (SELECT m.equipment_id FROM maintenance_logs m WHERE {where})"
+        equipment_params += params
+    if location:
+        equipment_query += " AND location = ?"
+        equipment_params.append(location)
+    if equipment_type:
+        equipment_query += " AND type = ?"
+        equipment_params.append(equipment_type)
+    equipment = {eid: (eq_type, eq_location)
+                 for eid, eq_type, eq_location in conn.execute(equipment_query, equipment_params)}
+
+    rows = conn.execute(f"""
+        SELECT m.maintenance_id, m.equipment_id, m.date, m.maintenance_type, m.status,
+               m.technician_id, m.downtime_hours
+        FROM maintenance_logs m
+        WHERE {where}
+        ORDER BY m.date, m.maintenance_id
+    """, params).fetchall()
+
+    # A month has at most 31 distinct dates; GLOB still admits impossible ones such as 2025-02-30
+    day_hours = {}
+    for iso in {row[2] for row in rows}:
+        try:
+            day_hours[iso] = date.fromisoformat(iso).toordinal() * 24.0
+        except ValueError:
+            pass
+    events, conflicts = sweep_events(rows, equipment, day_hours)
+    response = {"start": start.isoformat(), "end": end.isoformat(), "events": events, "conflicts": conflicts}
+
+    if group_by:
+        column = GROUP_COLUMNS[group_by]
+        groups = {}
+        for event in events:
+            groups.setdefault(event[column] or "Unassigned", []).append(event["maintenance_id"])
+        response["groups"] = groups
+
+    return response
@@ -0,0 +1,155 @@
+# fastapi_app/dashboard.py
+"""Everything a page needs in one request.
+
+Each endpoint gathers its page's sections concurrently on db_pool, one
+connection per section, and reads only stored or cached data: device health
+is what the last fleet prediction run stored (see /predict/ranking), charts
+are returned as URLs of the cached images, and no model or LLM is called.
+Pages still start a prediction run with POST /predict/; `prediction` reports
+the last published run and any run in progress.
+"""
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from fastapi_app.database import get_db
+from fastapi_app.dependencies import get_current_user, require_role
+from fastapi_app.equipments import _equipment_row, equipment_rows
+from fastapi_app.executors import db_pool, run_in
+from fastapi_app.maintenance import equipment_logs, pending_reviews, stored_priority
+from fastapi_app.predict import JOB_KIND, RANKING_MAX_K, fleet_ranking
+from fastapi_app.users import personnel_rows, profile
+from fastapi_app import explanations, images, jobs
+
+router = APIRouter()
+
+EDA_IMAGE_URL = "/eda/overall-eda-image"
+SCHEDULING_ROLES = ("admin", "biomedical", "biomedicalengineer")
+
+
+def _read(fn, *args):
+    conn = get_db()
+    try:
+        return fn(conn, *args)
+    finally:
+        conn.close()
+
+
+async def _gather(**sections):
+    """Run each section's (fn, *args) as fn(conn, *args) concurrently; {name: result}"""
+    results = await asyncio.gather(*(run_in(db_pool, _read, fn, *args) for fn, *args in sections.values()))
+    return dict(zip(sections, results))
+
+
+# --- Sections ---
+def _health(conn):
+    """Stored failure probability and priority levels of every scored device, riskiest first"""
+    return fleet_ranking(conn, RANKING_MAX_K)
+
+
+def _work_status(conn):
+    """Devices with a scheduled job, and devices with a finished job awaiting review"""
+    rows = conn.execute("""
+        SELECT DISTINCT equipment_id, status FROM maintenance_logs
+        WHERE status = 'Scheduled' OR (status = 'Completed' AND completion_status = 'Pending')
+    """).fetchall()
+    return {
+        "scheduled": sorted({eid for eid, status in rows if status == "Scheduled"}),
+        "awaiting_review": sorted({eid for eid, status in rows if status == "Completed"}),
+    }
+
+
+def _prediction(conn):
+    last = conn.execute("SELECT run_id, run_epoch, devices FROM prediction_runs ORDER BY run_id DESC LIMIT 1").fetchone()
+    active = conn.execute(f"SELECT job_id, status, stage FROM jobs WHERE kind = ? AND status IN {jobs.ACTIVE}",
+                          (JOB_KIND,)).fetchone()
+    return {
+        "last_run": dict(zip(["run_id", "run_epoch", "devices"], last)) if last else None,
+        "active_job": dict(zip(["job_id", "status", "stage"], active)) if active else None,
+    }
+
+
+def _metrics(equipment_id):
+    from generate_equipment_report import fetch_equipment_metrics
+
+    try:
+        metrics = fetch_equipment_metrics(equipment_id, render_chart=False)
+    except ValueError:
+        return None
+    # A server path; pages load the chart from trend_plot_url
+    metrics.pop("chart_path", None)
+    return metrics
+
+
+def _priority(conn, equipment_id):
+    stored = stored_priority(conn, equipment_id)
+    return stored if stored else (None, None)
+
+
+def _contributions(conn, equipment_id):
+    stored = explanations.load(conn, equipment_id)
+    return None if stored is None else json.loads(stored)
+
+
+async def _fleet_dashboard(user, **extra):
+    sections = await _gather(
+        profile=(profile, user["username"]),
+        equipments=(equipment_rows, user["role"]),
+        health=(_health,),
+        work=(_work_status,),
+        prediction=(_prediction,),
+        **extra,
+    )
+    work = sections.pop("work")
+    return {**sections, **work, "eda_image_url": EDA_IMAGE_URL}
+
+
+# --- Endpoints ---
+@router.get("/admin", summary="Admin equipment dashboard",
+            dependencies=[Depends(require_role("admin"))])
+async def admin_dashboard(user=Depends(get_current_user)):
+    return await _fleet_dashboard(user, users=(personnel_rows,), pending_reviews=(pending_reviews,))
+
+
+@router.get("/biomedical", summary="Biomedical engineer equipment dashboard",
+            dependencies=[Depends(require_role(*SCHEDULING_ROLES))])
+async def biomedical_dashboard(user=Depends(get_current_user)):
+    # Only technicians, for the scheduling dropdown; the full user list stays admin-only
+    return await _fleet_dashboard(user, users=(personnel_rows, "Technician"), pending_reviews=(pending_reviews,))
+
+
+@router.get("/technician", summary="Technician equipment dashboard",
+            dependencies=[Depends(require_role("technician"))])
+async def technician_dashboard(user=Depends(get_current_user)):
+    return await _fleet_dashboard(user)
+
+
+@router.get("/equipment/{equipment_id}", summary="Equipment detail page")
+async def equipment_dashboard(equipment_id: str, user=Depends(get_current_user)):
+    extra = {"technicians": (personnel_rows, "Technician")} if user["role"] in SCHEDULING_ROLES else {}
+    (row, version), metrics, sections = await asyncio.gather(
+        run_in(db_pool, _equipment_row, equipment_id, user["role"]),
+        run_in(db_pool, _metrics, equipment_id),
+        _gather(
+            profile=(profile, user["username"]),
+            priority=(_priority, equipment_id),
+            contributions=(_contributions, equipment_id),
+            logs=(equipment_logs, equipment_id),
+            **extra,
+        ),
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+
+    maintenance_needs, predicted_to_fail = sections.pop("priority")
+    return {
+        "equipment": row,
+        "trend_plot_url": images.trend_url(equipment_id, version),
+        "metrics": metrics,
+        "maintenance_needs": maintenance_needs,
+        "predicted_to_fail": predicted_to_fail,
+        "scheduled": any(log["status"] == "Scheduled" for log in sections["logs"]),
+        "technicians": sections.pop("technicians", []),
+        **sections,
+    }
@@ -2,7 +2,18 @@
 import sqlite3
 import os
 
+from fastapi_app.instrumentation import TimedConnection
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Point the API and scripts at another database (e.g. a generated fleet) with HOSPITAL_DB_PATH
+DB_PATH = os.environ.get("HOSPITAL_DB_PATH", os.path.join(BASE_DIR, "..", "hospital_equipment_system.db"))
+
 def get_db():
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    db_path = os.path.join(BASE_DIR, "..", "hospital_equipment_system.db")
-    return sqlite3.connect(db_path)
+    # Queries on this connection are timed as the db_query stage
+    return sqlite3.connect(DB_PATH, factory=TimedConnection)
+
+def enable_wal(conn):
+    # Write-ahead logging: readers (the replica copy, analytics reads) no longer
+    # block writers' commits. The mode is stored in the file, so once is enough.
+    return conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
@@ -8,7 +8,8 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 SECRET_KEY = "your-secret-key"
 ALGORITHM = "HS256"
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+# Async so the token check runs on the event loop instead of taking a thread-pool slot
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -29,7 +30,7 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
 
 
 def require_role(*roles):
-    def role_checker(user: dict = Depends(get_current_user)):
+    async def role_checker(user: dict = Depends(get_current_user)):
         if user["role"] not in roles:
             raise HTTPException(status_code=403, detail="Unauthorized for this role")
         return user
@@ -1,16 +1,20 @@
 # fastapi_app/eda.py
-import base64
-from fastapi import APIRouter, Response
-from generate_eda_image import generate_eda_image
-import os
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Query, Request
+from fastapi_app.executors import db_pool, run_in
+from fastapi_app import images
 
 router = APIRouter()
 
-@router.get("/eda/overall-eda-image")
-async def get_eda_image():
-    path = generate_eda_image()
-    if os.path.exists(path):
-        with open(path, "rb") as img_file:
-            encoded_string = base64.b64encode(img_file.read()).decode("utf-8")
-            return {"image_base64": encoded_string}
-    return Response(content="EDA image not found", status_code=404)
+@router.get("/eda/overall-eda-image", summary="EDA dashboard image")
+async def get_eda_image(
+    request: Request,
+    format: Literal["png", "webp"] = Query("png"),
+    dpi: Optional[int] = Query(None, ge=50, le=images.EDA_DPI),
+):
+    # Redrawn only when the tables behind it change; unchanged versions answer 304
+    # without waiting behind chart drawing on the render pool
+    version, data = await run_in(db_pool, images.eda_data)
+    return await images.image_response(request, version, lambda: images.eda_chart(version, data),
+                                       images.EDA_DPI, format, dpi)
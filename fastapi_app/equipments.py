@@ -1,18 +1,19 @@
 #fastapi_app/equipments.py
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from fastapi.responses import JSONResponse
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import BaseModel
-import matplotlib.pyplot as plt
-import sqlite3, io, base64, os
-import pandas as pd
 
+from fastapi_app.database import get_db
+from fastapi_app.executors import db_pool, offload, run_in
 from fastapi_app.dependencies import get_current_user, require_role
+from fastapi_app import images
+from fastapi_app.http_cache import conditional_get
 
 router = APIRouter()
 
-def get_db():
-    return sqlite3.connect("hospital_equipment_system.db")
+# The columns the API returns, in order; derived columns such as installation_epoch stay internal
+EQUIPMENT_COLUMNS = "equipment_id, type, manufacturer, location, criticality, installation_date"
 
 # Pydantic model
 class EquipmentIn(BaseModel):
@@ -23,17 +24,9 @@ class EquipmentIn(BaseModel):
     criticality: str
     installation_date: str
 
-# List Equipments (allowed for all authenticated users)
-@router.get("/")
-def list_equipments(
-    type: Optional[str] = Query(None),
-    location: Optional[str] = Query(None),
-    user=Depends(get_current_user)
-):
-    conn = get_db()
-    cursor = conn.cursor()
-
-    query = "SELECT * FROM equipment WHERE 1=1"
+def equipment_rows(conn, role, type=None, location=None):
+    """Equipment rows visible to `role`, optionally filtered by type and location"""
+    query = f"SELECT {EQUIPMENT_COLUMNS} FROM equipment WHERE 1=1"
     params = []
 
     if type:
@@ -44,56 +37,84 @@ def list_equipments(
         params.append(location)
 
     # Restrict technician to only "Scheduled" equipment
-    if user["role"] == "technician":
+    if role == "technician":
         query += " AND equipment_id IN (SELECT DISTINCT equipment_id FROM maintenance_logs WHERE status = 'Scheduled')"
 
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
+    return conn.execute(query, params).fetchall()
+
+# List Equipments (allowed for all authenticated users)
+@router.get("/")
+@offload(db_pool)
+def list_equipments(
+    request: Request,
+    response: Response,
+    type: Optional[str] = Query(None),
+    location: Optional[str] = Query(None),
+    user=Depends(get_current_user)
+):
+    conn = get_db()
+    # Technicians' lists depend on maintenance_logs too, so both versions feed the ETag
+    cached = conditional_get(conn, request, response, ["equipment", "maintenance_logs"], user["role"], type, location)
+    if cached:
+        conn.close()
+        return cached
+    rows = equipment_rows(conn, user["role"], type, location)
     conn.close()
     return {"equipments": rows}
 
-# Get Equipment Details + Trend Chart
-@router.get("/{equipment_id}")
-def get_equipment(equipment_id: str, user=Depends(get_current_user)):
-    from generate_equipment_report import fetch_equipment_metrics
-
+# Get Equipment Details + Trend Chart URL
+def _equipment_row(equipment_id, role):
+    """Equipment row and its trend chart version"""
     conn = get_db()
     cursor = conn.cursor()
 
     # Technician can access only "Scheduled" equipment
-    if user["role"] == "technician":
+    if role == "technician":
         cursor.execute("SELECT COUNT(*) FROM maintenance_logs WHERE equipment_id = ? AND status = 'Scheduled'", (equipment_id,))
         if cursor.fetchone()[0] == 0:
+            conn.close()
             raise HTTPException(status_code=403, detail="Not authorized for this equipment")
 
-    cursor.execute("SELECT * FROM equipment WHERE equipment_id = ?", (equipment_id,))
+    cursor.execute(f"SELECT {EQUIPMENT_COLUMNS} FROM equipment WHERE equipment_id = ?", (equipment_id,))
     row = cursor.fetchone()
+    version = images.trend_version(conn, equipment_id) if row else None
     conn.close()
+    return row, version
 
+@router.get("/{equipment_id}")
+async def get_equipment(equipment_id: str, user=Depends(get_current_user)):
+    row, version = await run_in(db_pool, _equipment_row, equipment_id, user["role"])
+    if not row:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+
+    # The chart itself is served by /{equipment_id}/trend and drawn only when its data changes
+    return {
+        "equipment": row,
+        "trend_plot_url": images.trend_url(equipment_id, version)
+    }
+
+@router.get("/{equipment_id}/trend", summary="Trend chart image")
+async def get_trend_chart(
+    equipment_id: str,
+    request: Request,
+    format: Literal["png", "webp"] = Query("png"),
+    dpi: Optional[int] = Query(None, ge=50, le=images.TREND_DPI),
+    v: Optional[str] = Query(None, description="Chart version from trend_plot_url"),
+    user=Depends(get_current_user)
+):
+    row, version = await run_in(db_pool, _equipment_row, equipment_id, user["role"])
     if not row:
         raise HTTPException(status_code=404, detail="Equipment not found")
+    if version is None:
+        raise HTTPException(status_code=404, detail="No usage logs for this equipment")
 
-    # Generate trend graph
-    try:
-        metrics = fetch_equipment_metrics(equipment_id)
-        chart_path = metrics.get("chart_path")
-        img_data = ""
-        if chart_path and os.path.exists(chart_path):
-            with open(chart_path, "rb") as f:
-                encoded = base64.b64encode(f.read()).decode('utf-8')
-                img_data = f"data:image/png;base64,{encoded}"
-        return {
-            "equipment": row,
-            "trend_plot": img_data
-        }
-    except Exception:
-        return {
-            "equipment": row,
-            "trend_plot": None
-        }
+    # A 304 is decided before any drawing; only a miss queues on the render pool
+    return await images.image_response(request, version, lambda: images.trend_chart(equipment_id, version),
+                                       images.TREND_DPI, format, dpi, v)
 
 # Add Equipment (admin only)
 @router.post("/", dependencies=[Depends(require_role("admin"))])
+@offload(db_pool)
 def add_equipment(data: EquipmentIn):
     conn = get_db()
     cursor = conn.cursor()
@@ -110,6 +131,7 @@ def add_equipment(data: EquipmentIn):
 
 # Update Equipment (admin only)
 @router.put("/{equipment_id}", dependencies=[Depends(require_role("admin"))])
+@offload(db_pool)
 def update_equipment(equipment_id: str, data: EquipmentIn):
     conn = get_db()
     cursor = conn.cursor()
@@ -126,6 +148,7 @@ def update_equipment(equipment_id: str, data: EquipmentIn):
 
 # Delete Equipment (admin only)
 @router.delete("/{equipment_id}", dependencies=[Depends(require_role("admin"))])
+@offload(db_pool)
 def delete_equipment(equipment_id: str):
     conn = get_db()
     cursor = conn.cursor()
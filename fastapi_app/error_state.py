@@ -0,0 +1,280 @@
+# fastapi_app/error_state.py
+"""Streaming detector for sustained error streaks and rising error/temperature levels.
+
+Each usage_logs reading is folded into a fixed-size state per device
+(current high-error streak, EWMAs of error_count and avg_cpu_temp, and when
+each EWMA crossed its alert level). A batch therefore costs O(new rows),
+however much history the table holds. Rows are consumed in log_id order from
+where the previous batch stopped. high_error_state lists the devices whose
+current streak is at least MIN_STREAK_DAYS long.
+
+The API runs it as a background job (kind "error_detector") every
+DETECTOR_INTERVAL seconds, so GET /alerts/fleet only reads the stored state.
+
+    python -m fastapi_app.error_state            # process rows added since the last run
+    python -m fastapi_app.error_state --rebuild  # reset the state and replay every log
+"""
+import argparse
+import math
+import os
+import threading
+import time
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from fastapi_app.database import get_db
+from fastapi_app.dependencies import get_current_user
+from fastapi_app.executors import db_pool, offload
+from fastapi_app import jobs
+from fastapi_app.migrations import run_migrations
+from fastapi_app.timestamps import SECONDS_PER_DAY
+
+router = APIRouter()
+
+HIGH_ERROR_DAY = 2.0      # errors within one day that make it a high-error day
+MIN_STREAK_DAYS = 3       # consecutive high-error days before a device enters high_error_state
+EWMA_ALPHA = 0.2
+EWMA_ERROR_ALERT = 1.5    # errors per reading
+EWMA_TEMP_ALERT = 70.0    # °C
+BATCH_ROWS = 50_000
+PROGRESS_NAME = "error_state"
+JOB_KIND = "error_detector"
+DETECTOR_INTERVAL = float(os.environ.get("HOSPITAL_DETECTOR_INTERVAL", "60"))
+# Day numbers are days since 1970-01-01; date.fromordinal needs them shifted
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class DeviceState:
+    __slots__ = ("equipment_id", "last_epoch", "day", "day_errors", "streak_days", "streak_start_day",
+                 "last_high_day", "ewma_errors", "ewma_temp", "error_alert_since", "temp_alert_since")
+
+    def __init__(self, equipment_id, last_epoch=None, day=None, day_errors=0.0, streak_days=0,
+                 streak_start_day=None, last_high_day=None, ewma_errors=None, ewma_temp=None,
+                 error_alert_since=None, temp_alert_since=None):
+        self.equipment_id = equipment_id
+        self.last_epoch = last_epoch
+        self.day = day
+        self.day_errors = day_errors
+        self.streak_days = streak_days
+        self.streak_start_day = streak_start_day
+        self.last_high_day = last_high_day
+        self.ewma_errors = ewma_errors
+        self.ewma_temp = ewma_temp
+        self.error_alert_since = error_alert_since
+        self.temp_alert_since = temp_alert_since
+
+    def row(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+
+def update(state, ts_epoch, error_count, avg_cpu_temp):
+    """Fold one reading into `state`; returns False for a reading older than the last one seen"""
+    if state.last_epoch is not None and ts_epoch < state.last_epoch:
+        return False
+    error_count = 0.0 if error_count is None or math.isnan(error_count) else error_count
+
+    day = ts_epoch // SECONDS_PER_DAY
+    if day != state.day:
+        state.day, state.day_errors = day, 0.0
+        # A whole day went by without reaching HIGH_ERROR_DAY, so the streak is over
+        if state.streak_days and state.last_high_day < day - 1:
+            state.streak_days, state.streak_start_day = 0, None
+
+    was_high = state.day_errors >= HIGH_ERROR_DAY
+    state.day_errors += error_count
+    if not was_high and state.day_errors >= HIGH_ERROR_DAY:
+        if state.streak_days and state.last_high_day == day - 1:
+            state.streak_days += 1
+        else:
+            state.streak_days, state.streak_start_day = 1, day
+        state.last_high_day = day
+
+    state.ewma_errors = _ewma(state.ewma_errors, error_count)
+    if state.ewma_errors >= EWMA_ERROR_ALERT:
+        state.error_alert_since = state.error_alert_since or ts_epoch
+    else:
+        state.error_alert_since = None
+
+    if avg_cpu_temp is not None and not math.isnan(avg_cpu_temp):
+        state.ewma_temp = _ewma(state.ewma_temp, avg_cpu_temp)
+        if state.ewma_temp >= EWMA_TEMP_ALERT:
+            state.temp_alert_since = state.temp_alert_since or ts_epoch
+        else:
+            state.temp_alert_since = None
+
+    state.last_epoch = ts_epoch
+    return True
+
+
+def _ewma(previous, value):
+    return value if previous is None else EWMA_ALPHA * value + (1 - EWMA_ALPHA) * previous
+
+
+def _day_to_iso(day):
+    return date.fromordinal(_EPOCH_ORDINAL + day).isoformat()
+
+
+def process_new_logs(conn, rebuild=False):
+    """Consume usage_logs rows added since the last call; returns the number of rows processed"""
+    cursor = conn.cursor()
+    if rebuild:
+        cursor.execute("DELETE FROM error_detector_state")
+        cursor.execute("DELETE FROM high_error_state")
+        cursor.execute("DELETE FROM detector_progress WHERE name = ?", (PROGRESS_NAME,))
+        conn.commit()
+
+    cursor.execute("SELECT last_log_id FROM detector_progress WHERE name = ?", (PROGRESS_NAME,))
+    row = cursor.fetchone()
+    last_log_id = row[0] if row else 0
+
+    cursor.execute("SELECT * FROM error_detector_state")
+    states = {row[0]: DeviceState(*row) for row in cursor.fetchall()}
+    changed = set()
+    processed = 0
+
+    cursor.execute("""
+        SELECT log_id, equipment_id, ts_epoch, error_count, avg_cpu_temp
+        FROM usage_logs
+        WHERE log_id > ? AND ts_epoch IS NOT NULL
+        ORDER BY log_id
+    """, (last_log_id,))
+    while True:
+        rows = cursor.fetchmany(BATCH_ROWS)
+        if not rows:
+            break
+        for log_id, equipment_id, ts_epoch, error_count, avg_cpu_temp in rows:
+            state = states.get(equipment_id)
+            if state is None:
+                state = states[equipment_id] = DeviceState(equipment_id)
+            if update(state, ts_epoch, error_count, avg_cpu_temp):
+                changed.add(equipment_id)
+        processed += len(rows)
+        last_log_id = rows[-1][0]
+
+    if not processed:
+        return 0
+
+    # Two overlapping batches start from the same saved state and read the same
+    # rows, so whichever commits last writes identical results
+    placeholders = ", ".join("?" * len(DeviceState.__slots__))
+    cursor.execute("BEGIN")
+    cursor.executemany(
+        f"INSERT OR REPLACE INTO error_detector_state ({', '.join(DeviceState.__slots__)}) VALUES ({placeholders})",
+        [states[eid].row() for eid in changed],
+    )
+    streaks = [states[eid] for eid in changed if states[eid].streak_days >= MIN_STREAK_DAYS]
+    cursor.executemany("""
+        INSERT INTO high_error_state (equipment_id, start_date, streak_days) VALUES (?, ?, ?)
+        ON CONFLICT(equipment_id) DO UPDATE SET start_date = excluded.start_date, streak_days = excluded.streak_days
+    """, [(s.equipment_id, _day_to_iso(s.streak_start_day), s.streak_days) for s in streaks])
+    cursor.executemany(
+        "DELETE FROM high_error_state WHERE equipment_id = ?",
+        [(eid,) for eid in changed if states[eid].streak_days < MIN_STREAK_DAYS],
+    )
+    cursor.execute("""
+        INSERT INTO detector_progress (name, last_log_id) VALUES (?, ?)
+        ON CONFLICT(name) DO UPDATE SET last_log_id = excluded.last_log_id
+    """, (PROGRESS_NAME, last_log_id))
+    conn.commit()
+    return processed
+
+
+def run_detector(progress):
+    """Job body: fold the readings logged since the last run into the detector state"""
+    conn = get_db()
+    progress.stage("process_logs")
+    try:
+        return {"processed_logs": process_new_logs(conn)}
+    finally:
+        conn.close()
+
+
+def start_detector(interval=DETECTOR_INTERVAL):
+    """Daemon thread submitting a detector job every interval seconds"""
+    def _loop():
+        while True:
+            try:
+                # A run still active, in this process or another worker, is joined rather than duplicated
+                jobs.submit(JOB_KIND, run_detector)
+            except Exception as e:
+                print(f"Error detector job could not be submitted: {e}", flush=True)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=_loop, name="error-detector", daemon=True)
+    thread.start()
+    return thread
+
+
+# --- Fleet alerts ---
+@router.get("/fleet")
+@offload(db_pool)
+def fleet_alerts(
+    location: Optional[str] = Query(None),
+    user=Depends(get_current_user)
+):
+    # Read-only: the detector job keeps the state current
+    conn = get_db()
+    row = conn.execute("SELECT last_log_id FROM detector_progress WHERE name = ?", (PROGRESS_NAME,)).fetchone()
+    pending = conn.execute("SELECT COUNT(*) FROM usage_logs WHERE log_id > ? AND ts_epoch IS NOT NULL",
+                           (row[0] if row else 0,)).fetchone()[0]
+
+    query = """
+        SELECT s.equipment_id, e.type, e.location, h.start_date, COALESCE(h.streak_days, 0),
+               s.ewma_errors, s.ewma_temp, s.error_alert_since, s.temp_alert_since, s.last_epoch
+        FROM error_detector_state s
+        JOIN equipment e ON e.equipment_id = s.equipment_id
+        LEFT JOIN high_error_state h ON h.equipment_id = s.equipment_id
+        WHERE (h.equipment_id IS NOT NULL OR s.error_alert_since IS NOT NULL OR s.temp_alert_since IS NOT NULL)
+    """
+    params = []
+    if location:
+        query += " AND e.location = ?"
+        params.append(location)
+    query += " ORDER BY COALESCE(h.streak_days, 0) DESC, s.ewma_errors DESC"
+
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    conn.close()
+
+    alerts = []
+    for (eid, eq_type, eq_location, streak_start, streak_days, ewma_errors, ewma_temp,
+         error_since, temp_since, last_epoch) in rows:
+        reasons = []
+        if streak_days:
+            reasons.append("error_streak")
+        if error_since is not None:
+            reasons.append("error_rate")
+        if temp_since is not None:
+            reasons.append("cpu_temp")
+        alerts.append({
+            "equipment_id": eid,
+            "type": eq_type,
+            "location": eq_location,
+            "reasons": reasons,
+            "streak_start": streak_start,
+            "streak_days": streak_days,
+            "ewma_errors": round(ewma_errors, 3) if ewma_errors is not None else None,
+            "ewma_cpu_temp": round(ewma_temp, 2) if ewma_temp is not None else None,
+            "error_alert_since": error_since,
+            "temp_alert_since": temp_since,
+            "last_reading_epoch": last_epoch,
+        })
+
+    # Readings logged since the detector's last run, not yet reflected in the alerts
+    return {"pending_logs": pending, "alerts": alerts}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update high_error_state from new usage logs")
+    parser.add_argument("--rebuild", action="store_true", help="Reset detector state and replay every log")
+    args = parser.parse_args()
+
+    conn = get_db()
+    run_migrations(conn)
+    rows = process_new_logs(conn, rebuild=args.rebuild)
+    active = conn.execute("SELECT COUNT(*) FROM high_error_state").fetchone()[0]
+    conn.close()
+    print(f"Processed {rows} usage_logs rows; {active} devices in high_error_state")
@@ -0,0 +1,48 @@
+# fastapi_app/executors.py
+"""Bounded thread pools for blocking work, sized per kind of work.
+
+Route handlers are async and hand their blocking parts to one of these pools,
+so slow chart, model or LLM requests queue behind each other instead of
+taking every thread in Starlette's shared pool from quick DB reads.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+DB_THREADS = int(os.environ.get("HOSPITAL_DB_THREADS", "8"))
+CPU_THREADS = int(os.environ.get("HOSPITAL_CPU_THREADS", str(max(2, (os.cpu_count() or 2) // 2))))
+LLM_THREADS = int(os.environ.get("HOSPITAL_LLM_THREADS", "4"))
+
+# sqlite3 reads/writes and the pandas work around them
+db_pool = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+# Model inference, scaling and password hashing
+cpu_pool = ThreadPoolExecutor(max_workers=CPU_THREADS, thread_name_prefix="cpu")
+# pyplot keeps global figure state, so charts are drawn on a single thread
+render_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+# Outbound calls to the local LLM; mostly waiting on the network
+llm_pool = ThreadPoolExecutor(max_workers=LLM_THREADS, thread_name_prefix="llm")
+# Background jobs (fastapi_app/jobs.py); requests only enqueue them
+job_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job")
+
+
+async def run_in(pool, fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on `pool` and await it, keeping the request's context (stage timings)"""
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(pool, call)
+
+
+def offload(pool):
+    """Turn a blocking route handler into an async one that runs on `pool`.
+
+    Place it below the @router decorator; FastAPI reads the parameters of the
+    wrapped function.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def handler(*args, **kwargs):
+            return await run_in(pool, fn, *args, **kwargs)
+        return handler
+    return decorate
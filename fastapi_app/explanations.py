@@ -0,0 +1,69 @@
+# fastapi_app/explanations.py
+"""Per-device explanations of the LightGBM failure score.
+
+The fleet prediction run asks LightGBM for pred_contrib instead of
+predict_proba. Each row holds one log-odds contribution per input (feature x
+timestep of the window) plus the bias, and sums to the raw score, so the
+probability comes from the same pass. summarize() keeps the top-k of them
+per device. The run stores the results in prediction_explanations
+(migration 10) as ready-to-send JSON, so /predict/{id}/explain is a single
+key lookup.
+"""
+import json
+import os
+
+from fastapi_app.sequences import FEATURES, WINDOW
+
+TOP_K = int(os.environ.get("HOSPITAL_EXPLAIN_TOP_K", "5"))
+# Windows are oldest first; t-0 is the newest reading
+TIMESTEPS = [f"t-{WINDOW - 1 - t}" for t in range(WINDOW)]
+
+
+def _top(values, k):
+    """Indices of the k largest |values| per row, largest first"""
+    import numpy as np
+
+    k = min(k, values.shape[1])
+    idx = np.argpartition(-np.abs(values), k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.abs(np.take_along_axis(values, idx, axis=1)), axis=1)
+    return np.take_along_axis(idx, order, axis=1)
+
+
+def summarize(contrib, k=TOP_K):
+    """One explanation dict per row of LightGBM pred_contrib output"""
+    n = contrib.shape[0]
+    cells = contrib[:, :-1].reshape(n, WINDOW, len(FEATURES))
+    bias = contrib[:, -1]
+    by_feature = cells.sum(axis=1)
+    by_timestep = cells.sum(axis=2)
+    flat = cells.reshape(n, -1)
+    top_features, top_cells = _top(by_feature, k), _top(flat, k)
+
+    summaries = []
+    for i in range(n):
+        summaries.append({
+            "base_value": round(float(bias[i]), 4),
+            "raw_score": round(float(contrib[i].sum()), 4),
+            "top_features": [{"feature": FEATURES[f], "contribution": round(float(by_feature[i, f]), 4)}
+                             for f in top_features[i]],
+            "timesteps": [{"timestep": TIMESTEPS[t], "contribution": round(float(by_timestep[i, t]), 4)}
+                          for t in range(WINDOW)],
+            "top_inputs": [{"feature": FEATURES[c % len(FEATURES)], "timestep": TIMESTEPS[c // len(FEATURES)],
+                            "contribution": round(float(flat[i, c]), 4)} for c in top_cells[i]],
+        })
+    return summaries
+
+
+def store(cursor, run_id, rows):
+    """Upsert (equipment_id, explanation dict) pairs inside the caller's transaction"""
+    cursor.executemany("""
+        INSERT INTO prediction_explanations (equipment_id, run_id, explanation) VALUES (?, ?, ?)
+        ON CONFLICT(equipment_id) DO UPDATE SET run_id = excluded.run_id, explanation = excluded.explanation
+    """, [(eid, run_id, json.dumps(explanation, separators=(",", ":"))) for eid, explanation in rows])
+
+
+def load(conn, equipment_id):
+    """Stored explanation JSON text of a device, or None"""
+    row = conn.execute("SELECT explanation FROM prediction_explanations WHERE equipment_id = ?",
+                       (equipment_id,)).fetchone()
+    return row[0] if row else None
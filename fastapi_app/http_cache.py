@@ -0,0 +1,77 @@
+# fastapi_app/http_cache.py
+"""ETags and conditional GET helpers.
+
+An ETag is a hash of whatever version the response was built from, so the
+check costs one cheap lookup instead of rebuilding the response. JSON read
+endpoints use the table_versions counters (migration 7): conditional_get()
+reads them, and answers 304 before the endpoint runs its own queries.
+"""
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Response
+
+# Versioned URLs (?v=<version>) never change content; anything else is revalidated every time
+IMMUTABLE = "private, max-age=31536000, immutable"
+REVALIDATE = "private, no-cache"
+
+
+def etag_for(*parts):
+    """Strong ETag from the parts a response was built from"""
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def is_fresh(request, etag):
+    """True when the client already holds `etag` (If-None-Match uses weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def not_modified(etag, cache_control=REVALIDATE, last_modified=None):
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return Response(status_code=304, headers=headers)
+
+
+# --- Table versions ---
+def table_versions(conn, tables):
+    """'version:modified_epoch' of each table, in the order given"""
+    rows = dict(conn.execute(
+        f"SELECT name, version || ':' || modified_epoch FROM table_versions WHERE name IN ({', '.join('?' * len(tables))})",
+        tables,
+    ).fetchall())
+    return [rows[table] for table in tables]
+
+
+def _modified_since(request, epoch):
+    header = request.headers.get("if-modified-since")
+    if not header:
+        return True
+    try:
+        return epoch > parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return True
+
+
+def conditional_get(conn, request, response, tables, *vary):
+    """A 304 response if the client's copy is current, else None.
+
+    `vary` holds whatever else the body depends on (role, username, query
+    parameters). On None the ETag and Last-Modified headers are set on
+    `response` and the caller builds the body as usual.
+    """
+    versions = table_versions(conn, tables)
+    etag = etag_for(*tables, *versions, *vary)
+    modified = max(int(version.split(":")[1]) for version in versions)
+    last_modified = formatdate(modified, usegmt=True)
+    # If-None-Match takes precedence; If-Modified-Since is only consulted without it
+    if is_fresh(request, etag) or ("if-none-match" not in request.headers and not _modified_since(request, modified)):
+        return not_modified(etag, last_modified=last_modified)
+    response.headers.update({"ETag": etag, "Last-Modified": last_modified, "Cache-Control": REVALIDATE})
+    return None
@@ -0,0 +1,148 @@
+# fastapi_app/images.py
+"""Rendered charts, cached on disk by the version of the data they show.
+
+A trend chart's version comes from its device's usage_daily rows, and the
+EDA dashboard's from a hash of the tables it is drawn from. A chart is drawn
+once per version, and reduced-DPI and WebP variants are made from that
+master with Pillow on first request. The endpoints send these files as
+binary responses with the version as a strong ETag, so an unchanged chart
+costs one small query and a 304.
+"""
+import glob
+import os
+
+from fastapi.responses import FileResponse
+
+from fastapi_app.database import get_db
+from fastapi_app.executors import render_pool, run_in
+from fastapi_app.http_cache import IMMUTABLE, REVALIDATE, etag_for, is_fresh, not_modified
+from fastapi_app.instrumentation import stage
+
+CACHE_DIR = os.path.join("charts", "cache")
+MEDIA_TYPES = {"png": "image/png", "webp": "image/webp"}
+# Bump when a chart's drawing code changes, so cached files are redrawn
+RENDER_VERSION = 1
+TREND_DPI = 300
+EDA_DPI = 150
+WEBP_QUALITY = 85
+
+
+# --- Versions ---
+def trend_version(conn, equipment_id):
+    """Version of a device's trend chart; None if the device has no usage yet"""
+    readings, total, last_day = conn.execute(
+        "SELECT COUNT(*), SUM(readings), MAX(day) FROM usage_daily WHERE equipment_id = ?", (equipment_id,)
+    ).fetchone()
+    if not readings:
+        return None
+    return etag_for(RENDER_VERSION, equipment_id, readings, total, last_day).strip('"')
+
+
+def eda_version(data):
+    import pandas as pd
+
+    hashes = [int(pd.util.hash_pandas_object(frame, index=False).sum()) for frame in data.values()]
+    return etag_for(RENDER_VERSION, *hashes).strip('"')
+
+
+def trend_url(equipment_id, version):
+    return f"/equipments/{equipment_id}/trend?v={version}" if version else None
+
+
+# --- Files ---
+def _replace_older(prefix, path):
+    """Drop the cached files of earlier versions of the chart at `path`"""
+    for old in glob.glob(os.path.join(CACHE_DIR, glob.escape(prefix) + ".*")):
+        if not old.startswith(os.path.splitext(path)[0] + "."):
+            try:
+                os.unlink(old)
+            except FileNotFoundError:
+                pass
+
+
+def _render_once(prefix, version, render):
+    """Path of the master PNG for this version, calling render(path) if it is not on disk"""
+    path = os.path.join(CACHE_DIR, f"{prefix}.{version}.png")
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.png"
+        render(tmp_path)
+        os.replace(tmp_path, path)
+        _replace_older(prefix, path)
+    return path
+
+
+def variant(master, master_dpi, fmt="png", dpi=None):
+    """`master` re-encoded as `fmt` and scaled down to `dpi`, cached next to it"""
+    from PIL import Image
+
+    if dpi is not None and dpi >= master_dpi:
+        dpi = None
+    if fmt == "png" and dpi is None:
+        return master
+    path = f"{os.path.splitext(master)[0]}.{dpi or master_dpi}dpi.{fmt}"
+    if not os.path.exists(path):
+        with stage("image_variant"), Image.open(master) as image:
+            if dpi is not None:
+                scale = dpi / master_dpi
+                image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                     Image.LANCZOS)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            if fmt == "webp":
+                image.save(tmp_path, format="WEBP", quality=WEBP_QUALITY, method=4)
+            else:
+                image.save(tmp_path, format="PNG", optimize=True)
+        os.replace(tmp_path, path)
+    return path
+
+
+def trend_chart(equipment_id, version=None):
+    """Master PNG of a device's trend chart at its current version"""
+    from generate_equipment_report import load_daily_usage, render_trend_chart
+
+    conn = get_db()
+    try:
+        version = version or trend_version(conn, equipment_id)
+        if version is None:
+            raise ValueError(f"No usage logs found for {equipment_id}")
+
+        def render(path):
+            daily_usage = load_daily_usage(conn, equipment_id)
+            with stage("chart_render"):
+                render_trend_chart(equipment_id, daily_usage, path)
+
+        return _render_once(f"trend_{equipment_id}", version, render)
+    finally:
+        conn.close()
+
+
+def eda_data():
+    """(version, tables) of the EDA dashboard"""
+    from generate_eda_image import load_eda_data
+
+    data = load_eda_data()
+    return eda_version(data), data
+
+
+def eda_chart(version, data):
+    """Master PNG of the EDA dashboard at `version`, drawn from the tables eda_data() returned"""
+    from generate_eda_image import generate_eda_image
+
+    return _render_once("eda_overall", version, lambda path: generate_eda_image(path, data))
+
+
+# --- Responses ---
+async def image_response(request, version, make_master, master_dpi, fmt="png", dpi=None, requested_version=None):
+    """304 if the client holds this version, otherwise the image file.
+
+    The 304 is decided on the event loop; only a miss takes a turn on the
+    render pool, which calls make_master() and makes the variant. Requests for
+    the current version by URL (?v=) may be cached for good, since that URL
+    never changes content.
+    """
+    etag = etag_for(version, fmt, dpi)
+    cache_control = IMMUTABLE if requested_version == version else REVALIDATE
+    if is_fresh(request, etag):
+        return not_modified(etag, cache_control)
+    path = await run_in(render_pool, lambda: variant(make_master(), master_dpi, fmt, dpi))
+    return FileResponse(path, media_type=MEDIA_TYPES[fmt], headers={"ETag": etag, "Cache-Control": cache_control})
@@ -0,0 +1,66 @@
+# fastapi_app/inference_server.py
+"""Dedicated inference process serving the models to API workers over a local socket.
+
+    HOSPITAL_INFERENCE_KEY=<secret> python -m fastapi_app.inference_server --address /tmp/hospital-inference.sock
+
+API workers started with HOSPITAL_INFERENCE_ADDRESS pointing at the same
+address and the same HOSPITAL_INFERENCE_KEY send their model_store.failure_probabilities / priority_classes
+calls here. This process is the only one that loads the models.
+"""
+import argparse
+import os
+import threading
+from multiprocessing.connection import Listener
+
+from fastapi_app import model_store
+
+DEFAULT_ADDRESS = "/tmp/hospital-inference.sock"
+
+HANDLERS = {
+    "failure_probabilities": model_store.failure_probabilities,
+    "priority_classes": model_store.priority_classes,
+}
+
+
+def _handle(conn):
+    with conn:
+        while True:
+            try:
+                method, args = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                conn.send(("ok", HANDLERS[method](*args)))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+def serve(address=DEFAULT_ADDRESS, ready=None):
+    """Load every model, then answer calls with one thread per API-worker connection"""
+    # Calls arrive pickled; only clients holding the key may send them
+    if model_store.INFERENCE_AUTHKEY is None:
+        raise RuntimeError("HOSPITAL_INFERENCE_KEY must be set before serving inference")
+    # This process answers calls itself, whatever HOSPITAL_INFERENCE_ADDRESS says
+    model_store.INFERENCE_ADDRESS = None
+    timings = model_store.preload(model_store.MODELS)
+    print(f"Inference server loaded {timings}", flush=True)
+
+    parsed = model_store.parse_address(address)
+    if isinstance(parsed, str) and os.path.exists(parsed):
+        os.unlink(parsed)
+    with Listener(parsed, authkey=model_store.INFERENCE_AUTHKEY) as listener:
+        print(f"Inference server listening on {address} (pid {os.getpid()})", flush=True)
+        if ready is not None:
+            ready.set()
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_handle, args=(conn,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve model inference to API workers")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="Unix socket path or host:port")
+    args = parser.parse_args()
+    if model_store.INFERENCE_AUTHKEY is None:
+        parser.error("set HOSPITAL_INFERENCE_KEY to a secret shared with the API workers")
+    serve(args.address)
@@ -0,0 +1,233 @@
+# fastapi_app/instrumentation.py
+"""Request and stage timing, exported as Prometheus histograms on /metrics.
+
+Wrap expensive work in `with stage("name"):`. Inside a request the timing is
+attributed to the matched route and, with HOSPITAL_SERVER_TIMING=1, echoed in
+a Server-Timing response header; outside a request (scripts, startup model
+loads) it is recorded with an empty route.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+from fastapi_app import query_trace
+from fastapi_app.dependencies import require_role
+
+router = APIRouter()
+
+SERVER_TIMING = os.environ.get("HOSPITAL_SERVER_TIMING", "0") == "1"
+LOCAL_CLIENTS = {"127.0.0.1", "::1", "localhost"}
+# Prometheus default buckets, extended for chart rendering and LLM calls
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage timings of the request being handled, as a list of (stage, seconds)
+_request_stages = ContextVar("request_stages", default=None)
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, seconds):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in items]
+        for labels, counts, total, count in items:
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            sep = "," if base else ""
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request", ("method", "route", "status")
+)
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds", "Time spent in a named stage of request handling", ("route", "stage")
+)
+
+
+@contextmanager
+def stage(name):
+    """Time a block as stage `name` (db_query, model_load, lgbm_predict, chart_render, ...)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stages = _request_stages.get()
+        if stages is None:
+            STAGE_DURATION.observe(("", name), elapsed)
+        else:
+            stages.append((name, elapsed))
+
+
+# --- Process memory ---
+def process_memory(pid="self"):
+    """Resident, proportional, shared and private memory of a process in bytes.
+
+    PSS splits copy-on-write pages between the processes sharing them, so the
+    PSS of all workers sums to their real footprint. Linux only; elsewhere
+    just the peak RSS of this process is known.
+    """
+    fields = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared", "Shared_Dirty": "shared",
+              "Private_Clean": "private", "Private_Dirty": "private"}
+    memory = {"rss": 0, "pss": 0, "shared": 0, "private": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    memory[fields[key]] += int(value.split()[0]) * 1024
+    except OSError:
+        import resource
+        memory["rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return memory
+
+
+# --- SQLite connection whose queries are timed as the db_query stage and traced ---
+class TimedCursor(sqlite3.Cursor):
+    _statement = None  # (sql, params, shape) of the last execute
+    _elapsed = 0.0     # time spent on that execution so far, fetches included
+
+    def execute(self, sql, parameters=()):
+        self._statement = (sql, parameters, query_trace.param_shape(parameters))
+        self._elapsed = 0.0
+        return self._traced(super().execute, (sql, parameters), calls=1)
+
+    def executemany(self, sql, seq_of_parameters):
+        rows = list(seq_of_parameters)
+        self._statement = (sql, rows[0] if rows else (), query_trace.param_shape(rows, many=True))
+        self._elapsed = 0.0
+        return self._traced(super().executemany, (sql, rows), calls=1)
+
+    def fetchone(self):
+        return self._traced(super().fetchone, (), count=lambda row: 0 if row is None else 1)
+
+    def fetchall(self):
+        return self._traced(super().fetchall, (), count=len)
+
+    def fetchmany(self, *args):
+        return self._traced(super().fetchmany, args, count=len)
+
+    def _traced(self, call, args, calls=0, count=None):
+        started = time.perf_counter()
+        with stage("db_query"):
+            result = call(*args)
+        elapsed = time.perf_counter() - started
+        if self._statement is not None:
+            sql, params, shape = self._statement
+            before, self._elapsed = self._elapsed, self._elapsed + elapsed
+            threshold = query_trace.SLOW_QUERY_MS / 1000
+            query_trace.record(self.connection, sql, params, shape, elapsed,
+                               rows=count(result) if count else 0, calls=calls,
+                               execution_elapsed=self._elapsed,
+                               crossed=before < threshold <= self._elapsed)
+        return result
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute does not go through Cursor.execute, so route it explicitly
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+
+# --- Middleware ---
+def _route_template(scope):
+    """Full path with parameter values put back as {name}, so series stay bounded per route"""
+    if scope.get("route") is None:
+        return "unmatched"
+    path = scope["path"]
+    for name, value in scope.get("path_params", {}).items():
+        path = path.replace(f"/{value}", f"/{{{name}}}", 1)
+    return path
+
+
+async def timing_middleware(request: Request, call_next):
+    stages = []
+    token = _request_stages.set(stages)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        _request_stages.reset(token)
+        route = _route_template(request.scope)
+        REQUEST_DURATION.observe((request.method, route, str(status)), elapsed)
+        for name, seconds in stages:
+            STAGE_DURATION.observe((route, name), seconds)
+
+    if SERVER_TIMING:
+        totals = {}
+        for name, seconds in stages:
+            totals[name] = totals.get(name, 0.0) + seconds
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items()]
+        entries.append(f"total;dur={elapsed * 1000:.1f}")
+        response.headers["Server-Timing"] = ", ".join(entries)
+    return response
+
+
+# --- Slow-query report (admin only) ---
+@router.get("/admin/slow-queries", dependencies=[Depends(require_role("admin"))])
+def slow_queries(top: int = Query(20, ge=1, le=200), sort: str = Query("total_ms")):
+    if sort not in query_trace.SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {list(query_trace.SORT_KEYS)}")
+    return {
+        "threshold_ms": query_trace.SLOW_QUERY_MS,
+        "queries": query_trace.report(top, sort),
+    }
+
+
+# --- Prometheus scrape endpoint (local clients only) ---
+@router.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    if request.client is None or request.client.host not in LOCAL_CLIENTS:
+        raise HTTPException(status_code=403, detail="Metrics are only served to local clients")
+    memory = process_memory()
+    gauges = [
+        "# HELP process_memory_bytes Memory of the worker that served this scrape",
+        "# TYPE process_memory_bytes gauge",
+    ]
+    gauges += [f'process_memory_bytes{{pid="{os.getpid()}",kind="{kind}"}} {value}' for kind, value in memory.items()]
+    body = "\n".join([REQUEST_DURATION.render(), STAGE_DURATION.render(), *gauges]) + "\n"
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
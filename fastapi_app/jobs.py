@@ -0,0 +1,161 @@
+# fastapi_app/jobs.py
+"""Background jobs with one active job per kind.
+
+submit() records a job in the jobs table (migration 8) and runs it on
+job_pool, returning at once. A submit while a job of the same kind is queued
+or running returns that job instead, even from another worker process: the
+partial unique index on jobs(kind) admits only one active row. The running
+job stamps a heartbeat, and an active job whose heartbeat is older than
+JOB_STALE_SECONDS (its worker died) is marked failed so a new one can start.
+
+The job function gets a Progress; each stage() call records the stage name,
+its item count and the seconds the previous stage took.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from fastapi_app.database import get_db
+from fastapi_app.executors import job_pool
+
+JOB_STALE_SECONDS = float(os.environ.get("HOSPITAL_JOB_STALE_SECONDS", "600"))
+HEARTBEAT_SECONDS = 10
+ACTIVE = ("queued", "running")
+COLUMNS = ["job_id", "kind", "status", "requested_by", "stage", "done", "total", "stage_seconds", "result",
+           "error", "created_epoch", "started_epoch", "heartbeat_epoch", "finished_epoch"]
+
+
+class Progress:
+    """Stage and item progress of a job; Progress(None) only times the stages"""
+
+    def __init__(self, job_id=None):
+        self.job_id = job_id
+        self.stage_seconds = {}
+        self._stage = None
+        self._stage_started = None
+
+    def stage(self, name, total=None):
+        """Start stage `name`, closing the previous one"""
+        self._close_stage()
+        self._stage, self._stage_started = name, time.perf_counter()
+        self._update("stage = ?, done = 0, total = ?", name, total)
+
+    def advance(self, done):
+        self._update("done = ?", done)
+
+    def _close_stage(self):
+        if self._stage is not None:
+            self.stage_seconds[self._stage] = round(time.perf_counter() - self._stage_started, 3)
+
+    def _update(self, assignments, *params):
+        if self.job_id is None:
+            return
+        conn = get_db()
+        conn.execute(f"UPDATE jobs SET {assignments}, stage_seconds = ?, heartbeat_epoch = ? WHERE job_id = ?",
+                     (*params, json.dumps(self.stage_seconds), time.time(), self.job_id))
+        conn.commit()
+        conn.close()
+
+
+def _as_dict(row):
+    job = dict(zip(COLUMNS, row))
+    for column in ("stage_seconds", "result"):
+        job[column] = json.loads(job[column]) if job[column] else None
+    end = job["finished_epoch"] or (time.time() if job["started_epoch"] else None)
+    job["seconds"] = round(end - job["started_epoch"], 3) if end and job["started_epoch"] else None
+    job["queued_seconds"] = round((job["started_epoch"] or time.time()) - job["created_epoch"], 3)
+    return job
+
+
+def get_job(job_id):
+    conn = get_db()
+    row = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    conn.close()
+    return _as_dict(row) if row else None
+
+
+def recent_jobs(kind, limit=20):
+    conn = get_db()
+    rows = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE kind = ? ORDER BY created_epoch DESC LIMIT ?",
+                        (kind, limit)).fetchall()
+    conn.close()
+    return [_as_dict(row) for row in rows]
+
+
+def submit(kind, fn, requested_by=None):
+    """(job, created): the active job of this kind, or a new one running fn(progress)"""
+    conn = get_db()
+    cursor = conn.cursor()
+    now = time.time()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(f"SELECT job_id, COALESCE(heartbeat_epoch, created_epoch) FROM jobs "
+                       f"WHERE kind = ? AND status IN {ACTIVE}", (kind,))
+        active = cursor.fetchone()
+        if active and now - active[1] <= JOB_STALE_SECONDS:
+            conn.commit()
+            return get_job(active[0]), False
+        if active:
+            cursor.execute("UPDATE jobs SET status = 'failed', error = 'abandoned: no heartbeat', finished_epoch = ? "
+                           "WHERE job_id = ?", (now, active[0]))
+        job_id = uuid.uuid4().hex
+        cursor.execute("INSERT INTO jobs (job_id, kind, status, requested_by, created_epoch) VALUES (?, ?, 'queued', ?, ?)",
+                       (job_id, kind, requested_by, now))
+        conn.commit()
+    except sqlite3.IntegrityError:
+        # Another process inserted its job between our check and insert; join it
+        conn.rollback()
+        row = conn.execute(f"SELECT job_id FROM jobs WHERE kind = ? AND status IN {ACTIVE}", (kind,)).fetchone()
+        return get_job(row[0]), False
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    job_pool.submit(_run, job_id, fn)
+    return get_job(job_id), True
+
+
+def _finish(job_id, status, progress, result=None, error=None):
+    progress._close_stage()
+    conn = get_db()
+    conn.execute("UPDATE jobs SET status = ?, stage_seconds = ?, result = ?, error = ?, finished_epoch = ? "
+                 "WHERE job_id = ?",
+                 (status, json.dumps(progress.stage_seconds), None if result is None else json.dumps(result),
+                  error, time.time(), job_id))
+    conn.commit()
+    conn.close()
+
+
+def _heartbeat(job_id, stop):
+    while not stop.wait(HEARTBEAT_SECONDS):
+        conn = get_db()
+        conn.execute("UPDATE jobs SET heartbeat_epoch = ? WHERE job_id = ?", (time.time(), job_id))
+        conn.commit()
+        conn.close()
+
+
+def _run(job_id, fn):
+    progress = Progress(job_id)
+    conn = get_db()
+    now = time.time()
+    conn.execute("UPDATE jobs SET status = 'running', started_epoch = ?, heartbeat_epoch = ? WHERE job_id = ?",
+                 (now, now, job_id))
+    conn.commit()
+    conn.close()
+
+    # Long stages (one model call over the whole fleet) would otherwise look abandoned
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stop), name=f"job-{job_id[:8]}", daemon=True).start()
+    try:
+        result = fn(progress)
+    except Exception as e:
+        _finish(job_id, "failed", progress, error=f"{type(e).__name__}: {e}")
+    else:
+        _finish(job_id, "succeeded", progress, result=result)
+    finally:
+        stop.set()
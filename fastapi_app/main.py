@@ -1,16 +1,30 @@
 #frontend/main.py
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi_app.assignment import router as assignment_router
 from fastapi_app.auth import router as auth_router
 from fastapi_app.equipments import router as equipment_router
 from fastapi_app.maintenance import router as maintenance_router
 from fastapi_app.predict import router as predict_router
 from fastapi_app.users import router as user_router
 from fastapi_app.calendar import router as calendar_router
+from fastapi_app.dashboard import router as dashboard_router
 from fastapi_app.eda import router as eda_router
+from fastapi_app.error_state import router as alerts_router, start_detector
+from fastapi_app.instrumentation import router as metrics_router, timing_middleware
+from fastapi_app.database import enable_wal, get_db
+from fastapi_app.migrations import run_migrations
+from fastapi_app.partitions import ensure_current
+from fastapi_app.replica import REPLICA_ENABLED, start_refresher
 
 app = FastAPI(title="Hospital Equipment Maintenance API")
 
+# Set by the prefork master (fastapi_app/serve.py), which runs the startup work
+# below once before forking instead of in every worker
+STARTUP_IN_MASTER = os.environ.get("HOSPITAL_STARTUP_IN_MASTER") == "1"
+
 # Enable CORS for your frontend
 app.add_middleware(
     CORSMiddleware,
@@ -21,8 +35,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
 
+# Compress JSON responses; PNG and WebP are already compressed and are skipped
+app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=6)
+
+# Per-route and per-stage timings for /metrics and the Server-Timing header
+app.middleware("http")(timing_middleware)
+
+def prepare_database():
+    """Bring the schema (indexes, derived columns) up to date and create the current partitions"""
+    conn = get_db()
+    run_migrations(conn)
+    enable_wal(conn)
+    ensure_current(conn)
+    conn.close()
+
+
+@app.on_event("startup")
+def apply_migrations():
+    if not STARTUP_IN_MASTER:
+        prepare_database()
+
+
+@app.on_event("startup")
+def keep_analytics_replica_fresh():
+    # Analytics reads (EDA dashboard, bulk jobs) use the replica, not the live database
+    if REPLICA_ENABLED and not STARTUP_IN_MASTER:
+        start_refresher()
+
+
+@app.on_event("startup")
+def keep_alerts_current():
+    # In every worker: jobs.submit() admits one active detector run across processes,
+    # and the prefork master must not start threads
+    start_detector()
+
 
 # Register routers
 app.include_router(auth_router, tags=["Auth"])
@@ -32,3 +81,7 @@ app.include_router(predict_router, prefix="/predict", tags=["Prediction"])
 app.include_router(user_router, prefix="/users", tags=["Users"])
 app.include_router(calendar_router, prefix="/calendar", tags=["Calendar"])
 app.include_router(eda_router)
+app.include_router(alerts_router, prefix="/alerts", tags=["Alerts"])
+app.include_router(metrics_router, tags=["Metrics"])
+app.include_router(assignment_router, prefix="/assignments", tags=["Assignments"])
+app.include_router(dashboard_router, prefix="/dashboard", tags=["Dashboards"])
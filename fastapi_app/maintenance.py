@@ -1,21 +1,26 @@
 #fastapi_app/maintenance.py
-from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi import APIRouter, HTTPException, Depends, Body, Query, Request, Response
+import asyncio
+import json
 from pydantic import BaseModel
 from typing import Union
 import sqlite3
-import pandas as pd
-import joblib
 from datetime import datetime
-from fastapi_app.llm_engine import generate_explanation_ollama
+from fastapi_app.database import get_db
+from fastapi_app.executors import cpu_pool, db_pool, llm_pool, offload, render_pool, run_in
 from fastapi_app.dependencies import get_current_user, require_role
+from fastapi_app.instrumentation import stage
+from fastapi_app.priority import MAINTENANCE_TYPES, load_priority_features, predict_priority_levels
 from fastapi import File, UploadFile
-import base64
-from generate_equipment_report import fetch_equipment_metrics
+from fastapi_app import assignment, explanations, images
+from fastapi_app.http_cache import conditional_get
 
 router = APIRouter()
 
-def get_db():
-    return sqlite3.connect("hospital_equipment_system.db")
+# The columns the API returns, in order; derived columns such as date_epoch stay internal
+LOG_COLUMNS = ("maintenance_id, equipment_id, date, maintenance_type, downtime_hours, cost_inr, issue_description, "
+               "parts_replaced, vendor, technician_id, service_rating, response_time_hours, completion_status, "
+               "warranty_covered, status")
 
 # --- Base model for Technician ---
 class MaintenanceBase(BaseModel):
@@ -53,10 +58,15 @@ class ReviewSchema(BaseModel):
 
 # --- View all logs (Technician sees only scheduled ones) ---
 @router.get("/")
-def view_logs(user=Depends(get_current_user)):
+@offload(db_pool)
+def view_logs(request: Request, response: Response, user=Depends(get_current_user)):
     conn = get_db()
+    cached = conditional_get(conn, request, response, ["maintenance_logs"], user["role"])
+    if cached:
+        conn.close()
+        return cached
     cursor = conn.cursor()
-    query = "SELECT * FROM maintenance_logs"
+    query = f"SELECT {LOG_COLUMNS} FROM maintenance_logs"
     if user["role"] == "technician":
         query += " WHERE status = 'Scheduled'"
 
@@ -68,6 +78,7 @@ def view_logs(user=Depends(get_current_user)):
 
 # --- Add a maintenance log based on role ---
 @router.post("/")
+@offload(db_pool)
 def add_log(
     data: Union[MaintenanceExtended, MaintenanceBase],
     user=Depends(get_current_user)
@@ -99,6 +110,7 @@ def add_log(
 
 # --- Delete maintenance log (admin only) ---
 @router.delete("/{maintenance_id}", dependencies=[Depends(require_role("admin"))])
+@offload(db_pool)
 def delete_log(maintenance_id: str):
     conn = get_db()
     cursor = conn.cursor()
@@ -108,63 +120,21 @@ def delete_log(maintenance_id: str):
     return {"message": f"Maintenance log {maintenance_id} deleted"}
 
 # === Predict Maintenance Priority ===
-@router.get("/priority/{equipment_id}")
-def get_full_maintenance_priority(equipment_id: str, user=Depends(get_current_user)):
-    # Add some logging here too
-    print(f"Priority request for {equipment_id} from user role: {user.get('role', 'NO_ROLE')}")
-
+def _score_priority(equipment_id):
     conn = get_db()
-    query = """
-    SELECT e.equipment_id, e.installation_date,
-           COALESCE(SUM(m.downtime_hours), 0) AS downtime,
-           COUNT(m.maintenance_id) AS failures,
-           COALESCE(AVG(m.response_time_hours), 0) AS avg_response,
-           COALESCE(f.needs_maintenance_10_days, 0) AS needs_maintenance_10_days
-    FROM equipment e
-    LEFT JOIN maintenance_logs m ON e.equipment_id = m.equipment_id
-    LEFT JOIN failure_predictions f ON e.equipment_id = f.equipment_id
-    WHERE e.equipment_id = ?
-    GROUP BY e.equipment_id
-    """
-    df = pd.read_sql_query(query, conn, params=(equipment_id,))
+    df = load_priority_features(conn, equipment_id)
     conn.close()
 
     if df.empty:
         raise HTTPException(status_code=404, detail="Equipment not found")
 
-    df["installation_date"] = pd.to_datetime(df["installation_date"])
-    df["equipment_age"] = (pd.Timestamp.today() - df["installation_date"]).dt.days // 365
-
-    features = df[[
-        "equipment_age",
-        "downtime",
-        "failures",
-        "avg_response",
-        "needs_maintenance_10_days"
-    ]]
-    features.columns = [
-        "equipment_age",
-        "downtime_hours",
-        "num_failures",
-        "response_time_hours",
-        "needs_maintenance_10_days"
-    ]
-
-    scaler = joblib.load("saved_models/multi_priority_scaler.pkl")
-    X_scaled = scaler.transform(features)
-
-    def label(pred): return {0: "Low", 1: "Medium", 2: "High"}[pred]
-
-    results = {}
-    for mtype in ["preventive", "corrective", "replacement"]:
-        model = joblib.load(f"saved_models/{mtype}_model.pkl")
-        pred = model.predict(X_scaled)[0]
-        results[mtype] = label(pred)
-
-    predicted_to_fail = bool(df["needs_maintenance_10_days"].iloc[0])
+    return predict_priority_levels(df), bool(df["needs_maintenance_10_days"].iloc[0])
+
+def maintenance_priority(equipment_id: str):
+    results, predicted_to_fail = _score_priority(equipment_id)
 
     # Save to database
-    conn = sqlite3.connect("hospital_equipment_system.db")
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute("""
         INSERT INTO maintenance_prediction_results (equipment_id, predicted_to_fail, preventive, corrective, replacement, last_updated)
@@ -191,32 +161,50 @@ def get_full_maintenance_priority(equipment_id: str, user=Depends(get_current_us
         "maintenance_needs": results
     }
 
+def stored_priority(conn, equipment_id):
+    """(levels, predicted_to_fail) as last stored for a device, or None"""
+    row = conn.execute("SELECT predicted_to_fail, preventive, corrective, replacement "
+                       "FROM maintenance_prediction_results WHERE equipment_id = ?", (equipment_id,)).fetchone()
+    if not row:
+        return None
+    return dict(zip(MAINTENANCE_TYPES, row[1:])), bool(row[0])
+
+@router.get("/priority/{equipment_id}")
+async def get_full_maintenance_priority(equipment_id: str, user=Depends(get_current_user)):
+    # Add some logging here too
+    print(f"Priority request for {equipment_id} from user role: {user.get('role', 'NO_ROLE')}")
+    return await run_in(cpu_pool, maintenance_priority, equipment_id)
+
+def _metrics_with_chart(equipment_id):
+    """Metrics plus the trend chart version; the chart is drawn only if that version is not cached"""
+    from generate_equipment_report import fetch_equipment_metrics
+
+    metrics = fetch_equipment_metrics(equipment_id, render_chart=False)
+    conn = get_db()
+    version = images.trend_version(conn, equipment_id)
+    conn.close()
+    # The LLM reads the chart from disk, so make sure this version exists
+    metrics["chart_path"] = images.trend_chart(equipment_id, version)
+    return metrics, version
+
 # fastapi_app/maintenance.py - updated LLM route
 @router.get("/maintenance-log/llm-explanation/{equipment_id}")
-def get_llm_explanation(
+async def get_llm_explanation(
     equipment_id: str,
     user=Depends(get_current_user)
 ):
-    import base64
-    import os
+    from fastapi_app.llm_engine import generate_explanation_ollama
 
     role = user["role"].lower()
 
     # 1. Get all required data (includes trend chart generation)
-    full_metrics = fetch_equipment_metrics(equipment_id)
-
-    # 2. Use the chart generated with standard name
-    image_path = full_metrics["chart_path"]
-    if not os.path.exists(image_path):
-        raise HTTPException(status_code=404, detail="Trend chart not found")
+    full_metrics, _ = await run_in(render_pool, _metrics_with_chart, equipment_id)
 
-    with open(image_path, "rb") as img_file:
-        base64_chart = base64.b64encode(img_file.read()).decode()
+    # 2. Generate LLM explanation from the chart generated for this equipment
+    with stage("llm_call"):
+        explanation = await run_in(llm_pool, generate_explanation_ollama, full_metrics, role, full_metrics["chart_path"])
 
-    # 3. Generate LLM explanation
-    explanation = generate_explanation_ollama(full_metrics, role, image_path)
-
-    # 4. Return everything — merged into one response
+    # 3. Return everything — merged into one response
     return {
         "equipment_id": full_metrics["equipment_id"],
         "role": role,
@@ -230,8 +218,12 @@ def get_llm_explanation(
     }
 
 @router.get("/metrics/{equipment_id}")
+@offload(db_pool)
 def get_equipment_metrics_only(equipment_id: str, user=Depends(get_current_user)):
-    metrics = fetch_equipment_metrics(equipment_id)
+    from generate_equipment_report import fetch_equipment_metrics
+
+    # The trend chart is not part of this response, so skip drawing it
+    metrics = fetch_equipment_metrics(equipment_id, render_chart=False)
     return {
         "equipment_id": metrics["equipment_id"],
         "usage_hours": metrics.get("usage_hours", 0),
@@ -244,6 +236,7 @@ def get_equipment_metrics_only(equipment_id: str, user=Depends(get_current_user)
 
 # Update status by technician (e.g., In Progress or Completed)
 @router.put("/update-status/{maintenance_id}", dependencies=[Depends(require_role("technician"))])
+@offload(db_pool)
 def update_technician_progress(
     maintenance_id: str,
     status: str = Body(..., embed=True),  # Expect JSON: { "status": "In Progress" }
@@ -265,6 +258,7 @@ from typing import Optional
 
 # In fastapi_app/maintenance.py, update the schedule_maintenance endpoint:
 @router.put("/schedule/{equipment_id}")
+@offload(db_pool)
 def schedule_maintenance(
     equipment_id: str,
     maintenance_type: str = Body(...),
@@ -283,6 +277,12 @@ def schedule_maintenance(
             status_code=403, 
             detail=f"Insufficient permissions. User role '{user_role}' cannot schedule maintenance. Allowed: {allowed_roles}"
         )
+
+    # Dates are stored as ISO text so calendar range queries can use the date index
+    try:
+        date = datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be in YYYY-MM-DD format")
     
     conn = get_db()
     cursor = conn.cursor()
@@ -333,77 +333,60 @@ def schedule_maintenance(
         conn.close()
         raise HTTPException(status_code=500, detail=f"Could not generate unique maintenance ID after {max_attempts} attempts")
     
+    # Without a technician from the caller, give the job to the least loaded one free that day
+    if not technician_id:
+        planned = assignment.apply(conn, maintenance_ids=[new_id])["assignments"]
+        technician_id = planned[0]["technician_id"] if planned else None
     conn.close()
     
     return {
         "message": f"Maintenance {new_id} scheduled for {equipment_id} on {date}",
-        "maintenance_id": new_id
+        "maintenance_id": new_id,
+        "technician_id": technician_id
     }
 
 # in fastapi_app/maintenance.py
 
-@router.get("/combined/{equipment_id}")
-def get_combined_equipment_data(equipment_id: str, user=Depends(get_current_user)):
-    from fastapi_app.llm_engine import generate_explanation_ollama
-    import base64, os
-
-    metrics = fetch_equipment_metrics(equipment_id)
-
-    chart_path = metrics.get("chart_path")
-    if not os.path.exists(chart_path):
-        raise HTTPException(status_code=404, detail="Trend chart not found")
-
-    with open(chart_path, "rb") as img_file:
-        base64_chart = base64.b64encode(img_file.read()).decode()
-
-    # Priority prediction
-    conn = sqlite3.connect("hospital_equipment_system.db")
-    query = """
-    SELECT e.equipment_id, e.installation_date,
-           COALESCE(SUM(m.downtime_hours), 0) AS downtime,
-           COUNT(m.maintenance_id) AS failures,
-           COALESCE(AVG(m.response_time_hours), 0) AS avg_response,
-           COALESCE(f.needs_maintenance_10_days, 0) AS needs_maintenance_10_days
-    FROM equipment e
-    LEFT JOIN maintenance_logs m ON e.equipment_id = m.equipment_id
-    LEFT JOIN failure_predictions f ON e.equipment_id = f.equipment_id
-    WHERE e.equipment_id = ?
-    GROUP BY e.equipment_id
-    """
-    df = pd.read_sql_query(query, conn, params=(equipment_id,))
+def _stored_contributions(equipment_id):
+    conn = get_db()
+    stored = explanations.load(conn, equipment_id)
     conn.close()
-    if df.empty:
-        raise HTTPException(status_code=404, detail="Equipment not found")
-
-    df["installation_date"] = pd.to_datetime(df["installation_date"])
-    df["equipment_age"] = (pd.Timestamp.today() - df["installation_date"]).dt.days // 365
+    return json.loads(stored) if stored else None
 
-    features = df[["equipment_age", "downtime", "failures", "avg_response", "needs_maintenance_10_days"]]
-    features.columns = ["equipment_age", "downtime_hours", "num_failures", "response_time_hours", "needs_maintenance_10_days"]
-
-    scaler = joblib.load("saved_models/multi_priority_scaler.pkl")
-    X_scaled = scaler.transform(features)
-
-    def label(pred): return {0: "Low", 1: "Medium", 2: "High"}[pred]
-    results = {}
-    for mtype in ["preventive", "corrective", "replacement"]:
-        model = joblib.load(f"saved_models/{mtype}_model.pkl")
-        pred = model.predict(X_scaled)[0]
-        results[mtype] = label(pred)
-
-    role = user["role"].lower()
-    explanation = generate_explanation_ollama(metrics, role, chart_path)
+@router.get("/combined/{equipment_id}")
+async def get_combined_equipment_data(
+    equipment_id: str,
+    narrative: bool = Query(False, description="Also ask the LLM for a written explanation (slow)"),
+    user=Depends(get_current_user)
+):
+    # Chart, priority prediction and stored feature contributions run side by side on their own pools
+    (metrics, chart_version), (results, predicted_to_fail), contributions = await asyncio.gather(
+        run_in(render_pool, _metrics_with_chart, equipment_id),
+        run_in(cpu_pool, _score_priority, equipment_id),
+        run_in(db_pool, _stored_contributions, equipment_id),
+    )
+
+    # The LLM is only called when a written explanation is asked for
+    explanation = None
+    if narrative:
+        from fastapi_app.llm_engine import generate_explanation_ollama
+
+        role = user["role"].lower()
+        with stage("llm_call"):
+            explanation = await run_in(llm_pool, generate_explanation_ollama, metrics, role, metrics["chart_path"])
 
     return {
         "equipment_id": equipment_id,
-        "image_base64": base64_chart,
+        "image_url": images.trend_url(equipment_id, chart_version),
         "metrics": metrics,
         "maintenance_needs": results,
-        "predicted_to_fail": bool(df["needs_maintenance_10_days"].iloc[0]),
+        "predicted_to_fail": predicted_to_fail,
+        "contributions": contributions,
         "explanation": explanation
     }
 
 @router.get("/health-status")
+@offload(cpu_pool)
 def get_all_equipment_health(user=Depends(get_current_user)):
     # Check if user has permission - ENSURE biomedicalengineer is included
     user_role = user.get("role", "").lower().strip()
@@ -412,7 +395,7 @@ def get_all_equipment_health(user=Depends(get_current_user)):
     if user_role not in allowed_roles:
         raise HTTPException(status_code=403, detail="Insufficient permissions to view health status")
     
-    conn = sqlite3.connect("hospital_equipment_system.db")
+    conn = get_db()
     cursor = conn.cursor()
 
     cursor.execute("SELECT equipment_id FROM equipment")
@@ -422,7 +405,7 @@ def get_all_equipment_health(user=Depends(get_current_user)):
     results = []
     for eid in ids:
         try:
-            detail = get_full_maintenance_priority(eid, user)
+            detail = maintenance_priority(eid)
             msg = []
             if detail["predicted_to_fail"]:
                 msg.append("Likely to fail in 10 days")
@@ -441,30 +424,32 @@ def get_all_equipment_health(user=Depends(get_current_user)):
 
     return {"health_status": results}
 
+def equipment_logs(conn, equipment_id):
+    cursor = conn.execute(f"SELECT {LOG_COLUMNS} FROM maintenance_logs WHERE equipment_id = ?", (equipment_id,))
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
 # --- Get all logs for a specific equipment ---
 @router.get("/by-equipment/{equipment_id}")
+@offload(db_pool)
 def get_logs_by_equipment(equipment_id: str, user=Depends(get_current_user)):
     print(f"Equipment logs request for {equipment_id} from user role: {user.get('role', 'NO_ROLE')}")
     
     conn = get_db()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT * FROM maintenance_logs WHERE equipment_id = ?", (equipment_id,))
-    columns = [desc[0] for desc in cursor.description]
-    rows = cursor.fetchall()
+    logs = equipment_logs(conn, equipment_id)
     conn.close()
-
-    return {"logs": [dict(zip(columns, row)) for row in rows]}
+    return {"logs": logs}
 
 # --- Get upcoming scheduled maintenances for a specific equipment ---
 @router.get("/upcoming/{equipment_id}")
+@offload(db_pool)
 def get_upcoming_maintenances(equipment_id: str, user=Depends(get_current_user)):
     conn = get_db()
     cursor = conn.cursor()
 
     today = datetime.today().strftime("%Y-%m-%d")
-    cursor.execute("""
-        SELECT * FROM maintenance_logs
+    cursor.execute(f"""
+        SELECT {LOG_COLUMNS} FROM maintenance_logs
         WHERE equipment_id = ?
         AND date >= ?
         AND status = 'Scheduled'
@@ -480,6 +465,7 @@ def get_upcoming_maintenances(equipment_id: str, user=Depends(get_current_user))
 # In fastapi_app/maintenance.py - Update the mark_maintenance_complete function
 
 @router.put("/mark-complete/{maintenance_id}", dependencies=[Depends(require_role("technician"))])
+@offload(db_pool)
 def mark_maintenance_complete(
     maintenance_id: str,
     completion: CompletionSchema,
@@ -529,6 +515,7 @@ def mark_maintenance_complete(
     return {"message": "Maintenance marked as completed and pending confirmation"}
 
 @router.put("/confirm/{maintenance_id}")
+@offload(db_pool)
 def confirm_completion_status(
     maintenance_id: str,
     service_rating: int = Body(..., embed=True),
@@ -563,6 +550,7 @@ def confirm_completion_status(
 
 
 @router.put("/review-completion/{maintenance_id}")
+@offload(db_pool)
 def review_maintenance_completion(
     maintenance_id: str,
     review: ReviewSchema,
@@ -631,8 +619,18 @@ def review_maintenance_completion(
 
 
 # --- Alert to Admin/Biomedical for pending review ---
+def pending_reviews(conn):
+    """Completed jobs waiting for a biomedical engineer's review"""
+    rows = conn.execute("""
+        SELECT maintenance_id, equipment_id, technician_id, date
+        FROM maintenance_logs
+        WHERE status = 'Completed' AND completion_status = 'Pending'
+    """).fetchall()
+    return [dict(zip(["maintenance_id", "equipment_id", "technician_id", "date"], row)) for row in rows]
+
 @router.get("/pending-reviews")
-def get_pending_reviews(user=Depends(get_current_user)):
+@offload(db_pool)
+def get_pending_reviews(request: Request, response: Response, user=Depends(get_current_user)):
     # Check if user has permission - ENSURE biomedicalengineer is included
     user_role = user.get("role", "").lower().strip()
     allowed_roles = ["admin", "biomedical", "biomedicalengineer"]  # This is the key fix
@@ -645,19 +643,18 @@ def get_pending_reviews(user=Depends(get_current_user)):
         )
     
     conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT maintenance_id, equipment_id, technician_id, date
-        FROM maintenance_logs
-        WHERE status = 'Completed' AND completion_status = 'Pending'
-    """)
-    rows = cursor.fetchall()
+    cached = conditional_get(conn, request, response, ["maintenance_logs"])
+    if cached:
+        conn.close()
+        return cached
+    reviews = pending_reviews(conn)
     conn.close()
-    return {"reviews": [dict(zip(["maintenance_id", "equipment_id", "technician_id", "date"], row)) for row in rows]}
+    return {"reviews": reviews}
 
 from datetime import datetime
 
 @router.get("/new-scheduled", dependencies=[Depends(require_role("technician"))])
+@offload(db_pool)
 def get_new_scheduled_maintenances(user=Depends(get_current_user)):
     today = datetime.today().strftime("%Y-%m-%d")
     conn = get_db()
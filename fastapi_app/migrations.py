@@ -0,0 +1,439 @@
+# fastapi_app/migrations.py
+import sqlite3
+
+# Each migration runs once, in order, and bumps PRAGMA user_version.
+# Append new steps to MIGRATIONS; never reorder or edit one that has shipped.
+
+def _calendar_indexes(cursor):
+    # maintenance_logs.date is ISO "YYYY-MM-DD" text, which sorts correctly,
+    # so plain b-tree indexes serve calendar range queries directly.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_logs_date ON maintenance_logs(date)")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_maintenance_logs_technician_date
+        ON maintenance_logs(technician_id, date)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_equipment_location_type ON equipment(location, type)")
+
+
+# (table, ISO text column, epoch column, SQLite function rendering the text form)
+EPOCH_COLUMNS = [
+    ("usage_logs", "timestamp", "ts_epoch", "datetime"),
+    ("maintenance_logs", "date", "date_epoch", "date"),
+    ("equipment", "installation_date", "installation_epoch", "date"),
+    ("failure_predictions", "prediction_date", "prediction_epoch", "date"),
+]
+
+def _epoch_timestamp_columns(cursor):
+    # Older databases only get this table once the first prediction runs
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS failure_predictions (
+            prediction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            equipment_id TEXT,
+            prediction_date TEXT,
+            needs_maintenance_10_days INTEGER,
+            failure_probability REAL
+        )
+    """)
+
+    for table, text_col, epoch_col, text_fn in EPOCH_COLUMNS:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {epoch_col} INTEGER")
+        cursor.execute(f"UPDATE {table} SET {epoch_col} = CAST(strftime('%s', {text_col}) AS INTEGER)")
+
+        # The ISO text column stays as the compatibility form. Whichever of the
+        # two a writer supplies, the trigger derives the other one.
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_{epoch_col}_insert AFTER INSERT ON {table}
+            WHEN NEW.{epoch_col} IS NULL OR NEW.{text_col} IS NULL
+            BEGIN
+                UPDATE {table} SET
+                    {epoch_col} = COALESCE(NEW.{epoch_col}, CAST(strftime('%s', NEW.{text_col}) AS INTEGER)),
+                    {text_col} = COALESCE(NEW.{text_col}, {text_fn}(NEW.{epoch_col}, 'unixepoch'))
+                WHERE rowid = NEW.rowid;
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_{epoch_col}_update AFTER UPDATE OF {text_col} ON {table}
+            WHEN NEW.{text_col} IS NOT OLD.{text_col}
+            BEGIN
+                UPDATE {table} SET {epoch_col} = CAST(strftime('%s', NEW.{text_col}) AS INTEGER)
+                WHERE rowid = NEW.rowid;
+            END
+        """)
+
+    # Serves the per-device "latest N logs" and trend range reads
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_usage_logs_equipment_ts ON usage_logs(equipment_id, ts_epoch)")
+
+
+def _error_detector_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS high_error_state (
+            equipment_id TEXT PRIMARY KEY,
+            start_date TEXT,
+            streak_days INTEGER
+        )
+    """)
+    # Fixed-size per-device state of the streaming detector in fastapi_app/error_state.py
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS error_detector_state (
+            equipment_id TEXT PRIMARY KEY,
+            last_epoch INTEGER,
+            day INTEGER,
+            day_errors REAL,
+            streak_days INTEGER,
+            streak_start_day INTEGER,
+            last_high_day INTEGER,
+            ewma_errors REAL,
+            ewma_temp REAL,
+            error_alert_since INTEGER,
+            temp_alert_since INTEGER
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS detector_progress (
+            name TEXT PRIMARY KEY,
+            last_log_id INTEGER NOT NULL
+        )
+    """)
+    # Incremental consumers read usage_logs from the last log_id they saw
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_usage_logs_log_id ON usage_logs(log_id)")
+
+
+# One maintenance_logs row's contribution to its device's running sums; {sign}
+# is + when the row appears (INSERT, new side of an UPDATE) and - when it goes
+_LOG_CONTRIBUTION = """
+    UPDATE equipment_features SET
+        downtime_hours = downtime_hours {sign} COALESCE({row}.downtime_hours, 0),
+        num_failures = num_failures {sign} 1,
+        response_time_sum = response_time_sum {sign} COALESCE({row}.response_time_hours, 0),
+        response_time_count = response_time_count {sign} ({row}.response_time_hours IS NOT NULL)
+    WHERE equipment_id = {row}.equipment_id;
+"""
+_ENSURE_FEATURE_ROW = """
+    INSERT OR IGNORE INTO equipment_features (equipment_id)
+    SELECT {row}.equipment_id WHERE {row}.equipment_id IS NOT NULL;
+"""
+# The newest prediction for a device decides its needs_maintenance_10_days
+_LATEST_PREDICTION = """
+    INSERT INTO equipment_features (equipment_id, needs_maintenance_10_days)
+    SELECT {row}.equipment_id, COALESCE((
+        SELECT needs_maintenance_10_days FROM failure_predictions
+        WHERE equipment_id = {row}.equipment_id ORDER BY prediction_id DESC LIMIT 1
+    ), 0)
+    WHERE {row}.equipment_id IS NOT NULL
+    ON CONFLICT(equipment_id) DO UPDATE SET needs_maintenance_10_days = excluded.needs_maintenance_10_days;
+"""
+
+def _equipment_feature_store(cursor):
+    # Running sums and counts behind the priority features (see fastapi_app/priority.py).
+    # Triggers fold each maintenance_logs / failure_predictions write into its
+    # device's row, so a write costs O(1) and readers never aggregate the logs.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS equipment_features (
+            equipment_id TEXT PRIMARY KEY,
+            downtime_hours REAL NOT NULL DEFAULT 0,
+            num_failures INTEGER NOT NULL DEFAULT 0,
+            response_time_sum REAL NOT NULL DEFAULT 0,
+            response_time_count INTEGER NOT NULL DEFAULT 0,
+            needs_maintenance_10_days INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_failure_predictions_equipment ON failure_predictions(equipment_id)")
+
+    cursor.execute("""
+        INSERT INTO equipment_features (equipment_id, downtime_hours, num_failures, response_time_sum, response_time_count)
+        SELECT equipment_id, COALESCE(SUM(downtime_hours), 0), COUNT(*),
+               COALESCE(SUM(response_time_hours), 0), COUNT(response_time_hours)
+        FROM maintenance_logs
+        WHERE equipment_id IS NOT NULL
+        GROUP BY equipment_id
+    """)
+    cursor.execute("""
+        INSERT INTO equipment_features (equipment_id, needs_maintenance_10_days)
+        SELECT equipment_id, COALESCE(needs_maintenance_10_days, 0) FROM failure_predictions
+        WHERE equipment_id IS NOT NULL AND prediction_id IN (SELECT MAX(prediction_id) FROM failure_predictions GROUP BY equipment_id)
+        ON CONFLICT(equipment_id) DO UPDATE SET needs_maintenance_10_days = excluded.needs_maintenance_10_days
+    """)
+
+    add_new = _ENSURE_FEATURE_ROW.format(row="NEW") + _LOG_CONTRIBUTION.format(sign="+", row="NEW")
+    remove_old = _LOG_CONTRIBUTION.format(sign="-", row="OLD")
+    cursor.execute(f"CREATE TRIGGER trg_maintenance_logs_features_insert AFTER INSERT ON maintenance_logs "
+                   f"BEGIN {add_new} END")
+    cursor.execute(f"CREATE TRIGGER trg_maintenance_logs_features_delete AFTER DELETE ON maintenance_logs "
+                   f"BEGIN {remove_old} END")
+    cursor.execute(f"""
+        CREATE TRIGGER trg_maintenance_logs_features_update
+        AFTER UPDATE OF equipment_id, downtime_hours, response_time_hours ON maintenance_logs
+        BEGIN {remove_old} {add_new} END
+    """)
+
+    for event, rows in [("INSERT", ["NEW"]), ("DELETE", ["OLD"]),
+                        ("UPDATE OF equipment_id, needs_maintenance_10_days", ["OLD", "NEW"])]:
+        name = event.split()[0].lower()
+        body = " ".join(_LATEST_PREDICTION.format(row=row) for row in rows)
+        cursor.execute(f"CREATE TRIGGER trg_failure_predictions_features_{name} "
+                       f"AFTER {event} ON failure_predictions BEGIN {body} END")
+
+
+DAILY_USAGE_METRICS = ["usage_hours", "patients_served", "workload_level", "avg_cpu_temp", "error_count"]
+
+def _usage_daily_rollup(cursor):
+    # Per device and UTC day (ts_epoch / 86400): reading count and sums of each
+    # metric, NULL readings counted as 0. It follows inserts only, so deleting
+    # raw rows (retention, fastapi_app/retention.py) leaves the history here.
+    sums = ", ".join(f"{metric}_sum REAL NOT NULL" for metric in DAILY_USAGE_METRICS)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS usage_daily (
+            equipment_id TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            readings INTEGER NOT NULL,
+            {sums},
+            PRIMARY KEY (equipment_id, day)
+        ) WITHOUT ROWID
+    """)
+    columns = ", ".join(f"{metric}_sum" for metric in DAILY_USAGE_METRICS)
+    cursor.execute(f"""
+        INSERT INTO usage_daily (equipment_id, day, readings, {columns})
+        SELECT equipment_id, ts_epoch / 86400, COUNT(*),
+               {", ".join(f"SUM(COALESCE({metric}, 0))" for metric in DAILY_USAGE_METRICS)}
+        FROM usage_logs
+        WHERE equipment_id IS NOT NULL AND ts_epoch IS NOT NULL
+        GROUP BY equipment_id, ts_epoch / 86400
+    """)
+    # ts_epoch may still be NULL here; the epoch trigger fills it from the text timestamp afterwards
+    day = "COALESCE(NEW.ts_epoch, CAST(strftime('%s', NEW.timestamp) AS INTEGER)) / 86400"
+    cursor.execute(f"""
+        CREATE TRIGGER trg_usage_logs_daily_insert AFTER INSERT ON usage_logs
+        BEGIN
+            INSERT INTO usage_daily (equipment_id, day, readings, {columns})
+            SELECT NEW.equipment_id, {day}, 1, {", ".join(f"COALESCE(NEW.{metric}, 0)" for metric in DAILY_USAGE_METRICS)}
+            WHERE NEW.equipment_id IS NOT NULL AND {day} IS NOT NULL
+            ON CONFLICT(equipment_id, day) DO UPDATE SET
+                readings = readings + 1,
+                {", ".join(f"{metric}_sum = {metric}_sum + excluded.{metric}_sum" for metric in DAILY_USAGE_METRICS)};
+        END
+    """)
+
+    # Months whose raw rows were moved to compressed archive files
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS usage_archive (
+            month TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            archived_at TEXT NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_usage_logs_ts ON usage_logs(ts_epoch)")
+
+
+def _partition_usage_logs(cursor):
+    # Split usage_logs into monthly tables behind a view of the same name (fastapi_app/partitions.py)
+    from fastapi_app import partitions
+
+    cursor.execute("CREATE TABLE IF NOT EXISTS usage_log_sequence (last_log_id INTEGER NOT NULL)")
+    cursor.execute("INSERT INTO usage_log_sequence SELECT COALESCE(MAX(log_id), 0) FROM usage_logs")
+    cursor.execute("""
+        SELECT DISTINCT strftime('%Y-%m', ts_epoch, 'unixepoch') FROM usage_logs WHERE ts_epoch IS NOT NULL
+    """)
+    columns = ", ".join(partitions.COLUMNS)
+    for (month,) in cursor.fetchall():
+        table = partitions.partition_name(month)
+        start, end = partitions.month_bounds(month)
+        partitions.create_partition(cursor, table)
+        cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM usage_logs "
+                       f"WHERE ts_epoch >= ? AND ts_epoch < ? ORDER BY log_id", (start, end))
+    partitions.create_partition(cursor, partitions.UNDATED)
+    cursor.execute(f"INSERT INTO {partitions.UNDATED} ({columns}) SELECT {columns} FROM usage_logs "
+                   f"WHERE ts_epoch IS NULL ORDER BY log_id")
+
+    # Its indexes and triggers go with it; the view's INSTEAD OF trigger takes over both
+    cursor.execute("DROP TABLE usage_logs")
+    partitions.rebuild_routing(cursor)
+
+
+VERSIONED_TABLES = ["equipment", "personnel", "maintenance_logs"]
+
+def _table_versions(cursor):
+    # A counter per table, bumped by every write to it, so read endpoints can
+    # answer conditional GETs (fastapi_app/http_cache.py) without querying the table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            modified_epoch INTEGER NOT NULL
+        )
+    """)
+    for table in VERSIONED_TABLES:
+        cursor.execute("INSERT OR IGNORE INTO table_versions (name, version, modified_epoch) "
+                       "VALUES (?, 0, CAST(strftime('%s', 'now') AS INTEGER))", (table,))
+        for event in ["INSERT", "UPDATE", "DELETE"]:
+            cursor.execute(f"""
+                CREATE TRIGGER trg_{table}_version_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    UPDATE table_versions SET version = version + 1,
+                                              modified_epoch = CAST(strftime('%s', 'now') AS INTEGER)
+                    WHERE name = '{table}';
+                END
+            """)
+
+
+def _jobs(cursor):
+    # Background jobs (fastapi_app/jobs.py). The partial unique index allows one
+    # active job per kind across all worker processes.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            requested_by TEXT,
+            stage TEXT,
+            done INTEGER,
+            total INTEGER,
+            stage_seconds TEXT,
+            result TEXT,
+            error TEXT,
+            created_epoch REAL NOT NULL,
+            started_epoch REAL,
+            heartbeat_epoch REAL,
+            finished_epoch REAL
+        )
+    """)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active ON jobs(kind) "
+                   "WHERE status IN ('queued', 'running')")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind_created ON jobs(kind, created_epoch)")
+
+
+def _prediction_history(cursor):
+    # failure_predictions keeps one current row per device, written by upsert;
+    # every run is also appended to failure_prediction_history for trend queries
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS failure_predictions (
+            prediction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            equipment_id TEXT,
+            prediction_date TEXT,
+            needs_maintenance_10_days INTEGER,
+            failure_probability REAL
+        )
+    """)
+    cursor.execute("""
+        DELETE FROM failure_predictions WHERE prediction_id NOT IN (
+            SELECT MAX(prediction_id) FROM failure_predictions GROUP BY equipment_id
+        )
+    """)
+    cursor.execute("DROP INDEX IF EXISTS idx_failure_predictions_equipment")
+    cursor.execute("CREATE UNIQUE INDEX idx_failure_predictions_equipment ON failure_predictions(equipment_id)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS prediction_runs (
+            run_id INTEGER PRIMARY KEY,
+            run_epoch INTEGER NOT NULL,
+            job_id TEXT,
+            devices INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prediction_runs_epoch ON prediction_runs(run_epoch)")
+    # Keyed by run first, so "the whole fleet over the last N days" is one range scan
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS failure_prediction_history (
+            run_id INTEGER NOT NULL,
+            equipment_id TEXT NOT NULL,
+            probability REAL NOT NULL,
+            PRIMARY KEY (run_id, equipment_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prediction_history_equipment "
+                   "ON failure_prediction_history(equipment_id, run_id)")
+
+    # The surviving current rows become the first runs, one per prediction date
+    cursor.execute("""
+        INSERT INTO prediction_runs (run_epoch, devices)
+        SELECT CAST(strftime('%s', prediction_date) AS INTEGER), COUNT(*) FROM failure_predictions
+        WHERE prediction_date IS NOT NULL AND failure_probability IS NOT NULL AND equipment_id IS NOT NULL
+        GROUP BY prediction_date ORDER BY prediction_date
+    """)
+    cursor.execute("""
+        INSERT INTO failure_prediction_history (run_id, equipment_id, probability)
+        SELECT r.run_id, p.equipment_id, p.failure_probability
+        FROM failure_predictions p JOIN prediction_runs r ON r.run_epoch = CAST(strftime('%s', p.prediction_date) AS INTEGER)
+        WHERE p.failure_probability IS NOT NULL AND p.equipment_id IS NOT NULL
+    """)
+
+
+def _prediction_explanations(cursor):
+    # Latest LightGBM feature contributions per device (fastapi_app/explanations.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS prediction_explanations (
+            equipment_id TEXT PRIMARY KEY,
+            run_id INTEGER NOT NULL,
+            explanation TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+
+def _ranking_indexes(cursor):
+    # GET /predict/ranking: read failure_predictions in probability order (covering the
+    # columns it returns), and count the equipment a location/type/criticality filter matches
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_failure_predictions_rank
+        ON failure_predictions(failure_probability DESC, equipment_id, needs_maintenance_10_days, prediction_date)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_equipment_location_type_criticality "
+                   "ON equipment(location, type, criticality)")
+
+def _calendar_covering_index(cursor):
+    # The calendar month view reads every column it returns from one index range in
+    # (date, maintenance_id) order: no table lookups and no sort. The date prefix also
+    # serves what idx_maintenance_logs_date did.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_maintenance_logs_calendar
+        ON maintenance_logs(date, maintenance_id, equipment_id, maintenance_type, status, technician_id, downtime_hours)
+    """)
+    cursor.execute("DROP INDEX IF EXISTS idx_maintenance_logs_date")
+
+MIGRATIONS = [
+    _calendar_indexes,
+    _epoch_timestamp_columns,
+    _error_detector_tables,
+    _equipment_feature_store,
+    _usage_daily_rollup,
+    _partition_usage_logs,
+    _table_versions,
+    _jobs,
+    _prediction_history,
+    _prediction_explanations,
+    _ranking_indexes,
+    _calendar_covering_index,
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn: sqlite3.Connection) -> int:
+    """Apply any pending migrations and return the resulting schema version"""
+    version = schema_version(conn)
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        cursor = conn.cursor()
+        try:
+            # Take the write lock first so concurrently starting workers apply each step once
+            cursor.execute("BEGIN IMMEDIATE")
+            if schema_version(conn) >= number:
+                conn.rollback()
+                version = number
+                continue
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = number
+    return version
+
+
+if __name__ == "__main__":
+    from fastapi_app.database import get_db
+
+    conn = get_db()
+    print(f"Schema version: {run_migrations(conn)}")
+    conn.close()
@@ -0,0 +1,149 @@
+# fastapi_app/model_store.py
+"""Trained models, loaded once per process and shared by every request.
+
+Models load lazily on first use, or all at once with preload(). The prefork
+server preloads FORK_SAFE_MODELS in the master so forked workers share their
+pages copy-on-write, and each worker loads the rest after the fork. When HOSPITAL_INFERENCE_ADDRESS is set, failure_probabilities
+and priority_classes are answered by the inference server at that address
+instead, and this process never loads TensorFlow, LightGBM or the SVCs.
+"""
+import os
+import threading
+import time
+
+from fastapi_app.instrumentation import stage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, "..", "saved_models")
+PRIORITY_MODELS = ["preventive", "corrective", "replacement"]
+
+INFERENCE_ADDRESS = os.environ.get("HOSPITAL_INFERENCE_ADDRESS")
+# Shared secret of the inference server and its clients. Both sides unpickle whatever
+# arrives, so there is no default: serve.py generates one per run.
+INFERENCE_AUTHKEY = os.environ.get("HOSPITAL_INFERENCE_KEY", "").encode() or None
+
+
+def _load_keras(filename):
+    from tensorflow.keras.models import load_model
+    return load_model(os.path.join(MODEL_DIR, filename))
+
+
+def _load_pickle(filename):
+    import joblib
+
+    return joblib.load(os.path.join(MODEL_DIR, filename))
+
+
+_LOADERS = {
+    "lstm": lambda: _load_keras("lstm_model.h5"),
+    "lgbm": lambda: _load_pickle("lgbm_model.pkl"),
+    "scaler": lambda: _load_pickle("scaler.pkl"),
+    "priority_scaler": lambda: _load_pickle("multi_priority_scaler.pkl"),
+    **{mtype: (lambda mtype=mtype: _load_pickle(f"{mtype}_model.pkl")) for mtype in PRIORITY_MODELS},
+}
+MODELS = list(_LOADERS)
+# What an API worker still needs locally when inference is remote
+LOCAL_MODELS = ["scaler"]
+# Plain Python/numpy objects. Loading TensorFlow or LightGBM starts thread pools
+# and takes locks that a forked child would inherit half-held.
+FORK_SAFE_MODELS = ["scaler", "priority_scaler", *PRIORITY_MODELS]
+
+_models = {}
+_lock = threading.Lock()
+
+
+def get(name):
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                with stage("model_load"):
+                    model = _models[name] = _LOADERS[name]()
+    return model
+
+
+def preload(names=None):
+    """Load models now; returns load seconds per model"""
+    if names is None:
+        names = LOCAL_MODELS if INFERENCE_ADDRESS else MODELS
+    timings = {}
+    for name in names:
+        started = time.perf_counter()
+        get(name)
+        timings[name] = round(time.perf_counter() - started, 3)
+    return timings
+
+
+def loaded():
+    return sorted(_models)
+
+
+# --- Inference entry points (local or via the inference server) ---
+def failure_probabilities(X_seq, contributions=False):
+    """(lstm, lgbm) failure probabilities for scaled (n, window, features) sequences.
+
+    With contributions=True a third item holds LightGBM's pred_contrib output,
+    (n, inputs + 1) log-odds with the bias last.
+    """
+    import numpy as np
+
+    if INFERENCE_ADDRESS:
+        return _remote("failure_probabilities", X_seq, contributions)
+    X_flat = X_seq.reshape(X_seq.shape[0], -1)
+    with stage("lstm_predict"):
+        lstm_probs = get("lstm").predict(X_seq, verbose=0).flatten()
+    with stage("lgbm_predict"):
+        if not contributions:
+            return lstm_probs, get("lgbm").predict_proba(X_flat)[:, 1]
+        contrib = get("lgbm").predict(X_flat, pred_contrib=True)
+        # The contributions sum to the raw score, so this equals predict_proba without a second pass
+        lgbm_probs = 1 / (1 + np.exp(-contrib.sum(axis=1)))
+    return lstm_probs, lgbm_probs, contrib
+
+
+def priority_classes(features):
+    """Class index (0 Low, 1 Medium, 2 High) per maintenance type for each row of raw priority features"""
+    import numpy as np
+
+    if INFERENCE_ADDRESS:
+        return _remote("priority_classes", features)
+    with stage("scaler_transform"):
+        X_scaled = get("priority_scaler").transform(features)
+    results = {}
+    for mtype in PRIORITY_MODELS:
+        with stage("svc_predict"):
+            results[mtype] = np.asarray(get(mtype).predict(X_scaled))
+    return results
+
+
+_local = threading.local()
+
+
+def _remote(method, *args):
+    from multiprocessing.connection import Client
+
+    conn = getattr(_local, "conn", None)
+    with stage("inference_rpc"):
+        try:
+            if conn is None:
+                if INFERENCE_AUTHKEY is None:
+                    raise RuntimeError("HOSPITAL_INFERENCE_KEY must be set to reach the inference server")
+                conn = _local.conn = Client(parse_address(INFERENCE_ADDRESS), authkey=INFERENCE_AUTHKEY)
+            conn.send((method, args))
+            status, payload = conn.recv()
+        except (EOFError, OSError):
+            # Server restarted; reconnect once on the next call
+            _local.conn = None
+            raise
+    if status != "ok":
+        raise RuntimeError(f"Inference server error in {method}: {payload}")
+    return payload
+
+
+def parse_address(address):
+    """'host:port' for TCP, anything else is a Unix socket path"""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and not address.startswith("/"):
+        return host, int(port)
+    return address
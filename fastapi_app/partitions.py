@@ -0,0 +1,210 @@
+# fastapi_app/partitions.py
+"""Monthly partitions of usage_logs.
+
+Readings live in one table per UTC calendar month of ts_epoch
+(usage_logs_YYYY_MM), plus usage_logs_undated for rows whose timestamp does
+not parse. usage_logs itself is a UNION ALL view over them, so existing
+queries keep working. Inserting into the view routes each row to its month
+through an INSTEAD OF trigger, which also assigns log_id when it is missing,
+fills whichever of timestamp / ts_epoch was not given, and updates
+usage_daily.
+
+SQLite does not skip UNION ALL arms by itself, so time-bounded reads go
+through usage_between() and latest_readings(), which only name the partitions
+the range needs. Archiving a month (fastapi_app/retention.py) is a DROP TABLE
+of its partition, not a DELETE of its rows.
+
+Partitions are tables in the main database file rather than ATTACHed files:
+SQLite caps a connection at 10 attached databases, too few for a view over
+every month.
+"""
+from fastapi_app.migrations import DAILY_USAGE_METRICS
+
+COLUMNS = ["log_id", "equipment_id", "timestamp", "usage_hours", "patients_served", "workload_level",
+           "avg_cpu_temp", "error_count", "ts_epoch"]
+UNDATED = "usage_logs_undated"
+_MONTH_GLOB = "usage_logs_[0-9][0-9][0-9][0-9]_[0-9][0-9]"
+
+
+def partition_name(month):
+    return f"usage_logs_{month.replace('-', '_')}"
+
+
+def month_of(ts_epoch):
+    import numpy as np
+
+    return str(np.datetime64(int(ts_epoch), "s").astype("datetime64[M]"))
+
+
+def month_bounds(month):
+    """[start, end) epoch seconds of a "YYYY-MM" month"""
+    import numpy as np
+
+    start = np.datetime64(month, "M")
+    return int(start.astype("datetime64[s]").astype(np.int64)), int((start + 1).astype("datetime64[s]").astype(np.int64))
+
+
+def months(conn):
+    """Months that have a partition, oldest first"""
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?", (_MONTH_GLOB,))
+    return sorted(name[len("usage_logs_"):].replace("_", "-") for (name,) in rows)
+
+
+def create_partition(cursor, table):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            log_id INTEGER,
+            equipment_id TEXT,
+            timestamp TIMESTAMP,
+            usage_hours REAL,
+            patients_served REAL,
+            workload_level REAL,
+            avg_cpu_temp REAL,
+            error_count REAL,
+            ts_epoch INTEGER
+        )
+    """)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_equipment_ts ON {table}(equipment_id, ts_epoch)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_log_id ON {table}(log_id)")
+
+
+def rebuild_routing(cursor):
+    """Recreate the usage_logs view and its insert trigger over the current partitions"""
+    tables = [partition_name(month) for month in months(cursor.connection)] + [UNDATED]
+    cursor.execute("DROP VIEW IF EXISTS usage_logs")
+    cursor.execute("CREATE VIEW usage_logs AS " + " UNION ALL ".join(
+        f"SELECT {', '.join(COLUMNS)} FROM {table}" for table in tables))
+
+    ts = "COALESCE(NEW.ts_epoch, CAST(strftime('%s', NEW.timestamp) AS INTEGER))"
+    values = (f"COALESCE(NEW.log_id, (SELECT last_log_id FROM usage_log_sequence)), NEW.equipment_id, "
+              f"COALESCE(NEW.timestamp, datetime(NEW.ts_epoch, 'unixepoch')), "
+              + ", ".join(f"NEW.{metric}" for metric in DAILY_USAGE_METRICS) + f", {ts}")
+    routes = []
+    for month in months(cursor.connection):
+        start, end = month_bounds(month)
+        routes.append(f"INSERT INTO {partition_name(month)} ({', '.join(COLUMNS)}) "
+                      f"SELECT {values} WHERE {ts} >= {start} AND {ts} < {end};")
+    routes.append(f"INSERT INTO {UNDATED} ({', '.join(COLUMNS)}) SELECT {values} WHERE {ts} IS NULL;")
+
+    sums = ", ".join(f"{metric}_sum" for metric in DAILY_USAGE_METRICS)
+    cursor.execute("DROP TRIGGER IF EXISTS trg_usage_logs_route_insert")
+    cursor.execute(f"""
+        CREATE TRIGGER trg_usage_logs_route_insert INSTEAD OF INSERT ON usage_logs
+        BEGIN
+            SELECT RAISE(ABORT, 'no usage_logs partition for this timestamp; call partitions.ensure_partitions')
+            WHERE {ts} IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM sqlite_master WHERE type = 'table'
+                AND name = 'usage_logs_' || strftime('%Y_%m', {ts}, 'unixepoch')
+            );
+            UPDATE usage_log_sequence SET last_log_id = MAX(last_log_id, COALESCE(NEW.log_id, last_log_id + 1));
+            {" ".join(routes)}
+            INSERT INTO usage_daily (equipment_id, day, readings, {sums})
+            SELECT NEW.equipment_id, {ts} / 86400, 1, {", ".join(f"COALESCE(NEW.{metric}, 0)" for metric in DAILY_USAGE_METRICS)}
+            WHERE NEW.equipment_id IS NOT NULL AND {ts} IS NOT NULL
+            ON CONFLICT(equipment_id, day) DO UPDATE SET
+                readings = readings + 1,
+                {", ".join(f"{metric}_sum = {metric}_sum + excluded.{metric}_sum" for metric in DAILY_USAGE_METRICS)};
+        END
+    """)
+
+
+def ensure_partitions(conn, wanted):
+    """Create partitions for any of the `wanted` months that lack one; returns the months created"""
+    missing = sorted(set(wanted) - set(months(conn)))
+    if not missing:
+        return []
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        for month in missing:
+            create_partition(cursor, partition_name(month))
+        rebuild_routing(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return missing
+
+
+def ensure_current(conn):
+    """Partitions for this month and the next, so live inserts always have one"""
+    import numpy as np
+
+    this_month = np.datetime64("now", "M")
+    return ensure_partitions(conn, [str(this_month), str(this_month + 1)])
+
+
+def drop_partition(cursor, month):
+    """Drop a month's partition inside the caller's transaction"""
+    cursor.execute(f"DROP TABLE IF EXISTS {partition_name(month)}")
+    rebuild_routing(cursor)
+
+
+def insert_readings(conn, rows):
+    """Insert a frame of usage_logs rows, creating the partitions their months need"""
+    import pandas as pd
+
+    epochs = rows["ts_epoch"] if "ts_epoch" in rows else pd.to_datetime(rows["timestamp"]).astype("int64") // 10 ** 9
+    ensure_partitions(conn, {month_of(ts) for ts in epochs.dropna()})
+    columns = [column for column in COLUMNS if column in rows]
+    conn.executemany(
+        f"INSERT INTO usage_logs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        rows[columns].astype(object).where(rows[columns].notna(), None).itertuples(index=False, name=None),
+    )
+    conn.commit()
+    return len(rows)
+
+
+def _partitions_between(conn, start=None, end=None):
+    """Partition tables overlapping [start, end) epoch seconds, newest first"""
+    tables = []
+    for month in reversed(months(conn)):
+        month_start, month_end = month_bounds(month)
+        if (start is None or month_end > start) and (end is None or month_start < end):
+            tables.append(partition_name(month))
+    return tables
+
+
+def usage_between(conn, start=None, end=None, columns=COLUMNS, equipment_id=None):
+    """usage_logs rows with start <= ts_epoch < end, reading only the partitions in range"""
+    import pandas as pd
+
+    tables = _partitions_between(conn, start, end)
+    if not tables:
+        return pd.DataFrame(columns=list(columns))
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("ts_epoch >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("ts_epoch < ?")
+        params.append(end)
+    if equipment_id is not None:
+        conditions.append("equipment_id = ?")
+        params.append(equipment_id)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = " UNION ALL ".join(f"SELECT {', '.join(columns)} FROM {table}{where}" for table in tables)
+    return pd.read_sql_query(query, conn, params=params * len(tables))
+
+
+def latest_readings(conn, n, columns=COLUMNS):
+    """The newest n readings of every device, ordered by equipment_id then newest first.
+
+    Partitions are walked newest first, and each device still short of n
+    readings is read with ORDER BY ts_epoch DESC LIMIT over its partition's
+    (equipment_id, ts_epoch) index. The cost follows devices * n rather than
+    the rows in a month, and a device whose readings are all in older months
+    (or in none of the newest ones) is still found.
+    """
+    import pandas as pd
+
+    readings = {}
+    for table in _partitions_between(conn):
+        # A covering-index scan; empty partitions (this month and next, before any insert) cost nothing
+        for (eid,) in conn.execute(f"SELECT DISTINCT equipment_id FROM {table} WHERE equipment_id IS NOT NULL"):
+            rows = readings.setdefault(eid, [])
+            if len(rows) < n:
+                rows += conn.execute(
+                    f"SELECT {', '.join(columns)} FROM {table} WHERE equipment_id = ? AND ts_epoch IS NOT NULL "
+                    f"ORDER BY ts_epoch DESC LIMIT ?", (eid, n - len(rows))).fetchall()
+    return pd.DataFrame([row for eid in sorted(readings) for row in readings[eid]], columns=list(columns))
@@ -1,88 +1,259 @@
 #predict.py
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import Optional
+from fastapi_app.database import get_db
 from fastapi_app.dependencies import get_current_user
-import numpy as np
-import pandas as pd
-import sqlite3
-import joblib
-from tensorflow.keras.models import load_model
+from fastapi_app.executors import db_pool, llm_pool, offload, render_pool, run_in
+from fastapi_app.instrumentation import stage
+from fastapi_app.partitions import latest_readings
+from fastapi_app.priority import MAINTENANCE_TYPES, load_priority_features, predict_fleet_priority_levels
+from fastapi_app.sequences import FEATURES, WINDOW, latest_windows
+from fastapi_app.timestamps import SECONDS_PER_DAY
+from fastapi_app import explanations, jobs, model_store
+import json
 import os
+import sqlite3
+import time
 
 router = APIRouter()
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-lstm_model = load_model(os.path.join(BASE_DIR, "..", "saved_models", "lstm_model.h5"))
-lgbm_model = joblib.load(os.path.join(BASE_DIR, "..", "saved_models", "lgbm_model.pkl"))
-scaler = joblib.load(os.path.join(BASE_DIR, "..", "saved_models", "scaler.pkl"))
+JOB_KIND = "fleet_prediction"
+RANKING_MAX_K = int(os.environ.get("HOSPITAL_RANKING_MAX_K", "10000"))
 
-@router.post("/", summary="Predict maintenance for all equipment")
-def predict_maintenance(user=Depends(get_current_user)):
-    conn = sqlite3.connect("hospital_equipment_system.db")
+def run_fleet_prediction(progress):
+    """Score every device and publish the results in one transaction"""
+    import numpy as np
+    import pandas as pd
+
+    conn = get_db()
     cursor = conn.cursor()
 
-    # Create table if it doesn't exist
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS failure_predictions (
-        prediction_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        equipment_id TEXT,
-        prediction_date TEXT,
-        needs_maintenance_10_days INTEGER,
-        failure_probability REAL
-    )
-    """)
+    # Only the newest readings are read: each device's last WINDOW, through its partitions' index
+    progress.stage("load_readings")
+    df = latest_readings(conn, WINDOW, ["equipment_id", "ts_epoch", *FEATURES])
 
-    query = """
-    SELECT equipment_id, timestamp, usage_hours, patients_served, workload_level, avg_cpu_temp, error_count
-    FROM usage_logs
-    ORDER BY equipment_id, timestamp DESC
-    """
-    df = pd.read_sql_query(query, conn)
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    df = df.sort_values(["equipment_id", "timestamp"], ascending=[True, False])
-    features = ["usage_hours", "patients_served", "workload_level", "avg_cpu_temp", "error_count"]
-
-    equipment_ids = df["equipment_id"].unique()
-    sequences = []
-    equipment_map = []
-
-    for eq_id in equipment_ids:
-        eq_data = df[df["equipment_id"] == eq_id]
-        if len(eq_data) >= 5:
-            recent_logs = eq_data.head(5).sort_values("timestamp")
-            X_scaled = scaler.transform(recent_logs[features])
-            sequences.append(X_scaled)
-            equipment_map.append(eq_id)
-
-    if not sequences:
-        return {"message": "Not enough data for any equipment."}
-
-    X_seq = np.array(sequences)
-    X_flat = X_seq.reshape(X_seq.shape[0], -1)
-
-    lstm_probs = lstm_model.predict(X_seq).flatten()
-    lgbm_probs = lgbm_model.predict_proba(X_flat)[:, 1]
+    progress.stage("build_windows")
+    X_seq, equipment_map = latest_windows(df, model_store.get("scaler"))
+    if not equipment_map:
+        conn.close()
+        return {"message": "Not enough data for any equipment.", "predictions": []}
+
+    progress.stage("score", total=len(equipment_map))
+    # LightGBM returns per-input contributions in the same pass that gives its probabilities
+    lstm_probs, lgbm_probs, contrib = model_store.failure_probabilities(X_seq, contributions=True)
     ensemble_probs = (lstm_probs + lgbm_probs) / 2
     ensemble_preds = (ensemble_probs > 0.4).astype(int)
+    progress.advance(len(equipment_map))
+
+    progress.stage("explain", total=len(equipment_map))
+    summaries = explanations.summarize(contrib)
+
+    # Priority levels for the whole fleet in one batch, so rankings never call a model per device.
+    # needs_maintenance_10_days is an input, so feed it this run's predictions rather than the stored ones.
+    progress.stage("priority")
+    priority = load_priority_features(conn).set_index("equipment_id")
+    priority.update(pd.DataFrame({"needs_maintenance_10_days": ensemble_preds}, index=list(equipment_map)))
+    levels = predict_fleet_priority_levels(priority)
+    progress.advance(len(priority))
 
     today = pd.Timestamp.today().strftime('%Y-%m-%d')
-    results = []
-
-    for eid, pred, prob in zip(equipment_map, ensemble_preds, ensemble_probs):
-        # Delete existing prediction for the equipment if any (overwrite behavior)
-        cursor.execute("DELETE FROM failure_predictions WHERE equipment_id = ?", (eid,))
-        
-        # Insert new prediction
-        cursor.execute("""
+    results = [{
+        "equipment_id": eid,
+        "maintenance_needed": int(pred),
+        "confidence_score": round(float(prob), 4)
+    } for eid, pred, prob in zip(equipment_map, ensemble_preds, ensemble_probs)]
+
+    # One transaction, so readers see either the previous run or this one: an upsert
+    # per device into the current table, and the run appended to the history
+    progress.stage("publish", total=len(results))
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("INSERT INTO prediction_runs (run_epoch, job_id, devices) VALUES (?, ?, ?)",
+                       (int(time.time()), progress.job_id, len(results)))
+        run_id = cursor.lastrowid
+        cursor.executemany("""
             INSERT INTO failure_predictions (equipment_id, prediction_date, needs_maintenance_10_days, failure_probability)
             VALUES (?, ?, ?, ?)
-        """, (eid, today, int(pred), float(round(prob, 4))))
+            ON CONFLICT(equipment_id) DO UPDATE SET
+                prediction_date = excluded.prediction_date,
+                needs_maintenance_10_days = excluded.needs_maintenance_10_days,
+                failure_probability = excluded.failure_probability
+        """, [(r["equipment_id"], today, r["maintenance_needed"], r["confidence_score"]) for r in results])
+        # History keeps float32 precision; that is plenty for trend charts
+        cursor.executemany(
+            "INSERT INTO failure_prediction_history (run_id, equipment_id, probability) VALUES (?, ?, ?)",
+            zip([run_id] * len(results), equipment_map, ensemble_probs.astype(np.float32).astype(float)),
+        )
+        cursor.executemany("""
+            INSERT INTO maintenance_prediction_results (equipment_id, predicted_to_fail, preventive, corrective, replacement, last_updated)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(equipment_id) DO UPDATE SET
+                predicted_to_fail = excluded.predicted_to_fail,
+                preventive = excluded.preventive,
+                corrective = excluded.corrective,
+                replacement = excluded.replacement,
+                last_updated = CURRENT_TIMESTAMP
+        """, zip(priority.index, priority["needs_maintenance_10_days"].astype(int).tolist(),
+                 *(levels[mtype] for mtype in MAINTENANCE_TYPES)))
+        explanations.store(cursor, run_id, [
+            (r["equipment_id"], {"equipment_id": r["equipment_id"], "run_id": run_id, "prediction_date": today,
+                                 "failure_probability": r["confidence_score"],
+                                 "lstm_probability": round(float(lstm), 4), "lgbm_probability": round(float(lgbm), 4),
+                                 **summary})
+            for r, lstm, lgbm, summary in zip(results, lstm_probs, lgbm_probs, summaries)
+        ])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    progress.advance(len(results))
+    return {"run_id": run_id, "predictions": results}
+
+def prediction_history(conn, days=90, equipment_id=None):
+    """Failure probability per device over the last `days` days, oldest run first"""
+    since = int(time.time()) - days * SECONDS_PER_DAY
+    first_run = conn.execute("SELECT MIN(run_id) FROM prediction_runs WHERE run_epoch >= ?", (since,)).fetchone()[0]
+    if first_run is None:
+        return {}
+    query = """
+        SELECT h.equipment_id, r.run_epoch, h.probability
+        FROM failure_prediction_history h JOIN prediction_runs r ON r.run_id = h.run_id
+        WHERE h.run_id >= ?
+    """
+    params = [first_run]
+    if equipment_id:
+        query += " AND h.equipment_id = ?"
+        params.append(equipment_id)
+    history = {}
+    for eid, run_epoch, probability in conn.execute(query + " ORDER BY h.run_id", params):
+        history.setdefault(eid, []).append({"run_epoch": run_epoch, "probability": round(probability, 4)})
+    return history
+
+RANKING_QUERY = """
+    SELECT p.equipment_id, e.type, e.location, e.criticality, p.failure_probability, p.needs_maintenance_10_days,
+           p.prediction_date, m.predicted_to_fail, m.preventive, m.corrective, m.replacement
+    FROM failure_predictions p
+    JOIN equipment e ON e.equipment_id = p.equipment_id
+    LEFT JOIN maintenance_prediction_results m ON m.equipment_id = p.equipment_id
+    WHERE p.failure_probability IS NOT NULL{filters}
+    ORDER BY p.failure_probability DESC, p.equipment_id
+    LIMIT ?
+"""
 
-        results.append({
-            "equipment_id": eid,
-            "maintenance_needed": int(pred),
-            "confidence_score": round(float(prob), 4)
-        })
+def fleet_ranking(conn, k, location=None, type=None, criticality=None):
+    """The k devices with the highest stored failure probability, with their priority levels.
 
-    conn.commit()
+    Two plans, picked by how many devices the filters match (m of n). Reading
+    idx_failure_predictions_rank in order stops after about k * n / m rows;
+    starting from the matching equipment reads m rows and keeps the best k in
+    SQLite's bounded sorter. The first wins when m * m > k * n.
+    """
+    filters, params = [], []
+    for column, value in (("location", location), ("type", type), ("criticality", criticality)):
+        if value is not None:
+            filters.append(f"{column} = ?")
+            params.append(value)
+    walk_ranking = True
+    if filters:
+        where = " AND ".join(filters)
+        matching = conn.execute(f"SELECT COUNT(*) FROM equipment WHERE {where}", params).fetchone()[0]
+        fleet = conn.execute("SELECT COUNT(*) FROM equipment").fetchone()[0]
+        walk_ranking = matching * matching > k * fleet
+    # A unary + keeps SQLite off the equipment indexes, so it walks the ranking instead
+    prefix = "+e." if walk_ranking else "e."
+    rows = conn.execute(RANKING_QUERY.format(filters="".join(f" AND {prefix}{f}" for f in filters)),
+                        (*params, k)).fetchall()
+    return [{
+        "rank": rank,
+        "equipment_id": eid,
+        "type": etype,
+        "location": elocation,
+        "criticality": ecriticality,
+        "failure_probability": probability,
+        "maintenance_needed": needed,
+        "prediction_date": prediction_date,
+        "predicted_to_fail": None if predicted_to_fail is None else bool(predicted_to_fail),
+        "maintenance_needs": None if preventive is None else dict(zip(MAINTENANCE_TYPES, (preventive, corrective, replacement))),
+    } for rank, (eid, etype, elocation, ecriticality, probability, needed, prediction_date,
+                 predicted_to_fail, preventive, corrective, replacement) in enumerate(rows, start=1)]
+
+@router.post("/", summary="Predict maintenance for all equipment", status_code=202)
+@offload(db_pool)
+def predict_maintenance(user=Depends(get_current_user)):
+    # Runs in the background; a request while a run is in progress joins it instead of starting another
+    job, created = jobs.submit(JOB_KIND, run_fleet_prediction, requested_by=user.get("username"))
+    return {"job_id": job["job_id"], "status": job["status"], "joined": not created,
+            "status_url": f"/predict/jobs/{job['job_id']}"}
+
+@router.get("/history", summary="Failure probability history")
+@offload(db_pool)
+def get_prediction_history(
+    days: int = Query(90, ge=1, le=3650),
+    equipment_id: Optional[str] = Query(None),
+    user=Depends(get_current_user)
+):
+    conn = get_db()
+    history = prediction_history(conn, days, equipment_id)
     conn.close()
-    return {"predictions": results}
+    return {"days": days, "history": history}
+
+@router.get("/ranking", summary="Devices most likely to fail")
+@offload(db_pool)
+def get_fleet_ranking(
+    k: int = Query(20, ge=1, le=RANKING_MAX_K),
+    location: Optional[str] = Query(None),
+    type: Optional[str] = Query(None),
+    criticality: Optional[str] = Query(None),
+    user=Depends(get_current_user)
+):
+    # Reads the scores the last fleet prediction run stored; no model is called here
+    conn = get_db()
+    ranking = fleet_ranking(conn, k, location, type, criticality)
+    conn.close()
+    return {"k": k, "ranking": ranking}
+
+def _stored_explanation(equipment_id):
+    conn = get_db()
+    stored = explanations.load(conn, equipment_id)
+    conn.close()
+    return stored
+
+@router.get("/{equipment_id}/explain", summary="Why a device got its failure score")
+async def explain_prediction(
+    equipment_id: str,
+    narrative: bool = Query(False, description="Also ask the LLM for a written explanation (slow)"),
+    user=Depends(get_current_user)
+):
+    stored = await run_in(db_pool, _stored_explanation, equipment_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="No prediction for this equipment yet; run POST /predict/")
+    if not narrative:
+        # Stored as the response body, so nothing is decoded or re-encoded
+        return Response(content=stored, media_type="application/json")
+
+    from fastapi_app.llm_engine import generate_explanation_ollama
+    from fastapi_app.maintenance import _metrics_with_chart
+
+    explanation = json.loads(stored)
+    metrics, _ = await run_in(render_pool, _metrics_with_chart, equipment_id)
+    metrics["feature_contributions"] = explanation["top_features"]
+    with stage("llm_call"):
+        explanation["narrative"] = await run_in(llm_pool, generate_explanation_ollama, metrics,
+                                                user["role"].lower(), metrics["chart_path"])
+    return explanation
+
+@router.get("/jobs", summary="Recent fleet prediction jobs")
+@offload(db_pool)
+def list_prediction_jobs(user=Depends(get_current_user)):
+    # Results stay on the job's own endpoint; the list only carries status and timings
+    return {"jobs": [{k: v for k, v in job.items() if k != "result"} for job in jobs.recent_jobs(JOB_KIND)]}
+
+@router.get("/jobs/{job_id}", summary="Fleet prediction job status")
+@offload(db_pool)
+def get_prediction_job(job_id: str, user=Depends(get_current_user)):
+    job = jobs.get_job(job_id)
+    if not job or job["kind"] != JOB_KIND:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,44 @@
+# fastapi_app/priority.py
+from fastapi_app import model_store
+from fastapi_app.timestamps import equipment_age_sql
+
+PRIORITY_FEATURES = [
+    "equipment_age",
+    "downtime_hours",
+    "num_failures",
+    "response_time_hours",
+    "needs_maintenance_10_days"
+]
+MAINTENANCE_TYPES = ["preventive", "corrective", "replacement"]
+LEVELS = {0: "Low", 1: "Medium", 2: "High"}
+
+# The one definition of the priority features, read by the API and by
+# generate_priority_features.py for training. equipment_features holds running
+# sums kept current by triggers (migration 4), so no request aggregates the logs.
+PRIORITY_FEATURES_QUERY = f"""
+SELECT e.equipment_id, {equipment_age_sql("e.installation_epoch")} AS equipment_age,
+       COALESCE(f.downtime_hours, 0) AS downtime_hours,
+       COALESCE(f.num_failures, 0) AS num_failures,
+       COALESCE(f.response_time_sum / NULLIF(f.response_time_count, 0), 0) AS response_time_hours,
+       COALESCE(f.needs_maintenance_10_days, 0) AS needs_maintenance_10_days
+FROM equipment e
+LEFT JOIN equipment_features f ON f.equipment_id = e.equipment_id
+"""
+
+def load_priority_features(conn, equipment_id=None):
+    """Frame of the priority model inputs for a device, or for every device when equipment_id is None"""
+    import pandas as pd
+
+    if equipment_id is None:
+        return pd.read_sql_query(PRIORITY_FEATURES_QUERY + "ORDER BY e.equipment_id", conn)
+    return pd.read_sql_query(PRIORITY_FEATURES_QUERY + "WHERE e.equipment_id = ?", conn, params=(equipment_id,))
+
+def predict_priority_levels(features):
+    """Low/Medium/High per maintenance type for the first row of `features`"""
+    classes = model_store.priority_classes(features[PRIORITY_FEATURES])
+    return {mtype: LEVELS[int(classes[mtype][0])] for mtype in MAINTENANCE_TYPES}
+
+def predict_fleet_priority_levels(features):
+    """Low/Medium/High lists per maintenance type for every row of `features`, one model call per type"""
+    classes = model_store.priority_classes(features[PRIORITY_FEATURES])
+    return {mtype: [LEVELS[int(c)] for c in classes[mtype]] for mtype in MAINTENANCE_TYPES}
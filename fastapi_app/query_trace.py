@@ -0,0 +1,166 @@
+# fastapi_app/query_trace.py
+"""Slow-query tracing for connections opened through get_db().
+
+Every statement is aggregated in-process by its normalised text: calls, rows,
+total and max duration, and parameter shape. An execution (execute plus the
+fetches that follow it) slower than HOSPITAL_SLOW_QUERY_MS also gets its
+EXPLAIN QUERY PLAN captured and is appended to the JSON-lines log at
+HOSPITAL_SLOW_QUERY_LOG, so the report survives restarts and covers every
+worker.
+
+    python -m fastapi_app.query_trace --top 10 --sort max_ms
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SLOW_QUERY_MS = float(os.environ.get("HOSPITAL_SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG = os.environ.get("HOSPITAL_SLOW_QUERY_LOG", os.path.join(BASE_DIR, "..", "logs", "slow_queries.jsonl"))
+SORT_KEYS = ("total_ms", "max_ms", "mean_ms", "calls", "slow_calls", "rows")
+# EXPLAIN QUERY PLAN only applies to data statements, not PRAGMA/DDL/transaction control
+_PLANNABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_lock = threading.Lock()
+_stats = {}
+_plans = {}
+
+
+def normalize(sql):
+    return " ".join(sql.split())
+
+
+def param_shape(params, many=False):
+    """Describe parameters without recording their values"""
+    if many:
+        rows = list(params)
+        return f"{len(rows)} rows x {param_shape(rows[0]) if rows else 'none'}"
+    if isinstance(params, dict):
+        return "named(" + ",".join(sorted(params)) + ")"
+    return f"{len(params)} positional" if params else "none"
+
+
+def explain(conn, sql, params=()):
+    """EXPLAIN QUERY PLAN as indented text, one line per plan node"""
+    # A plain sqlite3.Cursor so the EXPLAIN itself is not traced
+    rows = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return "\n".join(lines)
+
+
+def record(conn, sql, params, shape, elapsed, rows=0, calls=0, execution_elapsed=0.0, crossed=False):
+    """Add one execute or fetch to the aggregate for `sql`.
+
+    `execution_elapsed` is the time spent on this execution so far; `crossed`
+    is set on the call that first takes it over the slow threshold.
+    """
+    key = normalize(sql)
+    with _lock:
+        entry = _stats.get(key)
+        if entry is None:
+            entry = _stats[key] = {
+                "statement": key, "param_shape": shape, "calls": 0, "slow_calls": 0,
+                "rows": 0, "total_ms": 0.0, "max_ms": 0.0,
+            }
+        entry["calls"] += calls
+        entry["rows"] += rows
+        entry["total_ms"] += elapsed * 1000
+        entry["max_ms"] = max(entry["max_ms"], execution_elapsed * 1000)
+        if crossed:
+            entry["slow_calls"] += 1
+
+    if crossed:
+        _log_slow(conn, key, sql, params, shape, execution_elapsed)
+
+
+def _log_slow(conn, key, sql, params, shape, elapsed):
+    if key not in _plans and key.upper().startswith(_PLANNABLE):
+        try:
+            _plans[key] = explain(conn, sql, params)
+        except sqlite3.Error as e:
+            _plans[key] = f"EXPLAIN failed: {e}"
+    if not SLOW_QUERY_LOG:
+        return
+    line = json.dumps({
+        "ts": time.time(),
+        "statement": key,
+        "param_shape": shape,
+        "duration_ms": round(elapsed * 1000, 3),
+        "plan": _plans.get(key),
+    })
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(SLOW_QUERY_LOG)), exist_ok=True)
+        with open(SLOW_QUERY_LOG, "a") as f:
+            f.write(line + "\n")
+    except OSError:
+        pass
+
+
+def report(top=20, sort="total_ms"):
+    """Top-N statements seen by this process, with plans for the slow ones"""
+    with _lock:
+        entries = [dict(entry) for entry in _stats.values()]
+    for entry in entries:
+        entry["mean_ms"] = entry["total_ms"] / entry["calls"] if entry["calls"] else 0.0
+        entry["plan"] = _plans.get(entry["statement"])
+    entries.sort(key=lambda e: e[sort], reverse=True)
+    return entries[:top]
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _plans.clear()
+
+
+def report_from_log(path=SLOW_QUERY_LOG, top=20, sort="total_ms"):
+    """Aggregate the slow-query log written by every process into a top-N report"""
+    entries = {}
+    with open(path) as f:
+        for line in f:
+            item = json.loads(line)
+            entry = entries.setdefault(item["statement"], {
+                "statement": item["statement"], "param_shape": item["param_shape"], "calls": 0,
+                "slow_calls": 0, "rows": 0, "total_ms": 0.0, "max_ms": 0.0, "plan": None,
+            })
+            entry["calls"] += 1
+            entry["slow_calls"] += 1
+            entry["total_ms"] += item["duration_ms"]
+            entry["max_ms"] = max(entry["max_ms"], item["duration_ms"])
+            entry["plan"] = item["plan"] or entry["plan"]
+    for entry in entries.values():
+        entry["mean_ms"] = entry["total_ms"] / entry["calls"]
+    return sorted(entries.values(), key=lambda e: e[sort], reverse=True)[:top]
+
+
+def format_report(entries):
+    blocks = []
+    for i, entry in enumerate(entries, 1):
+        header = (f"#{i}  total {entry['total_ms']:.1f} ms  max {entry['max_ms']:.1f} ms  "
+                  f"mean {entry['mean_ms']:.1f} ms  calls {entry['calls']}  slow {entry['slow_calls']}  "
+                  f"params {entry['param_shape']}")
+        block = [header, "    " + entry["statement"]]
+        if entry.get("plan"):
+            block += ["    plan:"] + ["      " + line for line in entry["plan"].splitlines()]
+        blocks.append("\n".join(block))
+    return "\n\n".join(blocks) if blocks else "No slow queries recorded."
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Top-N report over the slow-query log")
+    parser.add_argument("--log", default=SLOW_QUERY_LOG)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--sort", choices=SORT_KEYS, default="total_ms")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"No slow-query log at {args.log}")
+    else:
+        print(format_report(report_from_log(args.log, args.top, args.sort)))
@@ -0,0 +1,136 @@
+# fastapi_app/replica.py
+"""Read-only snapshot of the database for analytics reads.
+
+Long full-table reads (the EDA dashboard, the analytics snapshot behind
+preprocess.py, priority features for training, bulk reports) go to a copy of
+DB_PATH instead of the live file. The live file stays free for technicians'
+writes. The copy is taken with SQLite's online backup API into a temporary
+file, then renamed over REPLICA_PATH. The live file is in WAL mode, so the
+copy is a read transaction that writers commit alongside rather than wait
+for. Open readers keep the file they started on, and the replica is never
+modified in place, so readers open it immutable and take no locks at all.
+
+    python -m fastapi_app.replica                 # refresh once
+    python -m fastapi_app.replica --watch 300     # refresh every 300 s
+
+Only the API's refresher thread, the prefork master (fastapi_app/serve.py)
+or this script copies, every
+REPLICA_MAX_AGE seconds; requests never wait for a copy. Where one of
+them is refreshing, get_analytics_db() serves the current replica even if a
+refresh is overdue.
+Without a refresher (scripts), a replica older than REPLICA_MAX_AGE is
+skipped and DB_PATH is read instead, as it is before the first copy exists.
+Set HOSPITAL_ANALYTICS_REPLICA=0 to always send analytics reads to DB_PATH.
+"""
+import argparse
+import fcntl
+import os
+import sqlite3
+import threading
+import time
+
+from fastapi_app.database import DB_PATH, enable_wal, get_db
+from fastapi_app.instrumentation import TimedConnection
+from fastapi_app.migrations import run_migrations
+
+REPLICA_PATH = os.environ.get("HOSPITAL_REPLICA_PATH", os.path.splitext(DB_PATH)[0] + ".replica.db")
+REPLICA_MAX_AGE = float(os.environ.get("HOSPITAL_REPLICA_MAX_AGE", "300"))
+REPLICA_ENABLED = os.environ.get("HOSPITAL_ANALYTICS_REPLICA", "1") != "0"
+
+_lock = threading.Lock()
+# True once this process, or the master it was forked from, keeps the replica fresh
+_refreshed = False
+
+
+def replica_age():
+    """Seconds since the replica was last refreshed, or None if there is none yet"""
+    try:
+        return time.time() - os.path.getmtime(REPLICA_PATH)
+    except FileNotFoundError:
+        return None
+
+
+def refresh_replica():
+    """Copy DB_PATH to REPLICA_PATH; returns the seconds the copy took"""
+    started = time.perf_counter()
+    tmp_path = REPLICA_PATH + ".tmp"
+    source = get_db()
+    # The replica is always at the current schema, so readers never need to migrate it
+    run_migrations(source)
+    enable_wal(source)
+    if os.path.exists(tmp_path):
+        os.unlink(tmp_path)
+    target = sqlite3.connect(tmp_path)
+    try:
+        # One step copies a consistent snapshot, and a concurrent write cannot force
+        # the backup to restart; under WAL that write does not wait for the copy
+        source.backup(target)
+        # A standalone file for immutable readers, not a WAL database without its -wal
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp_path, REPLICA_PATH)
+    return time.perf_counter() - started
+
+
+def ensure_fresh(max_age=REPLICA_MAX_AGE):
+    """Refresh the replica if it is missing or older than max_age seconds"""
+    age = replica_age()
+    if age is not None and age <= max_age:
+        return False
+    with _lock, open(REPLICA_PATH + ".lock", "w") as lock_file:
+        # Other processes (prefork workers, scripts) wait here instead of copying too
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        age = replica_age()
+        if age is not None and age <= max_age:
+            return False
+        refresh_replica()
+        return True
+
+
+def get_analytics_db(max_age=REPLICA_MAX_AGE):
+    """Connection for analytics reads: the replica when there is a usable one, else DB_PATH.
+
+    Never copies. With a refresher running the replica is used however old
+    it is; without one, only if it is at most max_age seconds old.
+    """
+    age = replica_age() if REPLICA_ENABLED else None
+    if age is None or (age > max_age and not _refreshed):
+        return get_db()
+    return sqlite3.connect(f"file:{REPLICA_PATH}?mode=ro&immutable=1", uri=True, factory=TimedConnection)
+
+
+def mark_refreshed():
+    """Serve the replica however stale from now on: a refresher here, or in the prefork master, keeps it current"""
+    global _refreshed
+    _refreshed = True
+
+
+def start_refresher(interval=REPLICA_MAX_AGE):
+    """Daemon thread keeping the replica fresh; the only copier in the API process"""
+
+    def _loop():
+        while True:
+            try:
+                ensure_fresh(interval)
+            except Exception as e:
+                print(f"Analytics replica refresh failed: {e}", flush=True)
+            time.sleep(max(1.0, interval / 2))
+
+    mark_refreshed()
+    thread = threading.Thread(target=_loop, name="replica-refresher", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the read-only analytics replica")
+    parser.add_argument("--watch", type=float, help="Keep refreshing every WATCH seconds")
+    args = parser.parse_args()
+
+    while True:
+        print(f"Copied {DB_PATH} to {REPLICA_PATH} in {refresh_replica():.2f} s", flush=True)
+        if not args.watch:
+            break
+        time.sleep(args.watch)
@@ -0,0 +1,230 @@
+# fastapi_app/retention.py
+"""Tiered retention for usage_logs.
+
+hot   Raw readings from the last HOT_DAYS days stay in usage_logs. Prediction
+      only needs each device's latest readings, and the error detector only
+      reads new rows.
+warm  Every reading is also folded into usage_daily (migration 5) as it is
+      inserted. The trend charts and bulk reports read that table, so it
+      keeps the full history at one row per device and day.
+cold  Whole months older than the hot window are written to
+      ARCHIVE_DIR/<YYYY-MM>.csv.gz and their partition (fastapi_app/partitions.py)
+      is dropped, and incremental vacuum returns the freed pages to the
+      filesystem.
+      `restore` loads a month back into usage_logs.
+
+Before deleting anything, compaction brings the columnar analytics snapshot
+up to date. The snapshot is append-only, so preprocess.py and training still
+see every reading ever logged.
+
+    python -m fastapi_app.retention status
+    python -m fastapi_app.retention compact --hot-days 180 [--dry-run]
+    python -m fastapi_app.retention restore 2025-01
+
+The hot window is measured back from the newest reading, not the wall clock,
+so a database loaded from an old backup is not emptied in one run.
+"""
+import argparse
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from fastapi_app import partitions
+from fastapi_app.database import DB_PATH, get_db
+from fastapi_app.migrations import DAILY_USAGE_METRICS, run_migrations
+
+HOT_DAYS = int(os.environ.get("HOSPITAL_RAW_RETENTION_DAYS", "180"))
+ARCHIVE_DIR = os.environ.get("HOSPITAL_ARCHIVE_DIR",
+                             os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "archive", "usage_logs"))
+MB = 2 ** 20
+
+
+def archive_path(month):
+    return os.path.join(ARCHIVE_DIR, f"{month}.csv.gz")
+
+
+def cold_months(conn, hot_days=HOT_DAYS):
+    """Months whose every reading is older than the hot window"""
+    months = partitions.months(conn)
+    newest = None
+    for month in reversed(months):
+        newest = conn.execute(f"SELECT MAX(ts_epoch) FROM {partitions.partition_name(month)}").fetchone()[0]
+        if newest is not None:
+            break
+    if newest is None:
+        return []
+    cutoff = partitions.month_of(newest - hot_days * 86400)
+    return [month for month in months if month < cutoff]
+
+
+def load_archive(month):
+    """Raw usage_logs rows of an archived month"""
+    return pd.read_csv(archive_path(month), dtype={"equipment_id": str})
+
+
+def archive_month(conn, month):
+    """Move one month of raw readings to its archive file; returns the rows moved"""
+    table = partitions.partition_name(month)
+    path = archive_path(month)
+    cursor = conn.cursor()
+    # Hold the write lock from the read to the drop, so no reading logged in
+    # between is dropped without being archived
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        rows = pd.read_sql_query(f"SELECT * FROM {table} ORDER BY log_id", conn)
+        moved = len(rows)
+        if rows.empty and not os.path.exists(path):
+            partitions.drop_partition(cursor, month)
+            conn.commit()
+            return 0
+        if os.path.exists(path):
+            # Readings logged late for a month that was already archived
+            rows = pd.concat([load_archive(month), rows]).drop_duplicates("log_id", keep="last")
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        tmp_path = path + ".tmp"
+        rows.to_csv(tmp_path, index=False, compression="gzip")
+        os.replace(tmp_path, path)
+
+        # Dropping the partition frees its pages without touching each row
+        partitions.drop_partition(cursor, month)
+        cursor.execute("""
+            INSERT INTO usage_archive (month, path, rows, archived_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(month) DO UPDATE SET path = excluded.path, rows = excluded.rows,
+                                             archived_at = excluded.archived_at
+        """, (month, path, len(rows), datetime.now(timezone.utc).isoformat(timespec="seconds")))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return moved
+
+
+def restore_month(conn, month):
+    """Load an archived month back into its partition; returns the rows inserted"""
+    start, end = partitions.month_bounds(month)
+    table = partitions.partition_name(month)
+    rows = load_archive(month)
+    columns = list(rows.columns)
+    partitions.ensure_partitions(conn, [month])
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        # Straight into the partition, not through the view's trigger: usage_daily
+        # already counts these readings and is rebuilt for the month below
+        cursor.executemany(f"DELETE FROM {table} WHERE log_id = ?", ((int(i),) for i in rows["log_id"]))
+        cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None),
+        )
+        restored = len(rows)
+        # Rebuild the month's rollup from the raw rows, which now include any
+        # readings that arrived for it after it was archived
+        sums = ", ".join(f"{metric}_sum" for metric in DAILY_USAGE_METRICS)
+        cursor.execute("DELETE FROM usage_daily WHERE day >= ? AND day < ?", (start // 86400, end // 86400))
+        cursor.execute(f"""
+            INSERT INTO usage_daily (equipment_id, day, readings, {sums})
+            SELECT equipment_id, ts_epoch / 86400, COUNT(*),
+                   {", ".join(f"SUM(COALESCE({metric}, 0))" for metric in DAILY_USAGE_METRICS)}
+            FROM {table}
+            WHERE ts_epoch >= ? AND ts_epoch < ? AND equipment_id IS NOT NULL
+            GROUP BY equipment_id, ts_epoch / 86400
+        """, (start, end))
+        cursor.execute("DELETE FROM usage_archive WHERE month = ?", (month,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return restored
+
+
+def reclaim_space(conn, pages=None):
+    """Return free pages to the filesystem; returns the number of pages freed"""
+    free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        # One-time switch to incremental mode; it needs a full VACUUM to take effect
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    else:
+        # Each step of the pragma frees one page; execute() would step it only
+        # once, executescript() runs it to completion
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})" if pages else "PRAGMA incremental_vacuum")
+    return free_before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def compact(hot_days=HOT_DAYS, dry_run=False, vacuum_pages=None, snapshot=True):
+    conn = get_db()
+    run_migrations(conn)
+    months = cold_months(conn, hot_days)
+    if dry_run or not months:
+        conn.close()
+        return months, 0
+
+    if snapshot:
+        from analytics_snapshot import refresh_snapshot
+        # Read the live file, not the replica: every row about to be deleted must be in the snapshot
+        refresh_snapshot(db_path=DB_PATH)
+
+    moved = 0
+    for month in months:
+        rows = archive_month(conn, month)
+        moved += rows
+        print(f"{month}: archived {rows} rows to {archive_path(month)}", flush=True)
+    freed = reclaim_space(conn, vacuum_pages)
+    print(f"Freed {freed} pages", flush=True)
+    conn.close()
+    return months, moved
+
+
+def status(conn, hot_days=HOT_DAYS):
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    raw = conn.execute("SELECT COUNT(*), MIN(ts_epoch), MAX(ts_epoch) FROM usage_logs").fetchone()
+    months = partitions.months(conn)
+    daily = conn.execute("SELECT COUNT(*), COALESCE(SUM(readings), 0) FROM usage_daily").fetchone()
+    return {
+        "db_mb": round(pages * page_size / MB, 2),
+        "free_mb": round(free * page_size / MB, 2),
+        "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}[conn.execute("PRAGMA auto_vacuum").fetchone()[0]],
+        "raw_rows": raw[0],
+        "raw_from": None if raw[1] is None else datetime.fromtimestamp(raw[1], timezone.utc).date().isoformat(),
+        "raw_to": None if raw[2] is None else datetime.fromtimestamp(raw[2], timezone.utc).date().isoformat(),
+        "partitions": f"{months[0]} .. {months[-1]} ({len(months)})" if months else None,
+        "daily_rows": daily[0],
+        "daily_readings": daily[1],
+        "archived_months": [dict(zip(["month", "rows", "archived_at"], row)) for row in
+                            conn.execute("SELECT month, rows, archived_at FROM usage_archive ORDER BY month")],
+        "cold_months": cold_months(conn, hot_days),
+    }
+
+
+if __name__ == "__main__":
+    import json
+
+    parser = argparse.ArgumentParser(description="Retention and compaction for usage_logs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    status_cmd = commands.add_parser("status", help="Sizes, tiers and archived months")
+    status_cmd.add_argument("--hot-days", type=int, default=HOT_DAYS)
+    compact_cmd = commands.add_parser("compact", help="Archive cold months and reclaim their space")
+    compact_cmd.add_argument("--hot-days", type=int, default=HOT_DAYS)
+    compact_cmd.add_argument("--dry-run", action="store_true", help="Only list the months that would be archived")
+    compact_cmd.add_argument("--vacuum-pages", type=int, help="Free at most this many pages (default: all)")
+    compact_cmd.add_argument("--no-snapshot", action="store_true",
+                             help="Skip the analytics snapshot refresh before deleting raw rows")
+    restore_cmd = commands.add_parser("restore", help="Load an archived month back into usage_logs")
+    restore_cmd.add_argument("month", help="YYYY-MM")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        months, moved = compact(args.hot_days, args.dry_run, args.vacuum_pages, not args.no_snapshot)
+        verb = "Would archive" if args.dry_run else f"Archived {moved} rows from"
+        print(f"{verb} {len(months)} months: {', '.join(months) or '-'}")
+    else:
+        conn = get_db()
+        run_migrations(conn)
+        if args.command == "restore":
+            print(f"Restored {restore_month(conn, args.month)} rows for {args.month}")
+        else:
+            print(json.dumps(status(conn, args.hot_days), indent=2))
+        conn.close()
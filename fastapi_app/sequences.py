@@ -0,0 +1,47 @@
+# fastapi_app/sequences.py
+from fastapi_app.instrumentation import stage
+
+FEATURES = ["usage_hours", "patients_served", "workload_level", "avg_cpu_temp", "error_count"]
+WINDOW = 5
+
+def latest_windows(df, scaler, window=WINDOW):
+    """Scaled last `window` readings per device, oldest first, as an (n, window, features) array.
+
+    `df` must be ordered by equipment_id then newest first, as the prediction
+    query returns it. Devices with fewer than `window` readings are skipped.
+    """
+    import numpy as np
+
+    recent = df.groupby("equipment_id", sort=False).head(window)
+    counts = recent.groupby("equipment_id", sort=False)["equipment_id"].transform("size")
+    recent = recent[counts.to_numpy() >= window]
+    if recent.empty:
+        return np.empty((0, window, len(FEATURES))), []
+
+    with stage("scaler_transform"):
+        scaled = scaler.transform(recent[FEATURES])
+    X_seq = np.asarray(scaled).reshape(-1, window, len(FEATURES))[:, ::-1, :]
+    equipment_ids = recent["equipment_id"].to_numpy()[::window].tolist()
+    return np.ascontiguousarray(X_seq), equipment_ids
+
+def rolling_windows(df, target, time_col="timestamp", window=WINDOW):
+    """Every run of `window` consecutive readings per device, labelled by the reading that follows.
+
+    Returns (X_seq, y) with X_seq shaped (n, window, features).
+    """
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    df = df.sort_values(["equipment_id", time_col], kind="stable")
+    sequences, labels = [], []
+    for _, group in df.groupby("equipment_id", sort=False):
+        if len(group) <= window:
+            continue
+        values = group[FEATURES].to_numpy(dtype=float)
+        # sliding_window_view yields (n, features, window); move the time axis first
+        sequences.append(sliding_window_view(values[:-1], window, axis=0).transpose(0, 2, 1))
+        labels.append(group[target].to_numpy()[window:])
+
+    if not sequences:
+        return np.empty((0, window, len(FEATURES))), np.empty(0)
+    return np.concatenate(sequences), np.concatenate(labels)
@@ -0,0 +1,226 @@
+# fastapi_app/serve.py
+"""Run the API with several worker processes.
+
+    python -m fastapi_app.serve --mode prefork --workers 4 --port 8000
+    python -m fastapi_app.serve --mode inference --workers 4 --port 8000
+    python -m fastapi_app.serve --mode single --port 8000
+
+prefork    The master imports the app, preloads the fork-safe models (the
+           scalers and SVCs) and the data and plotting libraries the
+           routers import on first use, and freezes the GC, then forks the
+           workers. They share those pages copy-on-write. TensorFlow and
+           LightGBM never load in the master: their thread pools and locks
+           do not survive a fork, so each worker loads them after it.
+inference  The models live in one inference-server process, the only one
+           that loads TensorFlow and LightGBM. Workers are forked the same
+           way but only load the scaler; they send model calls over a
+           local socket, authenticated with a key generated for the run
+           (a TCP --inference-address needs HOSPITAL_INFERENCE_KEY set).
+single     One process with lazy model loading, same as plain uvicorn.
+
+The master also does the startup work once for all workers: migrations and
+the current partitions before forking, then the analytics replica refresh
+from its supervision loop. It starts no threads, so every fork (including a
+replacement worker's) copies a single-threaded process.
+
+The master restarts workers that die. Every --report-interval seconds it
+logs RSS and PSS per process; PSS counts shared pages once, so the PSS
+column adds up to the real memory footprint.
+"""
+import argparse
+import gc
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+
+from fastapi_app.instrumentation import process_memory
+
+MB = 2 ** 20
+# Imported lazily by the routers (see benchmarks/startup.py); the master loads
+# them before forking so workers do not each import their own copy
+PRELOAD_MODULES = ["pandas", "PIL.Image", "generate_eda_image", "generate_equipment_report"]
+
+
+def _bind(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _fork_worker(app, sock, log_level, models):
+    pid = os.fork()
+    if pid:
+        return pid
+
+    # Child: load what the master could not, then serve on the shared listening socket until told to stop
+    import uvicorn
+    from fastapi_app import model_store
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    status = 0
+    try:
+        # A model that fails here is retried lazily by the first request that needs it
+        print(f"Worker {os.getpid()} loaded {model_store.preload(models)}", flush=True)
+    except Exception as e:
+        print(f"Worker {os.getpid()} could not preload models: {e}", flush=True)
+    try:
+        uvicorn.Server(uvicorn.Config(app, log_level=log_level)).run(sockets=[sock])
+    except Exception:
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def _start_inference_server(address):
+    import multiprocessing
+    from fastapi_app.inference_server import serve
+
+    ctx = multiprocessing.get_context("fork")
+    ready = ctx.Event()
+    process = ctx.Process(target=serve, args=(address, ready), name="inference", daemon=True)
+    process.start()
+    if not ready.wait(timeout=300):
+        process.terminate()
+        raise RuntimeError("Inference server did not come up within 300 s")
+    return process
+
+
+def _refresh_replica(replica):
+    # In the supervision loop rather than a thread, so the master stays safe to fork
+    try:
+        replica.ensure_fresh()
+    except Exception as e:
+        print(f"Analytics replica refresh failed: {e}", flush=True)
+
+
+def memory_report(processes):
+    """Lines of RSS/PSS per (role, pid), plus the PSS total"""
+    lines = [f"{'role':<10}{'pid':>8}{'rss MB':>10}{'pss MB':>10}{'shared MB':>11}{'private MB':>12}"]
+    total_pss = 0
+    for role, pid in processes:
+        memory = process_memory(pid)
+        total_pss += memory["pss"]
+        lines.append(f"{role:<10}{pid:>8}{memory['rss'] / MB:>10.1f}{memory['pss'] / MB:>10.1f}"
+                     f"{memory['shared'] / MB:>11.1f}{memory['private'] / MB:>12.1f}")
+    lines.append(f"{'total pss':<18}{total_pss / MB:>20.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["prefork", "inference", "single"], default="prefork")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--inference-address", default="/tmp/hospital-inference.sock")
+    parser.add_argument("--report-interval", type=float, default=60.0)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if args.mode == "single":
+        import uvicorn
+        uvicorn.run("fastapi_app.main:app", host=args.host, port=args.port, log_level=args.log_level)
+        return
+
+    inference = None
+    if args.mode == "inference":
+        explicit_key = bool(os.environ.get("HOSPITAL_INFERENCE_KEY"))
+        # Must be set before model_store is imported so workers route model calls to the server,
+        # and the server and workers (both forked from here) share the key
+        os.environ["HOSPITAL_INFERENCE_ADDRESS"] = args.inference_address
+        if not explicit_key:
+            os.environ["HOSPITAL_INFERENCE_KEY"] = os.urandom(32).hex()
+        from fastapi_app.model_store import parse_address
+        if isinstance(parse_address(args.inference_address), tuple) and not explicit_key:
+            parser.error("a TCP --inference-address needs HOSPITAL_INFERENCE_KEY set explicitly")
+        inference = _start_inference_server(args.inference_address)
+
+    # Must be set before the app is imported so workers skip its startup hooks
+    os.environ["HOSPITAL_STARTUP_IN_MASTER"] = "1"
+    from fastapi_app import model_store, replica
+    from fastapi_app.main import app, prepare_database
+
+    # Migrate once here rather than racing in every worker's startup hook
+    prepare_database()
+    if replica.REPLICA_ENABLED:
+        replica.mark_refreshed()
+        _refresh_replica(replica)
+
+    models = model_store.LOCAL_MODELS if model_store.INFERENCE_ADDRESS else model_store.MODELS
+    worker_models = [name for name in models if name not in model_store.FORK_SAFE_MODELS]
+    print(f"Preloaded {model_store.preload([name for name in models if name in model_store.FORK_SAFE_MODELS])}",
+          flush=True)
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    # Move everything loaded so far out of the GC's reach; otherwise the first
+    # collection in each worker touches every object and un-shares its page
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind(args.host, args.port)
+    workers = {_fork_worker(app, sock, args.log_level, worker_models) for _ in range(args.workers)}
+    print(f"Master {os.getpid()} serving {args.mode} on {args.host}:{args.port} with workers {sorted(workers)}",
+          flush=True)
+
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    next_report = time.monotonic() + min(10.0, args.report_interval)
+    next_refresh = time.monotonic() + max(1.0, replica.REPLICA_MAX_AGE / 2)
+    while not stopping:
+        time.sleep(0.5)
+        # Poll workers by pid; waitpid(-1) would also reap the inference process behind multiprocessing's back
+        for pid in list(workers):
+            try:
+                exited, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                exited = pid
+            if exited:
+                workers.discard(pid)
+                if not stopping:
+                    print(f"Worker {pid} exited; starting a replacement", flush=True)
+                    workers.add(_fork_worker(app, sock, args.log_level, worker_models))
+        if inference is not None and not inference.is_alive() and not stopping:
+            print("Inference server exited; restarting it", flush=True)
+            inference = _start_inference_server(args.inference_address)
+        if replica.REPLICA_ENABLED and time.monotonic() >= next_refresh:
+            _refresh_replica(replica)
+            next_refresh = time.monotonic() + max(1.0, replica.REPLICA_MAX_AGE / 2)
+        if time.monotonic() >= next_report:
+            processes = [("master", os.getpid())]
+            if inference is not None:
+                processes.append(("inference", inference.pid))
+            processes += [("worker", pid) for pid in sorted(workers)]
+            print(memory_report(processes), flush=True)
+            next_report = time.monotonic() + args.report_interval
+
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in workers:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    if inference is not None:
+        inference.terminate()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+# fastapi_app/timestamps.py
+SECONDS_PER_DAY = 86400
+
+def epoch_to_datetime(values):
+    """Convert integer epoch seconds (e.g. usage_logs.ts_epoch) to datetime64 without string parsing"""
+    import pandas as pd
+
+    return pd.to_datetime(values, unit="s")
+
+def equipment_age_sql(column="installation_epoch"):
+    """SQL expression for whole years since installation, same as `(today - date).days // 365`"""
+    return f"((CAST(strftime('%s', 'now', 'localtime') AS INTEGER) - {column}) / {SECONDS_PER_DAY}) / 365"
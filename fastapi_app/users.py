@@ -1,19 +1,19 @@
 #users.py
 # fastapi_app/users.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
 import sqlite3
 from passlib.context import CryptContext
 
+from fastapi_app.database import get_db
+from fastapi_app.executors import cpu_pool, db_pool, offload
 from fastapi_app.dependencies import get_current_user, require_role
+from fastapi_app.http_cache import conditional_get
 
 router = APIRouter()
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def get_db():
-    return sqlite3.connect("hospital_equipment_system.db")
-
 # --- Pydantic Model for input ---
 class UserIn(BaseModel):
     personnel_id: str
@@ -24,38 +24,52 @@ class UserIn(BaseModel):
     username: str
     password: str  # plain password from frontend
 
+PROFILE_COLUMNS = ["personnel_id", "name", "role", "department", "experience_years", "username"]
+
+def profile(conn, username):
+    """Profile dict of a user, or None"""
+    row = conn.execute(f"SELECT {', '.join(PROFILE_COLUMNS)} FROM personnel WHERE username = ?", (username,)).fetchone()
+    return dict(zip(PROFILE_COLUMNS, row)) if row else None
+
+def personnel_rows(conn, role=None):
+    """(personnel_id, name, role, department, experience_years) rows, optionally of one role"""
+    query = "SELECT personnel_id, name, role, department, experience_years FROM personnel"
+    if role:
+        return conn.execute(query + " WHERE role = ?", (role,)).fetchall()
+    return conn.execute(query).fetchall()
+
 # --- Show current logged-in user’s full profile ---
 @router.get("/me")
-def who_am_i(user=Depends(get_current_user)):
+@offload(db_pool)
+def who_am_i(request: Request, response: Response, user=Depends(get_current_user)):
     conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT personnel_id, name, role, department, experience_years, username 
-        FROM personnel WHERE username = ?
-    """, (user["username"],))
-    result = cursor.fetchone()
+    cached = conditional_get(conn, request, response, ["personnel"], user["username"])
+    if cached:
+        conn.close()
+        return cached
+    result = profile(conn, user["username"])
     conn.close()
 
     if not result:
         raise HTTPException(status_code=404, detail="User not found")
-
-    keys = ["personnel_id", "name", "role", "department", "experience_years", "username"]
-    return dict(zip(keys, result))
+    return result
 
 # --- List all users (admin only) ---
 @router.get("/", dependencies=[Depends(require_role("admin"))])
-def list_users():
+@offload(db_pool)
+def list_users(request: Request, response: Response):
     conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT personnel_id, name, role, department, experience_years FROM personnel
-    """)
-    users = cursor.fetchall()
+    cached = conditional_get(conn, request, response, ["personnel"])
+    if cached:
+        conn.close()
+        return cached
+    users = personnel_rows(conn)
     conn.close()
     return {"users": users}
 
 # --- Add a new user (admin only) ---
 @router.post("/", dependencies=[Depends(require_role("admin"))])
+@offload(cpu_pool)
 def add_user(user: UserIn):
     conn = get_db()
     cursor = conn.cursor()
@@ -77,6 +91,7 @@ def add_user(user: UserIn):
 
 # --- Delete user by ID (admin only) ---
 @router.delete("/{personnel_id}", dependencies=[Depends(require_role("admin"))])
+@offload(db_pool)
 def delete_user(personnel_id: str):
     conn = get_db()
     cursor = conn.cursor()
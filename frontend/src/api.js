@@ -6,4 +6,51 @@ const api = axios.create({
   withCredentials: false,         // Make sure cookies aren't expected
 });
 
+// Binary images (trend charts, EDA dashboard) as object URLs for <img src>.
+// The browser cache revalidates them with their ETag, so unchanged charts come back as 304s.
+export const fetchImageUrl = async (path, token) => {
+  const res = await api.get(path, {
+    responseType: 'blob',
+    headers: token ? { Authorization: `Bearer ${token}` } : {},
+  });
+  return URL.createObjectURL(res.data);
+};
+
+// Fleet prediction runs as a background job; concurrent triggers share one run.
+// Resolves with the finished job, or rejects if it failed.
+export const runFleetPrediction = async (token, intervalMs = 1000) => {
+  const headers = { Authorization: `Bearer ${token}` };
+  const { data } = await api.post('/predict', {}, { headers });
+  for (;;) {
+    const { data: job } = await api.get(data.status_url, { headers });
+    if (job.status === 'succeeded') return job;
+    if (job.status === 'failed') throw new Error(job.error || 'Prediction job failed');
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+};
+
+// Everything a page shows in one request: /dashboard/admin, /dashboard/biomedical,
+// /dashboard/technician or /dashboard/equipment/{id}
+export const fetchDashboard = async (page, token) => {
+  const { data } = await api.get(`/dashboard/${page}`, {
+    headers: { Authorization: `Bearer ${token}` },
+  });
+  return data;
+};
+
+// Health badges from a dashboard's `health` list (the scores and priority levels
+// the last fleet prediction run stored)
+export const healthMapFrom = (health, equipmentsList) => {
+  const map = {};
+  equipmentsList.forEach(([id]) => { map[id] = { label: 'Unknown', msg: '' }; });
+  health.forEach(({ equipment_id, predicted_to_fail, maintenance_needs }) => {
+    if (!maintenance_needs) return;
+    const high = Object.entries(maintenance_needs).filter(([_, v]) => v === 'High').map(([k]) => k.charAt(0).toUpperCase() + k.slice(1));
+    map[equipment_id] = predicted_to_fail || high.length
+      ? { label: 'High Risk', msg: `${predicted_to_fail ? 'Predicted to Fail' : ''}${predicted_to_fail && high.length ? ', ' : ''}${high.join(', ')}${high.length ? ' maintenance' : ''}` }
+      : { label: 'Healthy', msg: '' };
+  });
+  return map;
+};
+
 export default api;
\ No newline at end of file
@@ -1,7 +1,7 @@
 // frontend/src/pages/AdminEquipments.jsx
 import { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import api from '../api';
+import api, { fetchDashboard, fetchImageUrl, healthMapFrom, runFleetPrediction } from '../api';
 import MaintenanceLogs from './MaintenanceLogs';
 import Calendar from "react-calendar";
 import "react-calendar/dist/Calendar.css";
@@ -11,7 +11,7 @@ export default function AdminEquipments() {
   const [equipments, setEquipments] = useState([]);
   const [users, setUsers] = useState([]);
   const [tab, setTab] = useState('equipment');
-  const [edaImageBase64, setEdaImageBase64] = useState('');
+  const [edaImageUrl, setEdaImageUrl] = useState('');
   const [profile, setProfile] = useState({});
   const [equipmentForm, setEquipmentForm] = useState({ equipment_id: '', type: '', manufacturer: '', location: '', criticality: '', installation_date: '' });
   const [userForm, setUserForm] = useState({ personnel_id: '', name: '', role: '', department: '', experience_years: '', username: '', password: '' });
@@ -46,101 +46,35 @@ export default function AdminEquipments() {
 
   useEffect(() => {
     fetchData();
-    fetchPendingReviews();
   }, []);
 
   
-  const fetchData = async () => {
+  const fetchData = async (refreshScores = true) => {
     try {
-      // Fetch equipments
-      const resEquip = await api.get('/equipments', { 
-        headers: { Authorization: `Bearer ${token}` } 
-      });
-      setEquipments(resEquip.data.equipments || []);
-
-      // Fetch users
-      const resUsers = await api.get('/users', { 
-        headers: { Authorization: `Bearer ${token}` } 
-      });
-      setUsers(resUsers.data.users || []);
-
-      // Fetch profile
-      const resProfile = await api.get('/users/me', { 
-        headers: { Authorization: `Bearer ${token}` } 
-      });
-      setProfile(resProfile.data || {});
-
-      // Fetch EDA image
-      const resEDA = await api.get('/eda/overall-eda-image', { 
-        headers: { Authorization: `Bearer ${token}` } 
-      });
-      setEdaImageBase64(resEDA.data.image_base64 || '');
-
-      // Run predictions - but don't let this affect other data
-      try {
-        await api.post('/predict', {}, { 
-          headers: { Authorization: `Bearer ${token}` } 
-        });
-      } catch (predErr) {
-        console.warn("Prediction failed:", predErr);
+      // Equipment, users, profile, health, scheduled jobs and reviews in one request
+      const data = await fetchDashboard('admin', token);
+      setEquipments(data.equipments || []);
+      setUsers(data.users || []);
+      setProfile(data.profile || {});
+      setHealthMap(healthMapFrom(data.health, data.equipments || []));
+      setScheduledMap(Object.fromEntries(data.scheduled.map((id) => [id, true])));
+      setPendingReviews(data.pending_reviews || []);
+
+      fetchImageUrl(data.eda_image_url, token)
+        .then(setEdaImageUrl)
+        .catch((edaErr) => console.warn("Cannot fetch EDA image:", edaErr));
+
+      // Fresh scores in the background; the badges update when the run finishes
+      if (refreshScores) {
+        runFleetPrediction(token)
+          .then(() => fetchData(false))
+          .catch((predErr) => console.warn("Prediction failed:", predErr));
       }
-      
-      // Fetch priority data for each equipment - with error handling
-      const equipmentsList = resEquip.data.equipments || [];
-      await Promise.allSettled(equipmentsList.map(async ([id]) => {
-        try {
-          await api.get(`/maintenance-log/priority/${id}`, { 
-            headers: { Authorization: `Bearer ${token}` } 
-          });
-        } catch (err) {
-          console.warn(`Failed to fetch priority for equipment ${id}:`, err);
-        }
-      }));
-
-      // Fetch health badges and scheduled map
-      await fetchHealthBadges(equipmentsList);
-      await fetchScheduledMap(equipmentsList);
-      await fetchPendingReviews();
-      
     } catch (error) {
       console.error("Error in fetchData:", error);
     }
   };
 
-  const fetchHealthBadges = async (equipmentsList) => {
-    const map = {};
-    await Promise.all(equipmentsList.map(async ([id]) => {
-      try {
-        const res = await api.get(`/maintenance-log/priority/${id}`, { headers: { Authorization: `Bearer ${token}` } });
-        const { predicted_to_fail, maintenance_needs } = res.data;
-        const isRisk = predicted_to_fail || Object.values(maintenance_needs).includes('High');
-        map[id] = isRisk ? {
-          label: 'High Risk',
-          msg: `${predicted_to_fail ? 'Predicted to Fail' : ''}${predicted_to_fail && maintenance_needs ? ', ' : ''}${Object.entries(maintenance_needs).filter(([_, v]) => v === 'High').map(([k]) => k.charAt(0).toUpperCase() + k.slice(1)).join(', ')} maintenance`
-        } : { label: 'Healthy', msg: '' };
-      } catch {
-        map[id] = { label: 'Unknown', msg: '' };
-      }
-    }));
-    setHealthMap(map);
-  };
-
-  const fetchScheduledMap = async (equipmentsList) => {
-    const map = {};
-    await Promise.all(equipmentsList.map(async ([id]) => {
-      try {
-        const res = await api.get(`/maintenance-log/by-equipment/${id}`, {
-          headers: { Authorization: `Bearer ${token}` }
-        });
-        // Make sure to check for 'Scheduled' status properly
-        map[id] = res.data.logs?.some(log => log.status === 'Scheduled') || false;
-      } catch {
-        map[id] = false;
-      }
-    }));
-    setScheduledMap(map);
-  };
-
   const fetchPendingReviews = async () => {
     try {
       // Using your backend route: GET /maintenance-log/pending-reviews
@@ -410,10 +344,10 @@ export default function AdminEquipments() {
       )}
 
       {/* EDA Image - Properly Contained */}
-      {edaImageBase64 && (
+      {edaImageUrl && (
         <div className="mb-8 bg-white rounded-xl shadow-lg overflow-hidden">
           <img 
-            src={`data:image/png;base64,${edaImageBase64}`} 
+            src={edaImageUrl} 
             alt="Equipment Data Analysis Dashboard" 
             className="w-full h-auto object-contain"
             style={{ maxHeight: '500px' }}
@@ -924,7 +858,7 @@ export default function AdminEquipments() {
                   className="border border-gray-300 p-3 w-full rounded-xl focus:ring-2 focus:ring-blue-500 focus:border-transparent bg-white"
                 >
                   <option value="">Select Technician</option>
-                  {users.filter(user => user[2] === 'technician').map(user => (
+                  {users.filter(user => user[2]?.toLowerCase() === 'technician').map(user => (
                     <option key={user[0]} value={user[0]}>{user[1]}</option>
                   ))}
                 </select>
@@ -2,6 +2,7 @@
 import { useEffect, useState } from "react";
 import { useParams } from "react-router-dom";
 import axios from "axios";
+import { fetchDashboard, fetchImageUrl } from "../api";
 import Calendar from "react-calendar";
 import 'react-calendar/dist/Calendar.css';
 
@@ -12,6 +13,8 @@ export default function EquipmentDetail() {
   const [metrics, setMetrics] = useState({});
   const [priority, setPriority] = useState({});
   const [llmData, setLlmData] = useState({});
+  const [contributions, setContributions] = useState(null);
+  const [narrativeLoading, setNarrativeLoading] = useState(false);
   const [logs, setLogs] = useState([]);
   const [loading, setLoading] = useState(true);
   const [calendarOpen, setCalendarOpen] = useState(false);
@@ -31,54 +34,6 @@ export default function EquipmentDetail() {
   };
 
   useEffect(() => {
-    const fetchUpdatedDetails = async () => {
-      try {
-        const profileRes = await axios.get("http://localhost:8000/users/me", {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        // Store the original role (don't convert to lowercase here)
-        setUserRole(profileRes.data.role);
-
-        const equipRes = await axios.get(`http://localhost:8000/equipments/${id}`, {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        setEquipment(equipRes.data.equipment);
-
-        const combinedRes = await axios.get(`http://localhost:8000/maintenance-log/combined/${id}`, {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-
-        const data = combinedRes.data;
-        setPlot(`data:image/png;base64,${data.image_base64}`);
-        setMetrics(data.metrics);
-        setPriority({
-          predicted_to_fail: data.predicted_to_fail,
-          maintenance_needs: data.maintenance_needs,
-        });
-        setLlmData({ explanation: data.explanation });
-
-        const logRes = await axios.get("http://localhost:8000/maintenance-log", {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        const filteredLogs = logRes.data.logs.filter((log) => log.equipment_id === id);
-        setLogs(filteredLogs);
-        
-        console.log(filteredLogs)
-        const isScheduled = filteredLogs.some(log => log.status === "Scheduled");
-        setScheduledMap(prev => ({ ...prev, [id]: isScheduled }));
-
-        const userList = await axios.get("http://localhost:8000/users", {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        setTechnicians(userList.data.users.filter(user => user[2] === "technician"));
-
-      } catch (err) {
-        console.error("Error fetching equipment details:", err);
-      } finally {
-        setLoading(false);
-      }
-    };
-
     fetchUpdatedDetails();
   }, [id]);
 
@@ -99,7 +54,9 @@ export default function EquipmentDetail() {
         { headers: { Authorization: `Bearer ${token}` } }
       );
 
-      alert(res.data.message || "Maintenance scheduled successfully.");
+      // The backend assigns the least loaded technician free that day
+      const assigned = res.data.technician_id ? ` Assigned to ${res.data.technician_id}.` : "";
+      alert((res.data.message || "Maintenance scheduled successfully.") + assigned);
       setCalendarOpen(false);
       setIssueDescription("");
       setSelectedTechnician("");
@@ -128,50 +85,44 @@ export default function EquipmentDetail() {
     }
   };
 
-  const fetchUpdatedDetails = async () => {
+  // Written explanations come from the LLM, so they are only requested on demand
+  const fetchNarrative = async () => {
+    setNarrativeLoading(true);
     try {
-      const profileRes = await axios.get("http://localhost:8000/users/me", {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      // Store the original role (don't convert to lowercase here)
-      setUserRole(profileRes.data.role);
-
-      const equipRes = await axios.get(`http://localhost:8000/equipments/${id}`, {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      setEquipment(equipRes.data.equipment);
-
-      const combinedRes = await axios.get(`http://localhost:8000/maintenance-log/combined/${id}`, {
+      const res = await axios.get(`http://localhost:8000/predict/${id}/explain?narrative=true`, {
         headers: { Authorization: `Bearer ${token}` },
       });
+      setLlmData({ explanation: res.data.narrative });
+    } catch (err) {
+      console.error("Error generating explanation:", err);
+      alert("Could not generate a written explanation.");
+    } finally {
+      setNarrativeLoading(false);
+    }
+  };
 
-      const data = combinedRes.data;
-      setPlot(`data:image/png;base64,${data.image_base64}`);
-      setMetrics(data.metrics);
+  // Profile, equipment, metrics, stored predictions, logs and technicians in one request
+  const fetchUpdatedDetails = async () => {
+    try {
+      const data = await fetchDashboard(`equipment/${id}`, token);
+      // Store the original role (don't convert to lowercase here)
+      setUserRole(data.profile?.role);
+      setEquipment(data.equipment);
+      setMetrics(data.metrics || {});
       setPriority({
         predicted_to_fail: data.predicted_to_fail,
         maintenance_needs: data.maintenance_needs,
       });
-      setLlmData({ explanation: data.explanation });
-
-      const logRes = await axios.get("http://localhost:8000/maintenance-log", {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      const filteredLogs = logRes.data.logs.filter((log) => log.equipment_id === id);
-      setLogs(filteredLogs);
-
-      const scheduled = {};
-      filteredLogs.forEach(log => {
-        if (log.status === "Scheduled") {
-          scheduled[log.equipment_id] = true;
-        }
-      });
-      setScheduledMap(scheduled);
-
-      const userList = await axios.get("http://localhost:8000/users", {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      setTechnicians(userList.data.users.filter(user => user[2] === "technician"));
+      setContributions(data.contributions);
+      setLogs(data.logs || []);
+      setScheduledMap(data.scheduled ? { [id]: true } : {});
+      setTechnicians(data.technicians || []);
+
+      if (data.trend_plot_url) {
+        fetchImageUrl(data.trend_plot_url, token)
+          .then(setPlot)
+          .catch((plotErr) => console.warn("Cannot fetch trend chart:", plotErr));
+      }
     } catch (err) {
       console.error("Error fetching equipment details:", err);
     } finally {
@@ -491,6 +442,32 @@ return (
               </div>
             )}
 
+            {/* Risk drivers from the stored LightGBM contributions */}
+            {contributions && (
+              <div className="bg-white/95 backdrop-blur-sm rounded-2xl p-6 shadow-2xl border border-white/20">
+                <h2 className="text-2xl font-bold text-gray-800 mb-6">Risk Drivers</h2>
+                <ul className="space-y-2">
+                  {contributions.top_features.map(({ feature, contribution }) => (
+                    <li key={feature} className="flex justify-between text-gray-800">
+                      <span>{feature.replace(/_/g, ' ')}</span>
+                      <span className={contribution > 0 ? "text-red-600 font-semibold" : "text-green-600 font-semibold"}>
+                        {contribution > 0 ? '+' : ''}{contribution.toFixed(3)}
+                      </span>
+                    </li>
+                  ))}
+                </ul>
+                {!llmData?.explanation && (
+                  <button
+                    onClick={fetchNarrative}
+                    disabled={narrativeLoading}
+                    className="mt-6 px-4 py-2 bg-indigo-600 text-white rounded-lg hover:bg-indigo-700 disabled:opacity-50"
+                  >
+                    {narrativeLoading ? "Generating..." : "Explain in words"}
+                  </button>
+                )}
+              </div>
+            )}
+
             {/* LLM Explanation */}
             {llmData?.explanation && (
               <div className="bg-white/95 backdrop-blur-sm rounded-2xl p-6 shadow-2xl border border-white/20">
@@ -1,7 +1,7 @@
 // src/pages/TechnicianEquipments.jsx
 import { useEffect, useRef, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import api from '../api';
+import api, { fetchDashboard, healthMapFrom, runFleetPrediction } from '../api';
 
 export default function TechnicianEquipments() {
   const [equipments, setEquipments] = useState([]);
@@ -61,17 +61,6 @@ export default function TechnicianEquipments() {
     return () => clearInterval(interval);
   }, []);
 
-  useEffect(() => {
-    const fetchScheduledEquipments = async () => {
-      if (equipments.length > 0) {
-        const scheduled = await getScheduledEquipments();
-        setScheduledEquipments(scheduled);
-      }
-    };
-    
-    fetchScheduledEquipments();
-  }, [equipments]);
-
   const checkForNewScheduledLogs = async () => {
     try {
       const res = await api.get('/maintenance-log/new-scheduled', {
@@ -92,23 +81,26 @@ export default function TechnicianEquipments() {
     }
   };
 
-  const fetchData = async () => {
+  const fetchData = async (refreshScores = true) => {
     try {
-      const resEquip = await api.get('/equipments', {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      setEquipments(resEquip.data.equipments || []);
-
-      const resProfile = await api.get('/users/me', {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      console.log('Complete user profile data:', resProfile.data);
-      console.log('Available keys in profile:', Object.keys(resProfile.data || {}));
-      setProfile(resProfile.data || {});
-
-      await api.post('/predict', {}, { headers: { Authorization: `Bearer ${token}` } });
-
-      await fetchHealthBadges(resEquip.data.equipments);
+      // Equipment, profile, health and open jobs in one request
+      const data = await fetchDashboard('technician', token);
+      const equipmentsList = data.equipments || [];
+      setEquipments(equipmentsList);
+      setProfile(data.profile || {});
+      setHealthMap(healthMapFrom(data.health, equipmentsList));
+
+      // Only equipments with a scheduled job or a completed job awaiting review,
+      // which includes rejected work sent back as a follow-up
+      const open = new Set([...data.scheduled, ...data.awaiting_review]);
+      setScheduledEquipments(equipmentsList.filter(([id]) => open.has(id)));
+
+      // Fresh scores in the background; the badges update when the run finishes
+      if (refreshScores) {
+        runFleetPrediction(token)
+          .then(() => fetchData(false))
+          .catch((predErr) => console.warn('Prediction failed:', predErr));
+      }
     } catch (err) {
       console.error('Error fetching data:', err);
       if (err.response?.status === 403) {
@@ -119,28 +111,6 @@ export default function TechnicianEquipments() {
     }
   };
 
-  const fetchHealthBadges = async (equipmentsList) => {
-    const map = {};
-    await Promise.all(equipmentsList.map(async ([id]) => {
-      try {
-        const res = await api.get(`/maintenance-log/priority/${id}`, {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        const { predicted_to_fail, maintenance_needs } = res.data;
-        const isRisk = predicted_to_fail || Object.values(maintenance_needs).includes('High');
-        map[id] = isRisk
-          ? {
-              label: 'High Risk',
-              msg: `${predicted_to_fail ? 'Predicted to Fail' : ''}${predicted_to_fail && maintenance_needs ? ', ' : ''}${Object.entries(maintenance_needs).filter(([_, v]) => v === 'High').map(([k]) => k.charAt(0).toUpperCase() + k.slice(1)).join(', ')} maintenance`
-            }
-          : { label: 'Healthy', msg: '' };
-      } catch {
-        map[id] = { label: 'Unknown', msg: '' };
-      }
-    }));
-    setHealthMap(map);
-  };
-
   const getBadge = (id) => {
     const info = healthMap[id];
     if (!info) return <span className="text-xs px-2 py-1 rounded bg-gray-400 text-white">Loading...</span>;
@@ -319,42 +289,6 @@ export default function TechnicianEquipments() {
     }
   };
 
-  // Filter to show only equipments with scheduled maintenance
-  const getScheduledEquipments = async () => {
-    try {
-      const scheduledEquipments = [];
-      
-      for (const [id] of equipments) {
-        try {
-          const res = await api.get(`/maintenance-log/by-equipment/${id}`, {
-            headers: { Authorization: `Bearer ${token}` }
-          });
-          
-          // Check if there are any scheduled maintenance tasks for this equipment
-          // This now includes both new scheduled tasks AND rejected/follow-up tasks
-          const hasScheduled = res.data.logs?.some(log => 
-            log.status === 'Scheduled' || 
-            (log.status === 'Completed' && log.completion_status === 'Pending')
-          );
-          
-          if (hasScheduled) {
-            const equipment = equipments.find(eq => eq[0] === id);
-            if (equipment) {
-              scheduledEquipments.push(equipment);
-            }
-          }
-        } catch (err) {
-          console.warn(`Failed to check scheduled maintenance for ${id}:`, err);
-        }
-      }
-      
-      return scheduledEquipments;
-    } catch (err) {
-      console.error("Error fetching scheduled equipments:", err);
-      return [];
-    }
-  };
-
   const filteredEquipments = scheduledEquipments.filter(([id, type, mfg, loc]) => {
     const matchesType = !filters.type || type === filters.type;
     const matchesLocation = !filters.location || loc === filters.location;
@@ -1,19 +1,30 @@
 # generate_eda_image.py
-import sqlite3
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # Headless; the API renders from worker threads
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
 import matplotlib.patches as mpatches
+from fastapi_app.replica import get_analytics_db
+from fastapi_app.instrumentation import stage
 
-def generate_eda_image():
-    conn = sqlite3.connect("hospital_equipment_system.db")
+EDA_TABLES = ["equipment", "failure_predictions", "personnel", "maintenance_prediction_results"]
 
-    # Load data
-    equipment = pd.read_sql_query("SELECT * FROM equipment", conn)
-    predictions = pd.read_sql_query("SELECT * FROM failure_predictions", conn)
-    personnel = pd.read_sql_query("SELECT * FROM personnel", conn)
-    priority = pd.read_sql_query("SELECT * FROM maintenance_prediction_results", conn)
+def load_eda_data():
+    """The tables the dashboard is drawn from, keyed by table name"""
+    # Full-table reads go to the analytics replica, not the database technicians write to
+    conn = get_analytics_db()
+    data = {table: pd.read_sql_query(f"SELECT * FROM {table}", conn) for table in EDA_TABLES}
+    conn.close()
+    return data
+
+def generate_eda_image(path="charts/eda_overall.png", data=None):
+    data = data or load_eda_data()
+    equipment = data["equipment"]
+    predictions = data["failure_predictions"].copy()
+    personnel = data["personnel"]
+    priority = data["maintenance_prediction_results"]
 
     # Fill missing values
     predictions["needs_maintenance_10_days"] = predictions["needs_maintenance_10_days"].fillna(0)
@@ -136,8 +147,7 @@ def generate_eda_image():
             spine.set_linewidth(0.5)
 
     # Save chart
-    path = "charts/eda_overall.png"
-    plt.savefig(path, dpi=150, bbox_inches='tight', facecolor='#f8fafc')
+    with stage("chart_render"):
+        plt.savefig(path, dpi=150, bbox_inches='tight', facecolor='#f8fafc')
     plt.close()
-    conn.close()
     return path
@@ -1,18 +1,21 @@
 # generate_equipment_report.py
-import matplotlib
-matplotlib.use('Agg')  # ✅ Set backend first!
-
-import matplotlib.pyplot as plt
-import sqlite3
 import pandas as pd
 import numpy as np
 import os
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 import warnings
 import math
+from fastapi_app.database import get_db
+from fastapi_app.instrumentation import stage
+from fastapi_app.priority import load_priority_features
+from fastapi_app.replica import get_analytics_db
+from fastapi_app.timestamps import SECONDS_PER_DAY, epoch_to_datetime
 warnings.filterwarnings('ignore')
 
-DB_PATH = "hospital_equipment_system.db"
 CHARTS_DIR = "charts"
 os.makedirs(CHARTS_DIR, exist_ok=True)
 
@@ -48,79 +51,13 @@ def safe_sum(series, default=0.0):
     sum_val = series.sum()
     return safe_float(sum_val, default)
 
-def fetch_equipment_metrics(equipment_id: str):
-    
-    conn = sqlite3.connect(DB_PATH)
-
-    # 1. Equipment Age
-    eq_df = pd.read_sql("SELECT equipment_id, installation_date FROM equipment WHERE equipment_id = ?", conn, params=(equipment_id,))
-    if eq_df.empty:
-        raise ValueError(f"No equipment found for ID: {equipment_id}")
-    eq_df["installation_date"] = pd.to_datetime(eq_df["installation_date"])
-    eq_df["equipment_age"] = (pd.Timestamp.today() - eq_df["installation_date"]).dt.days // 365
-
-    # 2. Maintenance metrics with safe handling
-    maint_df = pd.read_sql(
-        "SELECT * FROM maintenance_logs WHERE equipment_id = ? AND status != 'Scheduled'",
-        conn, params=(equipment_id,)
-    )
-    
-    # Safely calculate maintenance metrics
-    downtime = safe_sum(maint_df["downtime_hours"]) if not maint_df.empty else 0.0
-    response_time = safe_mean(maint_df["response_time_hours"]) if not maint_df.empty else 0.0
-    num_failures = len(maint_df) if not maint_df.empty else 0
-
-    # 3. Usage logs for plotting trends
-    usage_df = pd.read_sql("SELECT * FROM usage_logs WHERE equipment_id = ?", conn, params=(equipment_id,))
-    conn.close()
-
-    usage_df["timestamp"] = pd.to_datetime(usage_df["timestamp"])
-    if usage_df.empty:
-        raise ValueError(f"No usage logs found for {equipment_id}")
-
-    # Clean usage data
-    usage_df = usage_df.fillna(0)  # Replace NaN with 0
-    usage_df = usage_df.replace([np.inf, -np.inf], 0)  # Replace inf with 0
-
-    usage_df['date'] = usage_df['timestamp'].dt.date
-    daily_usage = usage_df.groupby('date').agg({
-        'usage_hours': 'mean',
-        'avg_cpu_temp': 'mean',
-        'workload_level': 'mean',
-        'error_count': 'sum',
-        'timestamp': 'first'
-    }).reset_index()
-    
-    # Clean aggregated data
-    daily_usage = daily_usage.fillna(0)
-    daily_usage = daily_usage.replace([np.inf, -np.inf], 0)
-    
-    daily_usage['date'] = pd.to_datetime(daily_usage['date'])
-    daily_usage = daily_usage.sort_values('date')
+def render_trend_chart(equipment_id, daily_usage, chart_path):
+    """Plot the daily usage trends of one device to chart_path"""
+    # Only chart rendering needs matplotlib; metrics alone stay cheap to import
+    import matplotlib
+    matplotlib.use('Agg')  # ✅ Set backend first!
+    import matplotlib.pyplot as plt
 
-    # 4. Classification labels with safe handling
-    pm_path = "labeled_preventive_data.csv"
-    cm_path = "labeled_corrective_data.csv"
-    rp_path = "labeled_replacement_data.csv"
-
-    try:
-        pm_label = pd.read_csv(pm_path).set_index("equipment_id").loc[equipment_id, "preventive_label"]
-    except (FileNotFoundError, KeyError):
-        pm_label = "Medium"  # Default fallback
-        
-    try:
-        cm_label = pd.read_csv(cm_path).set_index("equipment_id").loc[equipment_id, "corrective_label"]
-    except (FileNotFoundError, KeyError):
-        cm_label = "Medium"  # Default fallback
-        
-    try:
-        rp_label = pd.read_csv(rp_path).set_index("equipment_id").loc[equipment_id, "replacement_label"]
-    except (FileNotFoundError, KeyError):
-        rp_label = "Low"  # Default fallback
-
-    # 5. Plot trends and save to charts/trend_graph.png
-    chart_path = os.path.join(CHARTS_DIR, "trend_graph.png")
-    
     try:
         fig, axs = plt.subplots(4, 1, figsize=(14, 14), sharex=True)
 
@@ -172,7 +109,48 @@ def fetch_equipment_metrics(equipment_id: str):
         plt.savefig(chart_path, dpi=300, bbox_inches='tight')
         plt.close()
 
-    # 6. Return combined metrics for LLM with safe calculations
+LABEL_FILES = {
+    "preventive": ("labeled_preventive_data.csv", "Medium"),
+    "corrective": ("labeled_corrective_data.csv", "Medium"),
+    "replacement": ("labeled_replacement_data.csv", "Low"),
+}
+
+def load_labels():
+    """Priority label per device for each maintenance type (empty when a label file is unusable)"""
+    labels = {}
+    for mtype, (path, _) in LABEL_FILES.items():
+        try:
+            labels[mtype] = pd.read_csv(path).set_index("equipment_id")[f"{mtype}_label"].to_dict()
+        except (FileNotFoundError, KeyError):
+            labels[mtype] = {}
+    return labels
+
+# Daily means (sums over readings) and error totals per device, as the trend charts plot them
+DAILY_USAGE_QUERY = """
+SELECT equipment_id, day,
+       usage_hours_sum / readings AS usage_hours,
+       avg_cpu_temp_sum / readings AS avg_cpu_temp,
+       workload_level_sum / readings AS workload_level,
+       error_count_sum AS error_count
+FROM usage_daily"""
+
+def _with_dates(daily_usage):
+    daily_usage["date"] = epoch_to_datetime(daily_usage.pop("day") * SECONDS_PER_DAY)
+    daily_usage["timestamp"] = daily_usage["date"]
+    return daily_usage
+
+def clean_daily_usage(daily_usage):
+    daily_usage = daily_usage.fillna(0)
+    daily_usage = daily_usage.replace([np.inf, -np.inf], 0)
+    return daily_usage.sort_values('date')
+
+def build_metrics(equipment_id, features, daily_usage, labels, chart_path):
+    """Metrics dict for one device from its priority features row and daily usage"""
+    # Classification labels with safe handling
+    needs = {mtype: str(labels[mtype].get(equipment_id, default))
+             for mtype, (_, default) in LABEL_FILES.items()}
+
+    # Return combined metrics for LLM with safe calculations
     avg_usage_hours = safe_mean(daily_usage["usage_hours"])
     avg_cpu_temp = safe_mean(daily_usage["avg_cpu_temp"])
     total_error_count = safe_sum(daily_usage["error_count"])
@@ -187,19 +165,154 @@ def fetch_equipment_metrics(equipment_id: str):
 
     return {
         "equipment_id": equipment_id,
-        "equipment_age": safe_int(eq_df["equipment_age"].iloc[0]),
-        "downtime_hours": safe_float(downtime),
-        "num_failures": safe_int(num_failures),
-        "response_time_hours": safe_float(response_time, 0.0),
-        "predicted_to_fail": cm_label == "High" or rp_label == "High",
-        "maintenance_needs": {
-            "preventive": str(pm_label),
-            "corrective": str(cm_label),
-            "replacement": str(rp_label),
-        },
+        "equipment_age": safe_int(features["equipment_age"]),
+        "downtime_hours": safe_float(features["downtime_hours"]),
+        "num_failures": safe_int(features["num_failures"]),
+        "response_time_hours": safe_float(features["response_time_hours"], 0.0),
+        "predicted_to_fail": needs["corrective"] == "High" or needs["replacement"] == "High",
+        "maintenance_needs": needs,
         "usage_hours": safe_float(avg_usage_hours),
         "avg_cpu_temp": safe_float(avg_cpu_temp),
         "error_count": safe_int(total_error_count),
         "risk_score": risk_score,
         "chart_path": chart_path
-    }
\ No newline at end of file
+    }
+
+def load_daily_usage(conn, equipment_id):
+    daily_usage = pd.read_sql(DAILY_USAGE_QUERY + " WHERE equipment_id = ? ORDER BY day", conn, params=(equipment_id,))
+    if daily_usage.empty:
+        raise ValueError(f"No usage logs found for {equipment_id}")
+    return clean_daily_usage(_with_dates(daily_usage))
+
+def fetch_equipment_metrics(equipment_id: str, render_chart: bool = True):
+    
+    conn = get_db()
+
+    # 1-2. Equipment age and maintenance metrics, from the feature store the priority models use
+    eq_df = load_priority_features(conn, equipment_id)
+    if eq_df.empty:
+        raise ValueError(f"No equipment found for ID: {equipment_id}")
+
+    # 3. Daily usage for plotting trends, from the usage_daily rollup (covers archived months too)
+    daily_usage = load_daily_usage(conn, equipment_id)
+    conn.close()
+
+    # 4. Plot trends and save to charts/trend_<equipment_id>.png
+    # (one file per device so concurrent requests never read each other's chart)
+    chart_path = os.path.join(CHARTS_DIR, f"trend_{equipment_id}.png")
+    if render_chart:
+        with stage("chart_render"):
+            render_trend_chart(equipment_id, daily_usage, chart_path)
+
+    return build_metrics(equipment_id, eq_df.iloc[0], daily_usage, load_labels(), chart_path)
+
+
+# --- Bulk fleet reports ---
+INDEX_FILE = "index.json"
+
+def _write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def render_report(task):
+    """Process-pool worker: draw one device's chart, then write its metrics JSON.
+
+    The JSON is written last, so its presence marks the device as done when a run resumes.
+    """
+    equipment_id, features, daily_usage, labels, out_dir = task
+    chart_path = os.path.join(out_dir, f"{equipment_id}.png")
+    # Write under a temporary name so an interrupted render never looks finished
+    render_trend_chart(equipment_id, daily_usage, chart_path + ".tmp.png")
+    os.replace(chart_path + ".tmp.png", chart_path)
+
+    metrics = build_metrics(equipment_id, features, daily_usage, labels, os.path.basename(chart_path))
+    _write_json(os.path.join(out_dir, f"{equipment_id}.json"), metrics)
+    return equipment_id
+
+def _load_fleet():
+    """Priority features and daily usage of every device, from one analytics replica connection"""
+    conn = get_analytics_db()
+    features = load_priority_features(conn).set_index("equipment_id", drop=False)
+    daily = _with_dates(pd.read_sql_query(DAILY_USAGE_QUERY + " ORDER BY equipment_id, day", conn))
+    conn.close()
+    return features, {eid: clean_daily_usage(group.drop(columns="equipment_id").reset_index(drop=True))
+                      for eid, group in daily.groupby("equipment_id", sort=False)}
+
+def write_index(out_dir, equipment_ids):
+    """index.json over every finished device report, riskiest first"""
+    entries = []
+    for eid in equipment_ids:
+        path = os.path.join(out_dir, f"{eid}.json")
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            metrics = json.load(f)
+        entries.append({
+            "equipment_id": eid,
+            "risk_score": metrics["risk_score"],
+            "predicted_to_fail": metrics["predicted_to_fail"],
+            "maintenance_needs": metrics["maintenance_needs"],
+            "report": f"{eid}.json",
+            "chart": metrics["chart_path"],
+        })
+    entries.sort(key=lambda e: (-e["risk_score"], e["equipment_id"]))
+    index = {"generated": datetime.now().isoformat(timespec="seconds"), "devices": entries}
+    _write_json(os.path.join(out_dir, INDEX_FILE), index)
+    return len(entries)
+
+def generate_all(out_dir, workers=None, force=False):
+    """Reports for every device with usage logs; devices already in out_dir are skipped unless force"""
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+    features, daily = _load_fleet()
+    labels = load_labels()
+    equipment_ids = [eid for eid in features.index if eid in daily]
+    todo = [eid for eid in equipment_ids
+            if force or not os.path.exists(os.path.join(out_dir, f"{eid}.json"))]
+    print(f"Loaded {len(equipment_ids)} devices in {time.perf_counter() - started:.1f} s; "
+          f"{len(equipment_ids) - len(todo)} already done, {len(todo)} to render", flush=True)
+
+    tasks = [(eid, features.loc[eid].to_dict(), daily[eid], labels, out_dir) for eid in todo]
+    workers = workers or os.cpu_count() or 1
+    done = failed = 0
+    render_started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_report, task): task[0] for task in tasks}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                done += 1
+            except Exception as e:
+                failed += 1
+                print(f"{futures[future]}: {e}", flush=True)
+            finished = done + failed
+            if finished == len(tasks) or finished % max(1, len(tasks) // 100) == 0:
+                elapsed = time.perf_counter() - render_started
+                rate = finished / elapsed if elapsed else 0.0
+                eta = (len(tasks) - finished) / rate if rate else 0.0
+                print(f"[{finished}/{len(tasks)}] {rate:.1f} devices/s, ETA {eta:.0f} s", flush=True)
+
+    indexed = write_index(out_dir, equipment_ids)
+    print(f"Rendered {done} reports ({failed} failed) with {workers} workers in "
+          f"{time.perf_counter() - started:.1f} s; {indexed} devices in {os.path.join(out_dir, INDEX_FILE)}")
+    return done, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Equipment trend reports")
+    parser.add_argument("equipment_id", nargs="?", help="Report one device to charts/")
+    parser.add_argument("--all", action="store_true", help="Report every device into --out")
+    parser.add_argument("--out", default=os.path.join("reports", datetime.now().strftime("%Y-%m")),
+                        help="Output directory for --all (default: reports/<this month>)")
+    parser.add_argument("--workers", type=int, help="Render processes (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="Re-render devices that already have a report")
+    args = parser.parse_args()
+
+    if args.all:
+        generate_all(args.out, args.workers, args.force)
+    elif args.equipment_id:
+        print(json.dumps(fetch_equipment_metrics(args.equipment_id), indent=2))
+    else:
+        parser.error("give an equipment_id or --all")
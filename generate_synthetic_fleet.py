@@ -0,0 +1,364 @@
+# generate_synthetic_fleet.py
+"""Build a schema-compatible database with a synthetic fleet for load and scale testing.
+
+Usage logs are generated with numpy a block of days at a time and bulk
+inserted into their monthly partitions, so large fleets are bounded by SQLite insert speed rather than
+Python loops. A fraction of devices degrade over time (rising CPU temperature,
+workload and error counts) so the models have something to find.
+
+    python generate_synthetic_fleet.py --equipment 10000 --days 365 --out fleet_10k.db
+    HOSPITAL_DB_PATH=fleet_10k.db uvicorn fastapi_app.main:app
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+from passlib.context import CryptContext
+
+from fastapi_app import partitions
+from fastapi_app.migrations import DAILY_USAGE_METRICS, run_migrations
+
+SECONDS_PER_DAY = 86400
+
+# Baseline schema, as shipped in hospital_equipment_system.db; migrations add the rest
+BASE_SCHEMA = [
+    """CREATE TABLE equipment (
+        equipment_id TEXT PRIMARY KEY,
+        type TEXT,
+        manufacturer TEXT,
+        location TEXT,
+        criticality TEXT,
+        installation_date TEXT
+    )""",
+    """CREATE TABLE personnel (
+        personnel_id TEXT PRIMARY KEY,
+        name TEXT,
+        role TEXT,
+        department TEXT,
+        experience_years REAL,
+        username TEXT,
+        password TEXT
+    )""",
+    """CREATE TABLE equipment_assignments (
+        assignment_id TEXT PRIMARY KEY,
+        equipment_id TEXT,
+        personnel_id TEXT
+    )""",
+    """CREATE TABLE failure_predictions (
+        prediction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        equipment_id TEXT,
+        prediction_date TEXT,
+        needs_maintenance_10_days INTEGER,
+        failure_probability REAL
+    )""",
+    """CREATE TABLE high_error_state (
+        equipment_id TEXT PRIMARY KEY,
+        start_date TEXT,
+        streak_days INTEGER
+    )""",
+    """CREATE TABLE usage_logs (
+        log_id INTEGER,
+        equipment_id TEXT,
+        timestamp TIMESTAMP,
+        usage_hours REAL,
+        patients_served REAL,
+        workload_level REAL,
+        avg_cpu_temp REAL,
+        error_count REAL
+    )""",
+    """CREATE TABLE maintenance_logs (
+        maintenance_id TEXT PRIMARY KEY,
+        equipment_id TEXT,
+        date TEXT,
+        maintenance_type TEXT,
+        downtime_hours REAL,
+        cost_inr REAL,
+        issue_description TEXT,
+        parts_replaced TEXT,
+        vendor TEXT,
+        technician_id TEXT,
+        service_rating INTEGER,
+        response_time_hours REAL,
+        completion_status TEXT,
+        warranty_covered TEXT,
+        status TEXT
+    )""",
+    """CREATE TABLE maintenance_prediction_results (
+        equipment_id TEXT PRIMARY KEY,
+        predicted_to_fail INTEGER,
+        preventive TEXT,
+        corrective TEXT,
+        replacement TEXT,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+]
+
+TYPES = ["MRI", "CT Scanner", "Ventilator", "X-Ray", "Dialysis Machine", "Ultrasound", "Infusion Pump"]
+TYPE_CRITICALITY = {
+    "MRI": "High", "CT Scanner": "High", "Ventilator": "High", "X-Ray": "Medium",
+    "Dialysis Machine": "Medium", "Ultrasound": "Low", "Infusion Pump": "Low",
+}
+MANUFACTURERS = ["LifeLine", "MedTech", "PulseCare"]
+LOCATIONS = ["Emergency", "ICU", "Surgery", "Radiology", "Pathology", "General Ward", "Dialysis"]
+VENDORS = ["MediTech Solutions", "BioServe", "CarePoint Engineering"]
+ISSUES = {
+    "Preventive": ["Scheduled calibration and software update", "Routine inspection and filter replacement",
+                   "Annual safety check and sensor calibration"],
+    "Corrective": ["Overheating during operation", "Repeated error codes during startup",
+                   "Power supply irregularities", "Cooling fan failure"],
+}
+PARTS = ["Cooling fan assembly", "Temperature sensor", "Main power fuse", "Air filter cartridge",
+         "Pressure sensor", "Control board", "NA"]
+
+
+def create_schema(conn):
+    for statement in BASE_SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+    run_migrations(conn)
+
+
+def build_fleet(rng, n_equipment, start_day, days, degrading_fraction):
+    width = max(3, len(str(n_equipment)))
+    ids = np.array([f"EQP{i:0{width}d}" for i in range(1, n_equipment + 1)])
+    types = rng.choice(TYPES, n_equipment)
+    install = start_day - rng.integers(30, 12 * 365, n_equipment).astype("timedelta64[D]")
+    degrading = rng.random(n_equipment) < degrading_fraction
+
+    return {
+        "ids": ids,
+        "types": types,
+        "manufacturers": rng.choice(MANUFACTURERS, n_equipment),
+        "locations": rng.choice(LOCATIONS, n_equipment),
+        "criticality": np.array([TYPE_CRITICALITY[t] for t in types]),
+        "installation_dates": np.datetime_as_string(install, unit="D"),
+        "base_usage": rng.uniform(3, 12, n_equipment),
+        "base_patients": rng.uniform(5, 20, n_equipment),
+        "base_temp": rng.uniform(45, 60, n_equipment),
+        "degrading": degrading,
+        # Day the degradation starts (spread over the period so some devices are
+        # mid-degradation at the end) and how many days it takes to reach full severity
+        "onset": np.where(degrading, rng.integers(0, days, n_equipment), np.iinfo(np.int64).max),
+        "ramp": rng.uniform(10, 60, n_equipment),
+    }
+
+
+def insert_personnel(conn, rng, n_equipment, n_technicians, password):
+    hashed = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(password)
+    n_biomedical = max(len(LOCATIONS), n_equipment // 10)
+
+    rows = []
+    staff = [("Admin", "Admin")] * 2
+    staff += [("Biomedical Engineer", LOCATIONS[i % len(LOCATIONS)]) for i in range(n_biomedical)]
+    staff += [("Technician", "Technical Department")] * n_technicians
+    width = max(3, len(str(len(staff))))
+    for i, (role, department) in enumerate(staff, start=1):
+        rows.append((f"PER{i:0{width}d}", f"Synthetic User {i}", role, department,
+                     float(rng.integers(1, 15)), f"user{i}", hashed))
+    conn.executemany("INSERT INTO personnel VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    biomedical = {}
+    for row in rows:
+        if row[2] == "Biomedical Engineer":
+            biomedical.setdefault(row[3], []).append(row[0])
+    technicians = np.array([row[0] for row in rows if row[2] == "Technician"])
+    return biomedical, technicians
+
+
+def insert_equipment(conn, rng, fleet, biomedical):
+    conn.executemany(
+        "INSERT INTO equipment (equipment_id, type, manufacturer, location, criticality, installation_date) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        zip(fleet["ids"].tolist(), fleet["types"].tolist(), fleet["manufacturers"].tolist(),
+            fleet["locations"].tolist(), fleet["criticality"].tolist(), fleet["installation_dates"].tolist()),
+    )
+    assignments = []
+    for eq_id, location in zip(fleet["ids"].tolist(), fleet["locations"].tolist()):
+        engineers = biomedical[location]
+        assignments.append((f"A{eq_id}", eq_id, engineers[rng.integers(len(engineers))]))
+    conn.executemany("INSERT INTO equipment_assignments VALUES (?, ?, ?)", assignments)
+
+
+def insert_usage_logs(conn, rng, fleet, start_day, days, samples_per_day, chunk_rows):
+    n_equipment = len(fleet["ids"])
+    step = SECONDS_PER_DAY // samples_per_day
+    start_epoch = int(start_day.astype("datetime64[s]").astype(np.int64))
+    slots_per_chunk = max(1, chunk_rows // n_equipment)
+    total_slots = days * samples_per_day
+
+    # Rows go straight into the monthly partitions, not row by row through the
+    # usage_logs view's trigger; usage_daily and the log_id sequence are rebuilt
+    # once at the end, as retention.restore_month does for a month
+    last_epoch = start_epoch + (total_slots - 1) * step
+    months = np.arange(np.datetime64(start_epoch, "s").astype("datetime64[M]"),
+                       np.datetime64(last_epoch, "s").astype("datetime64[M]") + 1)
+    partitions.ensure_partitions(conn, [str(month) for month in months])
+    tables = [partitions.partition_name(str(month)) for month in months]
+
+    # Indexes on the partitions are rebuilt once at the end instead of per row
+    indexes = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+        f"AND tbl_name IN ({', '.join('?' * len(tables))})", tables
+    ).fetchall()
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+
+    columns = ", ".join(partitions.COLUMNS)
+    log_id = 1
+    inserted = 0
+    started = time.perf_counter()
+    for first_slot in range(0, total_slots, slots_per_chunk):
+        slots = np.arange(first_slot, min(first_slot + slots_per_chunk, total_slots))
+        slot = np.repeat(slots, n_equipment)
+        eq = np.tile(np.arange(n_equipment), len(slots))
+        day = slot // samples_per_day
+        n = len(slot)
+
+        progress = np.clip((day - fleet["onset"][eq]) / fleet["ramp"][eq], 0.0, 1.0)
+        usage = np.clip(rng.normal(fleet["base_usage"][eq], 2.0) * (1 + 0.3 * progress), 0, 24) / samples_per_day
+        patients = rng.poisson(fleet["base_patients"][eq] / samples_per_day).astype(np.float64)
+        workload = np.clip(usage * samples_per_day / 24 + 0.25 * progress + rng.normal(0, 0.05, n), 0, 1)
+        temp = rng.normal(fleet["base_temp"][eq], 3.0) + 20.0 * progress
+        errors = rng.poisson((0.3 + 4.0 * progress ** 2) / samples_per_day).astype(np.float64)
+
+        ts_epoch = start_epoch + slot * step
+        slot_text = np.char.replace(
+            np.datetime_as_string((start_epoch + slots * step).astype("datetime64[s]"), unit="s"), "T", " "
+        )
+        timestamps = slot_text[slot - slots[0]]
+        log_ids = np.arange(log_id, log_id + n)
+
+        # A chunk is in slot order, so each month it touches is one contiguous run of rows
+        row_months = ts_epoch.astype("datetime64[s]").astype("datetime64[M]")
+        bounds = np.flatnonzero(np.diff(row_months.astype(np.int64))) + 1
+        for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, n]):
+            conn.executemany(
+                f"INSERT INTO {partitions.partition_name(str(row_months[lo]))} ({columns}) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                zip(log_ids[lo:hi].tolist(), fleet["ids"][eq[lo:hi]].tolist(), timestamps[lo:hi].tolist(),
+                    np.round(usage[lo:hi], 2).tolist(), patients[lo:hi].tolist(),
+                    np.round(workload[lo:hi], 2).tolist(), np.round(temp[lo:hi], 2).tolist(),
+                    errors[lo:hi].tolist(), ts_epoch[lo:hi].tolist()),
+            )
+        conn.commit()
+        log_id += n
+        inserted += n
+        rate = inserted / (time.perf_counter() - started)
+        print(f"  usage_logs: {inserted:,}/{total_slots * n_equipment:,} rows ({rate:,.0f} rows/s)", flush=True)
+
+    for _, sql in indexes:
+        conn.execute(sql)
+    sums = ", ".join(f"{metric}_sum" for metric in DAILY_USAGE_METRICS)
+    conn.execute("DELETE FROM usage_daily")
+    conn.execute(f"""
+        INSERT INTO usage_daily (equipment_id, day, readings, {sums})
+        SELECT equipment_id, ts_epoch / 86400, COUNT(*),
+               {", ".join(f"SUM(COALESCE({metric}, 0))" for metric in DAILY_USAGE_METRICS)}
+        FROM usage_logs
+        WHERE ts_epoch IS NOT NULL AND equipment_id IS NOT NULL
+        GROUP BY equipment_id, ts_epoch / 86400
+    """)
+    conn.execute("UPDATE usage_log_sequence SET last_log_id = (SELECT COALESCE(MAX(log_id), 0) FROM usage_logs)")
+    conn.commit()
+    return inserted
+
+
+def insert_maintenance(conn, rng, fleet, technicians, start_day, days):
+    n_equipment = len(fleet["ids"])
+    rows = []
+
+    # Roughly two preventive visits a year per device
+    preventive_counts = rng.poisson(2 * days / 365, n_equipment)
+    prev_eq = np.repeat(np.arange(n_equipment), preventive_counts)
+    prev_day = rng.integers(0, days, len(prev_eq))
+
+    # Degrading devices get corrective work once the degradation has set in
+    corr_eq = np.flatnonzero(fleet["degrading"] & (fleet["onset"] < days))
+    corr_day = np.minimum(fleet["onset"][corr_eq] + fleet["ramp"][corr_eq].astype(int), days - 1)
+
+    events = [(e, d, "Preventive") for e, d in zip(prev_eq.tolist(), prev_day.tolist())]
+    events += [(e, d, "Corrective") for e, d in zip(corr_eq.tolist(), corr_day.tolist())]
+    dates = np.datetime_as_string(start_day + np.array([d for _, d, _ in events], dtype="timedelta64[D]"), unit="D")
+
+    number = 1000
+    for (e, _, mtype), date in zip(events, dates.tolist()):
+        number += 1
+        rows.append((
+            f"MTN{number}", fleet["ids"][e], date, mtype,
+            round(float(rng.uniform(1, 12)), 1), round(float(rng.uniform(500, 5000)), 2),
+            ISSUES[mtype][rng.integers(len(ISSUES[mtype]))], PARTS[rng.integers(len(PARTS))],
+            VENDORS[rng.integers(len(VENDORS))], technicians[rng.integers(len(technicians))],
+            int(rng.integers(3, 6)), round(float(rng.uniform(1, 4)), 1), "Completed",
+            "Yes" if rng.random() < 0.4 else "No", "Done",
+        ))
+
+    # Open work orders over the two weeks after the generated history
+    scheduled_eq = np.flatnonzero(rng.random(n_equipment) < 0.05)
+    end_day = start_day + np.timedelta64(days, "D")
+    for e in scheduled_eq.tolist():
+        number += 1
+        date = str(end_day + np.timedelta64(int(rng.integers(0, 14)), "D"))
+        technician = technicians[rng.integers(len(technicians))] if rng.random() < 0.5 else None
+        rows.append((f"MTN{number}", fleet["ids"][e], date, "Preventive", 0.0, 0.0,
+                     "Scheduled preventive maintenance", "NA", "", technician, 0, None,
+                     "Pending", "No", "Scheduled"))
+
+    conn.executemany("INSERT INTO maintenance_logs (maintenance_id, equipment_id, date, maintenance_type, "
+                     "downtime_hours, cost_inr, issue_description, parts_replaced, vendor, technician_id, "
+                     "service_rating, response_time_hours, completion_status, warranty_covered, status) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    return len(rows)
+
+
+def generate_fleet(out, n_equipment, days, samples_per_day=1, n_technicians=None, degrading_fraction=0.15,
+                   start_date="2024-07-09", seed=42, password="pass1", chunk_rows=1_000_000):
+    if os.path.exists(out):
+        raise FileExistsError(f"{out} already exists; remove it or choose another --out")
+    if SECONDS_PER_DAY % samples_per_day:
+        raise ValueError("samples_per_day must divide 86400")
+
+    rng = np.random.default_rng(seed)
+    start_day = np.datetime64(start_date, "D")
+    n_technicians = n_technicians or max(5, n_equipment // 10)
+
+    conn = sqlite3.connect(out)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+    create_schema(conn)
+
+    fleet = build_fleet(rng, n_equipment, start_day, days, degrading_fraction)
+
+    biomedical, technicians = insert_personnel(conn, rng, n_equipment, n_technicians, password)
+    insert_equipment(conn, rng, fleet, biomedical)
+    conn.commit()
+    usage_rows = insert_usage_logs(conn, rng, fleet, start_day, days, samples_per_day, chunk_rows)
+    maintenance_rows = insert_maintenance(conn, rng, fleet, technicians, start_day, days)
+
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute("ANALYZE")
+    conn.close()
+    return {"equipment": n_equipment, "usage_logs": usage_rows, "maintenance_logs": maintenance_rows,
+            "degrading": int(fleet["degrading"].sum())}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic fleet database")
+    parser.add_argument("--equipment", type=int, default=1000, help="Number of devices")
+    parser.add_argument("--days", type=int, default=365, help="Days of usage history")
+    parser.add_argument("--samples-per-day", type=int, default=1, help="usage_logs rows per device per day")
+    parser.add_argument("--technicians", type=int, default=None, help="Defaults to one per ten devices")
+    parser.add_argument("--degrading-fraction", type=float, default=0.15)
+    parser.add_argument("--start-date", default="2024-07-09")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="pass1", help="Password given to every synthetic user")
+    parser.add_argument("--out", default="synthetic_fleet.db")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    summary = generate_fleet(args.out, args.equipment, args.days, args.samples_per_day, args.technicians,
+                             args.degrading_fraction, args.start_date, args.seed, args.password)
+    print(f"Built {args.out} in {time.perf_counter() - started:.1f}s: {summary}")
@@ -9,11 +9,12 @@ from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Input
 from tensorflow.keras.callbacks import EarlyStopping
 from sklearn.preprocessing import StandardScaler
+from fastapi_app.sequences import FEATURES, rolling_windows
 
 # Data loading
 df = pd.read_csv("processed_equipment_data.csv")
 df["timestamp"] = pd.to_datetime(df["timestamp"])
-features = ["usage_hours", "patients_served", "workload_level", "avg_cpu_temp", "error_count"]
+features = FEATURES
 target = "needs_maintenance_10_days"
 df[features] = df[features].fillna(0)
 
@@ -22,17 +23,7 @@ scaler = StandardScaler()
 df[features] = scaler.fit_transform(df[features])
 
 # Rolling window for LSTM
-sequences, labels = [], []
-grouped = df.groupby("equipment_id")
-for _, group in grouped:
-    group = group.sort_values("timestamp")
-    if len(group) >= 6:
-        for i in range(len(group) - 5):
-            sequences.append(group.iloc[i:i+5][features].values)
-            labels.append(group.iloc[i+5][target])
-
-X_seq = np.array(sequences)
-y_seq = np.array(labels)
+X_seq, y_seq = rolling_windows(df, target)
 
 # Train/test split for LSTM
 X_train_seq, X_test_seq, y_train_seq, y_test_seq = train_test_split(
@@ -1,69 +1,78 @@
-import sqlite3
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from analytics_snapshot import refresh_snapshot, load_usage_logs, load_table
+from fastapi_app.timestamps import epoch_to_datetime
 
-# Connect to the DB
-conn = sqlite3.connect("hospital_equipment_system.db")
+def build_processed_dataset():
+    """Usage logs labelled with the next prediction made within 10 days"""
+    # Bring the columnar snapshot up to date (only rows after the last exported log_id)
+    refresh_snapshot()
 
-# Load data
-usage_df = pd.read_sql_query("SELECT * FROM usage_logs", conn)
-pred_df = pd.read_sql_query("SELECT * FROM failure_predictions", conn)
-equip_df = pd.read_sql_query("SELECT * FROM equipment", conn)
+    # Load data
+    usage_df = load_usage_logs()
+    usage_df["equipment_id"] = usage_df["equipment_id"].astype(str)
+    pred_df = load_table("failure_predictions", [
+        "prediction_id", "equipment_id", "prediction_epoch", "needs_maintenance_10_days", "failure_probability"
+    ])
+    equip_df = load_table("equipment", ["equipment_id", "type", "location", "criticality", "installation_epoch"])
 
-# Convert timestamp and dates
-usage_df["timestamp"] = pd.to_datetime(usage_df["timestamp"])
-pred_df["prediction_date"] = pd.to_datetime(pred_df["prediction_date"])
-equip_df["installation_date"] = pd.to_datetime(equip_df["installation_date"])
+    # Dates come from the integer epoch columns; no string parsing needed
+    usage_df["timestamp"] = epoch_to_datetime(usage_df.pop("ts_epoch"))
+    pred_df["prediction_date"] = epoch_to_datetime(pred_df.pop("prediction_epoch"))
+    equip_df["installation_date"] = epoch_to_datetime(equip_df.pop("installation_epoch"))
 
-# Sort usage logs
-usage_df = usage_df.sort_values(["equipment_id", "timestamp"])
+    # Sort usage logs
+    usage_df = usage_df.sort_values(["equipment_id", "timestamp"])
 
-# Merge usage with predictions for target label
-# We assume prediction was made based on past 5-day logs — so we align on dates
-merged_df = pd.merge_asof(
-    usage_df.sort_values("timestamp"),
-    pred_df.sort_values("prediction_date"),
-    by="equipment_id",
-    left_on="timestamp",
-    right_on="prediction_date",
-    direction="forward",
-    tolerance=pd.Timedelta("10D")  # only if prediction happens within next 10 days
-)
+    # Merge usage with predictions for target label
+    # We assume prediction was made based on past 5-day logs — so we align on dates
+    merged_df = pd.merge_asof(
+        usage_df.sort_values("timestamp"),
+        pred_df.sort_values("prediction_date"),
+        by="equipment_id",
+        left_on="timestamp",
+        right_on="prediction_date",
+        direction="forward",
+        tolerance=pd.Timedelta("10D")  # only if prediction happens within next 10 days
+    )
 
-# Drop rows without labels (NaN)
-merged_df = merged_df.dropna(subset=["needs_maintenance_10_days"])
+    # Drop rows without labels (NaN)
+    merged_df = merged_df.dropna(subset=["needs_maintenance_10_days"])
 
-# View info
-print(merged_df.head())
-print(merged_df.info())
+    return merged_df
 
-# Check missing values
-print("\nMissing values:")
-print(merged_df.isnull().sum())
 
-# EDA: Plot correlations
-plt.figure(figsize=(10, 6))
-sns.heatmap(merged_df.select_dtypes(include="number").corr(), annot=True, cmap="coolwarm")
-plt.title("Feature Correlation Heatmap")
-plt.tight_layout()
-plt.show()
+if __name__ == "__main__":
+    merged_df = build_processed_dataset()
 
-# Plot class distribution
-sns.countplot(x="needs_maintenance_10_days", data=merged_df)
-plt.title("Target Distribution (Maintenance Needed in 10 Days)")
-plt.show()
+    # View info
+    print(merged_df.head())
+    print(merged_df.info())
 
-# Distribution of numeric features
-numeric_cols = ["usage_hours", "patients_served", "workload_level", "avg_cpu_temp", "error_count"]
-for col in numeric_cols:
-    plt.figure(figsize=(6, 4))
-    sns.histplot(data=merged_df, x=col, kde=True)
-    plt.title(f"Distribution of {col}")
+    # Check missing values
+    print("\nMissing values:")
+    print(merged_df.isnull().sum())
+
+    # EDA: Plot correlations
+    plt.figure(figsize=(10, 6))
+    sns.heatmap(merged_df.select_dtypes(include="number").corr(), annot=True, cmap="coolwarm")
+    plt.title("Feature Correlation Heatmap")
     plt.tight_layout()
     plt.show()
 
-# Close DB connection
-conn.close()
+    # Plot class distribution
+    sns.countplot(x="needs_maintenance_10_days", data=merged_df)
+    plt.title("Target Distribution (Maintenance Needed in 10 Days)")
+    plt.show()
+
+    # Distribution of numeric features
+    numeric_cols = ["usage_hours", "patients_served", "workload_level", "avg_cpu_temp", "error_count"]
+    for col in numeric_cols:
+        plt.figure(figsize=(6, 4))
+        sns.histplot(data=merged_df, x=col, kde=True)
+        plt.title(f"Distribution of {col}")
+        plt.tight_layout()
+        plt.show()
 
-merged_df.to_csv("processed_equipment_data.csv", index=False)
\ No newline at end of file
+    merged_df.to_csv("processed_equipment_data.csv", index=False)
\ No newline at end of file
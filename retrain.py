@@ -0,0 +1,292 @@
+# retrain.py
+"""Versioned retraining of the failure models (scaler.pkl, lgbm_model.pkl, lstm_model.h5).
+
+    python retrain.py --mode incremental                  # train on readings newer than the current version
+    python retrain.py --mode incremental --compare-full   # also time a full refit (not saved)
+    python retrain.py --mode full                         # refit everything on the whole dataset
+
+Incremental mode leaves history alone:
+- the StandardScaler is kept as it is: the inherited trees' split thresholds
+  and the LSTM's weights were learned on its scaling, so changing it would
+  shift their inputs. The manifest records how far the new readings have
+  drifted from it (scaler_drift, in units of its standard deviations); a
+  --mode full run refits the scaler along with the models
+- LightGBM continues boosting from the current model (init_model), adding
+  --lgbm-rounds trees fitted on the new windows
+- the LSTM is fine-tuned from its saved weights for a few epochs at a low
+  learning rate on the new windows
+
+A full refit needs TensorFlow; incremental runs without it keep the parent's
+LSTM, which stays valid because the scaler does not change.
+
+Every run is stored in saved_models/versions/vN/ with a manifest (parent
+version, data watermark, rows and windows used, seconds taken and the time
+saved against a full refit), then its artifacts are published to
+saved_models/. Running servers pick them up on their next restart.
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+from lightgbm import LGBMClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.preprocessing import StandardScaler
+
+from fastapi_app.sequences import FEATURES, WINDOW, rolling_windows
+
+MODEL_DIR = "saved_models"
+VERSIONS_DIR = os.path.join(MODEL_DIR, "versions")
+MANIFEST = "manifest.json"
+ARTIFACTS = ["scaler.pkl", "lgbm_model.pkl", "lstm_model.h5"]
+TARGET = "needs_maintenance_10_days"
+
+
+# --- Versions ---
+def _version_dir(version):
+    return os.path.join(VERSIONS_DIR, f"v{version}")
+
+
+def read_manifest(version):
+    with open(os.path.join(_version_dir(version), MANIFEST)) as f:
+        return json.load(f)
+
+
+def latest_version():
+    """Highest version number with a manifest, or None before the first run"""
+    if not os.path.isdir(VERSIONS_DIR):
+        return None
+    versions = [int(name[1:]) for name in os.listdir(VERSIONS_DIR)
+                if name.startswith("v") and name[1:].isdigit()
+                and os.path.exists(os.path.join(VERSIONS_DIR, name, MANIFEST))]
+    return max(versions, default=None)
+
+
+def _record_baseline():
+    """Keep the artifacts trained before versioning existed as v0"""
+    os.makedirs(_version_dir(0), exist_ok=True)
+    for name in ARTIFACTS:
+        shutil.copy2(os.path.join(MODEL_DIR, name), _version_dir(0))
+    manifest = {"version": 0, "parent": None, "mode": "baseline", "created": _now(), "trained_through": None}
+    _write_manifest(0, manifest)
+    return manifest
+
+
+def _write_manifest(version, manifest):
+    path = os.path.join(_version_dir(version), MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _publish(version):
+    """Copy a version's artifacts over the served ones, one atomic rename each"""
+    for name in ARTIFACTS:
+        target = os.path.join(MODEL_DIR, name)
+        tmp_path = target + ".tmp"
+        shutil.copy2(os.path.join(_version_dir(version), name), tmp_path)
+        os.replace(tmp_path, target)
+
+
+def _full_fit_rate(version):
+    """Seconds per window of the nearest full refit in this version's lineage that trained the LSTM"""
+    while version is not None:
+        manifest = read_manifest(version)
+        # A refit without TensorFlow skipped the slowest model, so its rate would understate a real one
+        if manifest["mode"] == "full" and manifest.get("lstm_trained", True):
+            return manifest["seconds"] / manifest["windows"]
+        version = manifest["parent"]
+    return None
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+# --- Data ---
+def load_dataset(path):
+    df = pd.read_csv(path)
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df[FEATURES] = df[FEATURES].fillna(0)
+    return df.sort_values(["equipment_id", "timestamp"], kind="stable")
+
+
+def new_readings(df, watermark):
+    """Readings after `watermark`, plus the WINDOW readings before it per device.
+
+    The context rows make the first window of each device end right before its
+    first new reading, so every window built from the result is labelled by a
+    new reading and none is labelled by one already trained on.
+    """
+    new = df["timestamp"] > watermark
+    context = df[~new].groupby("equipment_id", sort=False).tail(WINDOW)
+    return pd.concat([context, df[new]]).sort_values(["equipment_id", "timestamp"], kind="stable"), int(new.sum())
+
+
+def _scaled(df, scaler):
+    df = df.copy()
+    df[FEATURES] = scaler.transform(df[FEATURES])
+    return df
+
+
+def _auc(y, probs):
+    return round(float(roc_auc_score(y, probs)), 4) if len(np.unique(y)) == 2 else None
+
+
+# --- Training ---
+def _tensorflow():
+    try:
+        import tensorflow as tf
+    except ImportError:
+        return None
+    return tf
+
+
+def _fit_full(df, tf):
+    scaler = StandardScaler().fit(df[FEATURES])
+    X_seq, y = rolling_windows(_scaled(df, scaler), TARGET)
+    lgbm = LGBMClassifier().fit(X_seq.reshape(len(X_seq), -1), y)
+
+    lstm = None
+    if tf is not None:
+        lstm = tf.keras.Sequential([
+            tf.keras.layers.Input(shape=(WINDOW, len(FEATURES))),
+            tf.keras.layers.LSTM(64),
+            tf.keras.layers.Dense(1, activation="sigmoid"),
+        ])
+        lstm.compile(loss="binary_crossentropy", optimizer="adam", metrics=["accuracy"])
+        early_stop = tf.keras.callbacks.EarlyStopping(monitor="val_loss", patience=5, restore_best_weights=True)
+        lstm.fit(X_seq, y, validation_split=0.2, epochs=50, batch_size=32, callbacks=[early_stop], verbose=0)
+    return scaler, lgbm, lstm, len(X_seq)
+
+
+def _scaler_drift(scaler, rows):
+    """Per feature, how far the rows' mean and std sit from the scaler's, in units of its std"""
+    scaled = scaler.transform(rows[FEATURES])
+    return {feature: {"mean": round(float(scaled[:, i].mean()), 3), "std": round(float(scaled[:, i].std()), 3)}
+            for i, feature in enumerate(FEATURES)}
+
+
+def _fit_incremental(df, watermark, parent_dir, tf, lgbm_rounds, lstm_epochs, lstm_lr):
+    # The parent's scaling is frozen: the trees and LSTM weights carried over were fitted on it
+    scaler = joblib.load(os.path.join(parent_dir, "scaler.pkl"))
+    parent_lgbm = joblib.load(os.path.join(parent_dir, "lgbm_model.pkl"))
+    X_seq, y = rolling_windows(_scaled(df, scaler), TARGET)
+    X_flat = X_seq.reshape(len(X_seq), -1)
+    parent_probs = parent_lgbm.predict_proba(X_flat)[:, 1]
+
+    params = dict(parent_lgbm.get_params(), n_estimators=lgbm_rounds)
+    lgbm = LGBMClassifier(**params).fit(X_flat, y, init_model=parent_lgbm.booster_)
+
+    lstm = None
+    if tf is not None:
+        lstm = tf.keras.models.load_model(os.path.join(parent_dir, "lstm_model.h5"))
+        lstm.compile(loss="binary_crossentropy", optimizer=tf.keras.optimizers.Adam(learning_rate=lstm_lr),
+                     metrics=["accuracy"])
+        lstm.fit(X_seq, y, epochs=lstm_epochs, batch_size=32, verbose=0)
+
+    stats = {
+        "windows": len(X_seq),
+        "lgbm_trees": lgbm.booster_.num_trees(),
+        "scaler_drift": _scaler_drift(scaler, df[df["timestamp"] > watermark]),
+        # In-sample on the new windows: a check that the update moved the right way, not a holdout score
+        "lgbm_auc_new": {"parent": _auc(y, parent_probs), "updated": _auc(y, lgbm.predict_proba(X_flat)[:, 1])},
+    }
+    return scaler, lgbm, lstm, stats
+
+
+def _total_windows(df):
+    counts = df.groupby("equipment_id").size()
+    return int((counts[counts > WINDOW] - WINDOW).sum())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["incremental", "full"], default="incremental")
+    parser.add_argument("--data", default="processed_equipment_data.csv",
+                        help="Labelled readings, as written by preprocess.py")
+    parser.add_argument("--since", help="Watermark for the first incremental run, when the current "
+                                        "models predate versioning (default: train on the last 30 days)")
+    parser.add_argument("--lgbm-rounds", type=int, default=50, help="Boosting rounds added per incremental run")
+    parser.add_argument("--lstm-epochs", type=int, default=3)
+    parser.add_argument("--lstm-lr", type=float, default=1e-4)
+    parser.add_argument("--compare-full", action="store_true",
+                        help="Also time a full refit on the same data; its models are discarded")
+    parser.add_argument("--no-publish", action="store_true", help="Store the version without serving it")
+    args = parser.parse_args(argv)
+
+    tf = _tensorflow()
+    if tf is None and args.mode == "full":
+        # A refitted scaler would be published next to an LSTM trained on the old scaling
+        parser.error("--mode full needs TensorFlow to retrain the LSTM along with the scaler")
+    df = load_dataset(args.data)
+    if tf is None:
+        print("TensorFlow is not installed; lstm_model.h5 is carried over from the parent version unchanged")
+
+    parent = latest_version()
+    if parent is None:
+        parent = _record_baseline()["version"]
+    parent_manifest = read_manifest(parent)
+    parent_dir = _version_dir(parent)
+    version = parent + 1
+    manifest = {"version": version, "parent": parent, "mode": args.mode, "created": _now(),
+                "trained_through": df["timestamp"].max().isoformat(), "lstm_trained": tf is not None}
+
+    started = time.perf_counter()
+    if args.mode == "full":
+        scaler, lgbm, lstm, windows = _fit_full(df, tf)
+        manifest.update(rows=len(df), windows=windows)
+    else:
+        watermark = parent_manifest["trained_through"] or args.since
+        watermark = pd.Timestamp(watermark) if watermark else df["timestamp"].max() - pd.Timedelta(days=30)
+        subset, new_rows = new_readings(df, watermark)
+        if not new_rows:
+            print(f"No readings after {watermark.isoformat()}; v{parent} is current")
+            return
+        scaler, lgbm, lstm, stats = _fit_incremental(
+            subset, watermark, parent_dir, tf, args.lgbm_rounds, args.lstm_epochs, args.lstm_lr)
+        manifest.update(rows=new_rows, since=watermark.isoformat(), **stats)
+    manifest["seconds"] = round(time.perf_counter() - started, 3)
+
+    if args.mode == "incremental":
+        full_seconds, basis = None, None
+        if args.compare_full:
+            full_started = time.perf_counter()
+            _fit_full(df, tf)
+            full_seconds, basis = time.perf_counter() - full_started, "measured"
+        else:
+            rate = _full_fit_rate(parent)
+            if rate is not None:
+                full_seconds, basis = rate * _total_windows(df), "extrapolated from the last full refit"
+        if full_seconds is not None:
+            manifest.update(full_refit_seconds=round(full_seconds, 3), full_refit_basis=basis,
+                            seconds_saved=round(full_seconds - manifest["seconds"], 3))
+
+    os.makedirs(_version_dir(version), exist_ok=True)
+    joblib.dump(scaler, os.path.join(_version_dir(version), "scaler.pkl"))
+    joblib.dump(lgbm, os.path.join(_version_dir(version), "lgbm_model.pkl"))
+    if lstm is not None:
+        lstm.save(os.path.join(_version_dir(version), "lstm_model.h5"))
+    else:
+        shutil.copy2(os.path.join(parent_dir, "lstm_model.h5"), _version_dir(version))
+    _write_manifest(version, manifest)
+    if not args.no_publish:
+        _publish(version)
+
+    print(f"v{version} ({args.mode}, parent v{parent}): {manifest['rows']} rows, "
+          f"{manifest['windows']} windows in {manifest['seconds']:.2f} s")
+    if "seconds_saved" in manifest:
+        print(f"Full refit: {manifest['full_refit_seconds']:.2f} s ({manifest['full_refit_basis']}); "
+              f"saved {manifest['seconds_saved']:.2f} s")
+    elif args.mode == "incremental":
+        print("No full refit on record to compare against; run with --compare-full or --mode full once")
+    print("Published to saved_models/" if not args.no_publish else "Not published (--no-publish)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# tests/test_partitions.py
+import sqlite3
+
+import pandas as pd
+
+from fastapi_app import partitions
+from generate_synthetic_fleet import generate_fleet
+
+
+def _brute_force_latest(conn, n):
+    df = pd.read_sql_query("SELECT equipment_id, ts_epoch FROM usage_logs WHERE ts_epoch IS NOT NULL", conn)
+    df = df.sort_values(["equipment_id", "ts_epoch"], ascending=[True, False], kind="stable")
+    return df.groupby("equipment_id", sort=False).head(n).reset_index(drop=True)
+
+
+def test_latest_readings_after_ensure_current(tmp_path):
+    # Data ending in 2024-11; ensure_current() then adds empty partitions for today's month and the next
+    path = str(tmp_path / "fleet.db")
+    generate_fleet(path, 50, 117, 1, None, 0.15, "2024-07-08", 42, "pass1")
+    conn = sqlite3.connect(path)
+    assert partitions.ensure_current(conn)
+
+    # One device with readings only in the oldest month, one with fewer than n readings
+    start, _ = partitions.month_bounds("2024-07")
+    partitions.insert_readings(conn, pd.DataFrame({
+        "equipment_id": ["OLD"] * 6 + ["SHORT"] * 2,
+        "ts_epoch": [start + 3600 * (i + 1) for i in range(8)],
+        "error_count": [0.0] * 8,
+    }))
+
+    latest = partitions.latest_readings(conn, 5, ["equipment_id", "ts_epoch"])
+    counts = latest.groupby("equipment_id").size()
+    assert len(counts) == 52
+    assert counts.drop("SHORT").eq(5).all() and counts["SHORT"] == 2
+    pd.testing.assert_frame_equal(latest, _brute_force_latest(conn, 5), check_dtype=False)
+    conn.close()